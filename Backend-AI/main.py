@@ -1,11 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routes.main_chatbot.chat_router import router as chat_router  # Import 'router' and rename it
+from routes.main_chatbot.chat import init_retrieval_runtime, retrieval_runtime_status, weather_cache_stats, response_cache_stats, get_response_cache, semantic_cache_stats, location_cache_stats, llm_dispatch_stats, embedding_service_stats
+from services.http_clients import init_http_clients, close_http_clients
+from services.Farming_Guide.guide_cache import guide_cache_stats
+from services.Market_Price.prices import market_cache_stats
+from services.Market_Price.store import get_market_store
+from services.Market_Price.ingest import market_ingestion_loop, MARKET_INGEST_INTERVAL_HOURS
 from routes import organicguide_router
 from routes import marketprice_router
 import os
 
-app = FastAPI(title="AI Farming Assistant API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled keep-alive clients shared by every outbound call
+    await init_http_clients()
+    # Open the response cache and start its background sweeper
+    response_cache = get_response_cache()
+    # Load the embedding model and FAISS index once per worker, in a thread so
+    # the server can answer /health while the index is still loading
+    runtime_task = asyncio.create_task(asyncio.to_thread(init_retrieval_runtime))
+    # Periodically pull mandi prices into the local columnar store (one worker at a time, see ingest.py)
+    ingestion_task = asyncio.create_task(market_ingestion_loop()) if MARKET_INGEST_INTERVAL_HOURS > 0 else None
+    yield
+    if ingestion_task is not None:
+        ingestion_task.cancel()
+    if not runtime_task.done():
+        runtime_task.cancel()
+    response_cache.stop_sweeper()
+    await close_http_clients()
+
+app = FastAPI(title="AI Farming Assistant API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,8 +54,23 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    retrieval = retrieval_runtime_status()
+    caches = {
+        "location": location_cache_stats(),
+        "weather": weather_cache_stats(),
+        "responses": response_cache_stats(),
+        "semantic": semantic_cache_stats(),
+        "organic_guides": guide_cache_stats(),
+        "market_prices": market_cache_stats(),
+        "market_store": get_market_store().stats(),
+    }
+    if retrieval["ready"]:
+        return {"status": "healthy", "retrieval": retrieval, "caches": caches, "llm": llm_dispatch_stats(),
+                "embeddings": embedding_service_stats()}
+    # Not ready yet (still loading) or failed to load: report 503 for readiness probes
+    status = "starting" if retrieval["status"] in ("not_loaded", "loading") else "degraded"
+    return JSONResponse(status_code=503, content={"status": status, "retrieval": retrieval, "caches": caches})
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
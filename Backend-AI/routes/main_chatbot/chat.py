@@ -3,7 +3,6 @@ from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain.chains import RetrievalQA
-from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
 from typing import TypedDict, List, Optional
@@ -11,13 +10,29 @@ from dotenv import load_dotenv
 import os
 import sys
 import logging
-import requests
+import asyncio
 import json
 from datetime import datetime
-import google.generativeai as genai
 import hashlib
-import pickle
+import threading
+import time
+import numpy as np
 from functools import lru_cache
+from services.http_clients import get_http_client, get_sync_http_client
+from services import llm_providers
+from services.ttl_cache import TTLCache
+from services.response_cache import create_response_cache
+from .semantic_cache import SemanticCache
+from .llm_dispatch import LLMDispatcher, LLMProvider
+from .indexer import update_index, load_manifest
+from .index_types import apply_search_params
+from .readonly_store import load_readonly_vector_store, has_docstore
+from . import retrieval
+from .embedding_service import EmbeddingService
+from .onnx_embeddings import OnnxEmbeddings
+from .query_analysis import analyze_query, QueryFeatures
+from services.Geo.gazetteer import place_to_location, canonicalize_location
+from services.Geo.ip_db import get_ip_db, is_public_address
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -34,8 +49,37 @@ PDF_DIR = os.path.join(BASE_DIR, "data")
 FAISS_DIR = os.path.join(BASE_DIR, "vector_store", "chat_db_faiss")
 CACHE_DIR = os.path.join(BASE_DIR, "cache")
 GROQ_MODEL = "llama-3.1-8b-instant"
-COSINE_THRESHOLD = 0.5
+GEMINI_MODEL = "gemini-pro"
+COSINE_THRESHOLD = float(os.getenv("COSINE_THRESHOLD", "0.5"))  # minimum cosine similarity of a retrieved chunk
 CACHE_EXPIRY_HOURS = 24  # Cache expiry time in hours
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # torch | onnx | onnx_int8
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(BASE_DIR, "models", "all-MiniLM-L6-v2-onnx"))
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine similarity
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))  # per scope
+SEMANTIC_CACHE_MAX_SCOPES = int(os.getenv("SEMANTIC_CACHE_MAX_SCOPES", "256"))
+WEATHER_CACHE_TTL_SECONDS = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))  # OpenWeather refreshes ~every 10 min
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "2048"))
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", "0.1"))  # ~11 km grid cells
+WEATHER_CACHE_MAX_STALE_SECONDS = int(os.getenv("WEATHER_CACHE_MAX_STALE_SECONDS", "3600"))
+LOCATION_CACHE_TTL_SECONDS = int(os.getenv("LOCATION_CACHE_TTL_SECONDS", "3600"))
+LOCATION_CACHE_MAX_STALE_SECONDS = int(os.getenv("LOCATION_CACHE_MAX_STALE_SECONDS", "86400"))
+LOCATION_CACHE_MAX_ENTRIES = int(os.getenv("LOCATION_CACHE_MAX_ENTRIES", "4096"))  # one per client IP
+TEMPERATURE_BAND_DEGREES = 5  # response cache treats 30-35°C as one weather bucket
+LLM_DISPATCH_STRATEGY = os.getenv("LLM_DISPATCH_STRATEGY", "serial")  # serial | hedged | race
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "15"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "20"))
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "2.5"))  # until enough samples for p95
+STALE_WHILE_REVALIDATE = os.getenv("STALE_WHILE_REVALIDATE", "true").lower() == "true"
+EMBEDDING_BATCH_MAX = int(os.getenv("EMBEDDING_BATCH_MAX", "32"))  # queries per batched forward pass
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "3"))  # how long a batch collects requests
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))  # LLM calls in flight per batch request
+BATCH_NEAR_DUPLICATE_COSINE = float(os.getenv("BATCH_NEAR_DUPLICATE_COSINE", "0.95"))  # answer once within a batch
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "memory").lower()  # memory | mmap (read-only, shared pages)
+INDEX_SYNC_ON_STARTUP = os.getenv("INDEX_SYNC_ON_STARTUP", "false").lower() == "true"  # embed new/changed PDFs at boot
 
 
 
@@ -50,6 +94,7 @@ class AgentState(TypedDict):
     llm_source: str
     error: Optional[str]
     needs_location: bool
+    features: Optional[QueryFeatures]
     agricultural_alerts: List[str]
     crop_suggestions: List[str]
 
@@ -65,10 +110,6 @@ def initialize_components():
     if not os.path.exists(CACHE_DIR):
         os.makedirs(CACHE_DIR)
         logger.info(f"Created {CACHE_DIR} directory for caching.")
-    
-    # Create vector store if it doesn't exist
-    if not os.path.exists(FAISS_DIR):
-        create_vector_store_from_pdfs()
 
 def load_pdf_documents():
     """Load PDF documents from directory"""
@@ -93,30 +134,28 @@ def create_chunks(documents):
     )
     return text_splitter.split_documents(documents)
 
-def get_embedding_model():
-    """Initialize embedding model"""
+def _create_embedding_model():
+    """Build a new embedding model instance for EMBEDDING_BACKEND"""
+    if EMBEDDING_BACKEND in ("onnx", "onnx_int8"):
+        try:
+            return OnnxEmbeddings(ONNX_MODEL_DIR, quantized=EMBEDDING_BACKEND == "onnx_int8")
+        except (ImportError, OSError) as e:
+            logger.error(f"ONNX embedding backend unavailable, using torch: {str(e)}")
     return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'}
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}  # unit vectors: inner product == cosine
     )
 
 def create_vector_store_from_pdfs():
-    """Create and persist FAISS vector store from PDFs"""
+    """Create or incrementally update the persisted FAISS vector store from PDFs"""
     try:
-        documents = load_pdf_documents()
-        if not documents:
-            logger.warning("No documents found to create vector store")
+        vector_store, _ = update_index(PDF_DIR, FAISS_DIR, get_embedding_model(), create_chunks)
+        if vector_store is None:
             return None
-            
-        chunks = create_chunks(documents)
-        embedding_model = get_embedding_model()
-        
-        vector_store = FAISS.from_documents(
-            documents=chunks, 
-            embedding=embedding_model
-        )
-        vector_store.save_local(FAISS_DIR)
-        logger.info(f"Created FAISS vector store with {len(chunks)} chunks")
+        if VECTOR_STORE_MODE == "mmap":
+            return load_vector_store()
+        apply_search_params(vector_store.index)
         return vector_store
     except Exception as e:
         logger.error(f"Error creating vector store: {str(e)}")
@@ -126,70 +165,235 @@ def load_vector_store():
     """Load existing FAISS vector store"""
     try:
         embedding_model = get_embedding_model()
-        vector_store = FAISS.load_local(
-            FAISS_DIR,
-            embeddings=embedding_model,
-            allow_dangerous_deserialization=True
-        )
-        logger.info("Loaded existing FAISS vector store")
+        if VECTOR_STORE_MODE == "mmap" and has_docstore(FAISS_DIR):
+            vector_store = load_readonly_vector_store(FAISS_DIR, embedding_model)
+        else:
+            if VECTOR_STORE_MODE == "mmap":
+                logger.warning("No docstore.sqlite3 yet (run the indexer); loading the index into memory")
+            vector_store = FAISS.load_local(
+                FAISS_DIR,
+                embeddings=embedding_model,
+                allow_dangerous_deserialization=True
+            )
+        apply_search_params(vector_store.index)
+        logger.info(f"Loaded existing FAISS vector store ({VECTOR_STORE_MODE} mode)")
         return vector_store
     except Exception as e:
         logger.error(f"Error loading vector store: {str(e)}")
         return None
 
+# ===== SHARED RETRIEVAL RUNTIME =====
+# The embedding model and the FAISS index are loaded once per process (by the
+# FastAPI lifespan hook in main.py, or lazily by the CLI) and then shared by
+# every request. Each uvicorn worker owns its own copy; within a worker the
+# locks make loading safe from concurrent threads, and read-only FAISS
+# searches / embedding calls can run in parallel afterwards.
+_embedding_lock = threading.Lock()
+_embedding_model = None
+
+_runtime_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_runtime = {
+    "status": "not_loaded",  # not_loaded | loading | ready | failed
+    "vector_store": None,
+    "error": None,
+    "load_seconds": None,
+    "index_updated_at": None,  # manifest timestamp of the loaded index
+}
+
+def get_embedding_model():
+    """Get the process-wide embedding model, creating it on first use"""
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_lock:
+            if _embedding_model is None:
+                logger.info("Loading embedding model...")
+                _embedding_model = _create_embedding_model()
+    return _embedding_model
+
+def init_retrieval_runtime():
+    """Load the shared embedding model and FAISS index (idempotent)"""
+    if _runtime["status"] == "ready":
+        return _runtime["vector_store"]
+    
+    with _runtime_lock:
+        if _runtime["status"] == "ready":
+            return _runtime["vector_store"]
+        
+        _runtime["status"] = "loading"
+        _runtime["error"] = None
+        start = time.perf_counter()
+        try:
+            initialize_components()
+            get_embedding_model()
+            if os.path.exists(FAISS_DIR) and not INDEX_SYNC_ON_STARTUP:
+                vector_store = load_vector_store()
+            else:
+                vector_store = create_vector_store_from_pdfs()
+            if vector_store is None:
+                raise RuntimeError("vector store could not be loaded or created")
+            
+            _runtime["vector_store"] = vector_store
+            _runtime["index_updated_at"] = (load_manifest(FAISS_DIR) or {}).get("updated_at")
+            _runtime["status"] = "ready"
+            _runtime["load_seconds"] = round(time.perf_counter() - start, 3)
+            logger.info(f"Retrieval runtime ready in {_runtime['load_seconds']}s")
+            return vector_store
+        except Exception as e:
+            _runtime["status"] = "failed"
+            _runtime["error"] = str(e)
+            logger.error(f"Failed to initialize retrieval runtime: {str(e)}")
+            return None
+
+def retrieval_runtime_status():
+    """Readiness information for the shared retrieval runtime"""
+    vector_store = _runtime["vector_store"]
+    return {
+        "status": _runtime["status"],
+        "ready": _runtime["status"] == "ready",
+        "embedding_model_loaded": _embedding_model is not None,
+        "embedding_backend": type(_embedding_model).__name__ if _embedding_model is not None else None,
+        "indexed_vectors": vector_store.index.ntotal if vector_store is not None else 0,
+        "load_seconds": _runtime["load_seconds"],
+        "index_updated_at": _runtime["index_updated_at"],
+        "vector_store_mode": VECTOR_STORE_MODE,
+        "error": _runtime["error"],
+    }
+
 def get_vector_store():
-    """Get or create vector store"""
-    if os.path.exists(FAISS_DIR):
-        return load_vector_store()
-    else:
-        return create_vector_store_from_pdfs()
+    """Get the shared vector store, loading it on first use"""
+    if _runtime["status"] == "ready":
+        return _runtime["vector_store"]
+    return init_retrieval_runtime()
+
+def refresh_vector_store(rebuild=False):
+    """Apply PDF additions/changes/removals to the index and swap it in.
+
+    The update runs on a private copy, so in-flight searches keep using the
+    old store; the swap is a single reference assignment. If another worker
+    already updated the files on disk, this worker just reloads them.
+    """
+    with _refresh_lock:
+        vector_store, summary = update_index(PDF_DIR, FAISS_DIR, get_embedding_model(), create_chunks, rebuild=rebuild)
+        updated_at = (load_manifest(FAISS_DIR) or {}).get("updated_at")
+        if vector_store is not None and (summary["updated"] or updated_at != _runtime["index_updated_at"]):
+            if VECTOR_STORE_MODE == "mmap":
+                vector_store = load_vector_store()  # serve the files just written, not the editable copy
+                if vector_store is None:
+                    raise RuntimeError("updated index could not be reopened read-only")
+            else:
+                apply_search_params(vector_store.index)
+            with _runtime_lock:
+                _runtime["vector_store"] = vector_store
+                _runtime["index_updated_at"] = updated_at
+                _runtime["status"] = "ready"
+                _runtime["error"] = None
+            summary["swapped"] = True
+            logger.info(f"Swapped in updated vector store ({vector_store.index.ntotal} vectors)")
+        else:
+            summary["swapped"] = False
+        return summary
 
 def get_groq_llm():
-    """Initialize Groq LLM"""
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found in environment variables")
-    
-    return ChatGroq(
-        temperature=0.3,
-        groq_api_key=api_key,
-        model_name=GROQ_MODEL,
-        max_tokens=200  # Reduced to ensure concise answers
-    )
+    """Shared Groq LLM client"""
+    return llm_providers.get_groq_llm(GROQ_MODEL, temperature=0.3, max_tokens=200)  # Reduced to ensure concise answers
 
 def get_gemini_model():
-    """Initialize Gemini model for fallback"""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
-    
+    """Shared Gemini model for fallback"""
+    return llm_providers.get_gemini_model(GEMINI_MODEL)
+
+# Paths on the pooled upstream clients (see services/http_clients.py)
+GEOAPIFY_IPINFO_PATH = "/v1/ipinfo"
+OPENWEATHER_PATH = "/data/2.5/weather"
+
+def _parse_location_response(data):
+    """Convert a Geoapify ipinfo payload into our location dict"""
+    return {
+        "city": data.get("city", {}).get("name", "Unknown"),
+        "country": data.get("country", {}).get("name", "Unknown"),
+        "state": data.get("state", {}).get("name", "Unknown"),
+        "latitude": data.get("location", {}).get("latitude"),
+        "longitude": data.get("location", {}).get("longitude"),
+        "detected_via": "IP geolocation"
+    }
+
+def _weather_params(latitude, longitude, location_name, api_key):
+    """Query parameters for OpenWeather, preferring coordinates over the name"""
+    params = {"appid": api_key, "units": "metric"}
+    if latitude and longitude:
+        params.update({"lat": latitude, "lon": longitude})
+    else:
+        params["q"] = location_name
+    return params
+
+def _parse_weather_response(data, location_name):
+    """Convert an OpenWeather payload into our weather dict"""
+    return {
+        "location": data.get("name", location_name),
+        "temperature": data["main"].get("temp", "N/A"),
+        "feels_like": data["main"].get("feels_like", "N/A"),
+        "humidity": data["main"].get("humidity", "N/A"),
+        "conditions": data["weather"][0].get("description", "N/A"),
+        "wind_speed": data["wind"].get("speed", "N/A"),
+        "pressure": data["main"].get("pressure", "N/A"),
+        "visibility": data.get("visibility", "N/A")
+    }
+
+def _lookup_client_ip(client_ip):
+    """Location of a public client IP from the local IP database, or None"""
+    if not client_ip or not is_public_address(client_ip):
+        return None
+    ip_db = get_ip_db()
+    location_data = ip_db.lookup(client_ip) if ip_db else None
+    return canonicalize_location(location_data) if location_data else None
+
+def _geoapify_params(client_ip, api_key):
+    """ipinfo parameters; without a public client IP Geoapify locates the caller (the server)"""
+    params = {"apiKey": api_key}
+    if client_ip and is_public_address(client_ip):
+        params["ip"] = client_ip
+    return params
+
+def _fetch_user_location(client_ip=None):
+    """Detect user's location: local IP database first, Geoapify API as fallback"""
+    location_data = _lookup_client_ip(client_ip)
+    if location_data:
+        return location_data
     try:
-        genai.configure(api_key=api_key)
-        return genai.GenerativeModel("gemini-pro")
+        api_key = os.getenv("GEOAPIFY_API_KEY")
+        if not api_key:
+            return {"error": "GEOAPIFY_API_KEY not found in environment variables"}
+        
+        # Get IP-based location
+        response = get_sync_http_client("geoapify").get(GEOAPIFY_IPINFO_PATH, params=_geoapify_params(client_ip, api_key))
+        
+        if response.status_code == 200:
+            location_data = canonicalize_location(_parse_location_response(response.json()))
+            logger.info(f"Detected location: {location_data['city']}, {location_data['state']}")
+            return location_data
+        else:
+            error_msg = f"Failed to detect location: HTTP {response.status_code}"
+            logger.error(error_msg)
+            return {"error": error_msg}
     except Exception as e:
-        raise ValueError(f"Failed to initialize Gemini model: {str(e)}")
+        error_msg = f"Location detection error: {str(e)}"
+        logger.error(error_msg)
+        return {"error": error_msg}
 
-def detect_user_location():
-    """Detect user's location using Geoapify API"""
+async def _fetch_user_location_async(client_ip=None):
+    """Non-blocking version of _fetch_user_location"""
+    location_data = _lookup_client_ip(client_ip)
+    if location_data:
+        return location_data
     try:
         api_key = os.getenv("GEOAPIFY_API_KEY")
         if not api_key:
             return {"error": "GEOAPIFY_API_KEY not found in environment variables"}
         
-        # Get IP-based location
-        url = f"https://api.geoapify.com/v1/ipinfo?apiKey={api_key}"
-        response = requests.get(url, timeout=10)
+        response = await get_http_client("geoapify").get(GEOAPIFY_IPINFO_PATH, params=_geoapify_params(client_ip, api_key))
         
         if response.status_code == 200:
-            data = response.json()
-            location_data = {
-                "city": data.get("city", {}).get("name", "Unknown"),
-                "country": data.get("country", {}).get("name", "Unknown"),
-                "state": data.get("state", {}).get("name", "Unknown"),
-                "latitude": data.get("location", {}).get("latitude"),
-                "longitude": data.get("location", {}).get("longitude"),
-                "detected_via": "IP geolocation"
-            }
+            location_data = canonicalize_location(_parse_location_response(response.json()))
             logger.info(f"Detected location: {location_data['city']}, {location_data['state']}")
             return location_data
         else:
@@ -201,33 +405,117 @@ def detect_user_location():
         logger.error(error_msg)
         return {"error": error_msg}
 
+# ===== LOCATION / WEATHER CACHES =====
+# Entries stay readable for a while after they expire so a cached response can
+# be served from slightly stale context while it is refreshed in the background.
+location_cache = TTLCache(
+    LOCATION_CACHE_MAX_ENTRIES,
+    LOCATION_CACHE_TTL_SECONDS,
+    max_stale=LOCATION_CACHE_MAX_STALE_SECONDS,
+    name="location"
+)
+weather_cache = TTLCache(
+    WEATHER_CACHE_MAX_ENTRIES,
+    WEATHER_CACHE_TTL_SECONDS,
+    max_stale=WEATHER_CACHE_MAX_STALE_SECONDS,
+    name="weather"
+)
+
+def _is_cacheable_location(location_data):
+    return bool(location_data) and "error" not in location_data
+
+def location_cache_key(client_ip):
+    """One entry per public client IP; private/unknown addresses resolve to the server's location"""
+    return f"ip:{client_ip}" if client_ip and is_public_address(client_ip) else "ip:server"
+
+def detect_user_location(client_ip=None):
+    """Detect the location of the client's IP (cached per IP)"""
+    return location_cache.get_or_load(
+        location_cache_key(client_ip), lambda: _fetch_user_location(client_ip), cache_if=_is_cacheable_location
+    )
+
+async def detect_user_location_async(client_ip=None):
+    """Non-blocking version of detect_user_location"""
+    return await location_cache.get_or_load_async(
+        location_cache_key(client_ip), lambda: _fetch_user_location_async(client_ip), cache_if=_is_cacheable_location
+    )
+
+def _normalize_place_name(name):
+    """Case/whitespace/punctuation-folded place name for cache keys"""
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in str(name).lower())
+    return " ".join(cleaned.split())
+
+def weather_cache_key(latitude, longitude, location_name):
+    """Cache key: lat/lon snapped to a grid cell, else the normalized place name"""
+    if latitude and longitude:
+        lat_cell = round(float(latitude) / WEATHER_GRID_DEGREES) * WEATHER_GRID_DEGREES
+        lon_cell = round(float(longitude) / WEATHER_GRID_DEGREES) * WEATHER_GRID_DEGREES
+        return f"grid:{lat_cell:.3f},{lon_cell:.3f}"
+    return f"name:{_normalize_place_name(location_name)}"
+
+def _is_cacheable_weather(weather_data):
+    return bool(weather_data) and "error" not in weather_data
+
 def get_weather_data(latitude, longitude, location_name):
-    """Get current weather data for a location"""
+    """Get current weather data for a location (cached, concurrent misses coalesced)"""
+    return weather_cache.get_or_load(
+        weather_cache_key(latitude, longitude, location_name),
+        lambda: _fetch_weather_data(latitude, longitude, location_name),
+        cache_if=_is_cacheable_weather
+    )
+
+async def get_weather_data_async(latitude, longitude, location_name):
+    """Non-blocking version of get_weather_data"""
+    return await weather_cache.get_or_load_async(
+        weather_cache_key(latitude, longitude, location_name),
+        lambda: _fetch_weather_data_async(latitude, longitude, location_name),
+        cache_if=_is_cacheable_weather
+    )
+
+def weather_cache_stats():
+    """Hit/miss counters for the weather cache"""
+    return weather_cache.stats()
+
+def location_cache_stats():
+    """Hit/miss counters for the detected-location cache"""
+    return location_cache.stats()
+
+def _fetch_weather_data(latitude, longitude, location_name):
+    """Get current weather data for a location from OpenWeather"""
     try:
         api_key = os.getenv("OPENWEATHER_API_KEY")
         if not api_key:
             return {"error": "OPENWEATHER_API_KEY not found in environment variables"}
         
         # Use coordinates if available, otherwise fall back to location name
-        if latitude and longitude:
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={api_key}&units=metric"
+        params = _weather_params(latitude, longitude, location_name, api_key)
+        response = get_sync_http_client("openweather").get(OPENWEATHER_PATH, params=params)
+        
+        if response.status_code == 200:
+            weather_data = _parse_weather_response(response.json(), location_name)
+            logger.info(f"Weather data retrieved for {weather_data['location']}")
+            return weather_data
         else:
-            url = f"https://api.openweathermap.org/data/2.5/weather?q={location_name}&appid={api_key}&units=metric"
+            error_msg = f"Failed to get weather data: HTTP {response.status_code}"
+            logger.error(error_msg)
+            return {"error": error_msg}
+    except Exception as e:
+        error_msg = f"Weather API error: {str(e)}"
+        logger.error(error_msg)
+        return {"error": error_msg}
+
+async def _fetch_weather_data_async(latitude, longitude, location_name):
+    """Non-blocking version of _fetch_weather_data"""
+    try:
+        api_key = os.getenv("OPENWEATHER_API_KEY")
+        if not api_key:
+            return {"error": "OPENWEATHER_API_KEY not found in environment variables"}
         
-        response = requests.get(url, timeout=10)
+        params = _weather_params(latitude, longitude, location_name, api_key)
+        response = await get_http_client("openweather").get(OPENWEATHER_PATH, params=params)
         
         if response.status_code == 200:
-            data = response.json()
-            weather_data = {
-                "location": data.get("name", location_name),
-                "temperature": data["main"].get("temp", "N/A"),
-                "feels_like": data["main"].get("feels_like", "N/A"),
-                "humidity": data["main"].get("humidity", "N/A"),
-                "conditions": data["weather"][0].get("description", "N/A"),
-                "wind_speed": data["wind"].get("speed", "N/A"),
-                "pressure": data["main"].get("pressure", "N/A"),
-                "visibility": data.get("visibility", "N/A")
-            }
+            weather_data = _parse_weather_response(response.json(), location_name)
             logger.info(f"Weather data retrieved for {weather_data['location']}")
             return weather_data
         else:
@@ -263,96 +551,13 @@ def get_seasonal_info():
         "month": current_month
     }
 
-def needs_location_detection(query):
+def needs_location_detection(query, features=None):
     """Determine if query needs location detection"""
-    location_keywords = [
-        "weather", "temperature", "forecast", "rain", "sunny", 
-        "humidity", "climate", "local", "here", "my area", "region",
-        "location", "where am i", "my location", "this area"
-    ]
-    
-    crop_keywords = [
-        "crop", "crops", "farming", "agriculture", "planting", 
-        "cultivation", "grow", "growing", "plant", "harvest"
-    ]
-    
-    query_lower = query.lower()
-    
-    # Always detect location for weather/temperature queries
-    if any(keyword in query_lower for keyword in location_keywords):
-        return True
-    
-    # Detect location for crop-related queries that mention location
-    if any(keyword in query_lower for keyword in crop_keywords):
-        if "my" in query_lower or "here" in query_lower or "this" in query_lower:
-            return True
-    
-    return False
+    return (features or analyze_query(query)).needs_location
 
-def extract_location_from_query(query):
-    """Extract location from query if explicitly mentioned"""
-    query_lower = query.lower()
-    
-    # First, check for special phrases that should NOT be treated as locations
-    special_phrases = ["current location", "my location", "here", "this area", "my area"]
-    if any(phrase in query_lower for phrase in special_phrases):
-        return None
-    
-    # Pattern 1: Common location indicators followed by location
-    location_indicators = ["in ", "at ", "near ", "around ", "for ", "of "]
-    
-    for indicator in location_indicators:
-        if indicator in query_lower:
-            # Extract the words after the indicator
-            parts = query_lower.split(indicator)
-            if len(parts) > 1:
-                # Take the next 1-2 words as potential location
-                potential_words = parts[1].split()[:2]
-                potential_location = " ".join(potential_words)
-                # Check if it's not a special phrase
-                if len(potential_location) > 2 and potential_location.lower() not in special_phrases:
-                    return potential_location.title()
-    
-    # Pattern 2: Direct weather/temperature queries about a place
-    weather_patterns = [
-        "temperature of ",
-        "weather in ",
-        "weather at ",
-        "weather of ",
-        "forecast for ",
-        "humidity in ",
-        "rain in "
-    ]
-    
-    for pattern in weather_patterns:
-        if pattern in query_lower:
-            parts = query_lower.split(pattern)
-            if len(parts) > 1:
-                potential_words = parts[1].split()[:2]
-                potential_location = " ".join(potential_words)
-                # Check if it's not a special phrase
-                if len(potential_location) > 2 and potential_location.lower() not in special_phrases:
-                    return potential_location.title()
-    
-    # Pattern 3: Check for common Indian city names anywhere in query
-    cities = ["delhi", "mumbai", "chennai", "kolkata", "bangalore", "hyderabad", 
-                "pune", "jaipur", "ahmedabad", "lucknow", "kanpur", "nagpur", 
-                "indore", "thane", "bhopal", "visakhapatnam", "patna", "ludhiana",
-                "agra", "nashik", "faridabad", "meerut", "rajkot", "varanasi",
-                "srinagar", "amritsar", "allahabad", "howrah", "gwalior", "jodhpur",
-                "raipur", "kota", "chandigarh", "mysore", "bareilly", "guwahati",
-                "jammu", "hubli", "solapur", "trivandrum", "kochi", "coimbatore",
-                "madurai", "jabalpur", "asansol", "dhanbad", "vellore", "ajmer",
-                "kolhapur", "shillong", "ulhasnagar", "jamnagar", "sangli", "bhilai",
-                "guntur", "amravati", "noida", "bhagalpur", "warangal", "ranchi",
-                "kurnool", "gurgaon", "gurugram", "nanded", "dehradun", "durgapur",
-                "ajmer", "kakinada", "nellore", "tiruchirappalli", "ujjain", "muzaffarnagar",]
-    
-    for city in cities:
-        if city in query_lower:
-            return city.title()
-    
-    return None
+def extract_location_from_query(query, features=None):
+    """Gazetteer place (canonical name and coordinates) named in the query, if any"""
+    return (features or analyze_query(query)).location
 
 def is_poor_answer(answer):
     """Check if the answer from Groq is unsatisfactory"""
@@ -407,155 +612,182 @@ def truncate_answer(answer, max_words=150):
         # If no sentence ending found, just return the truncated text
         return truncated
 
+REDUNDANT_PHRASES = [
+    "based on the information provided",
+    "according to the documents",
+    "as mentioned in the context",
+    "to answer your question",
+    "in summary",
+    "to put it simply",
+    "let me explain",
+    "I should mention that",
+    "it's important to note that"
+]
+
 def remove_redundancies(answer):
     """Remove common redundant phrases from answers"""
-    redundancies = [
-        "based on the information provided",
-        "according to the documents",
-        "as mentioned in the context",
-        "to answer your question",
-        "in summary",
-        "to put it simply",
-        "let me explain",
-        "I should mention that",
-        "it's important to note that"
-    ]
-    
-    for phrase in redundancies:
+    for phrase in REDUNDANT_PHRASES:
         answer = answer.replace(phrase, "")
     
     # Clean up extra spaces
     return " ".join(answer.split())
 
-def generate_groq_answer(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
-    """Generate answer using Groq LLM with context and location/weather data"""
-    try:
-        llm = get_groq_llm()
-        
-        # Prepare context from documents
-        context_text = ""
-        if context_docs:
-            context_text = "\n\n".join([doc.page_content[:500] for doc in context_docs[:2]])  # Limit context length
-        
-        # Prepare location and weather context
-        location_context = ""
-        if location_data and "error" not in location_data:
-            location_context = f"User's Location: {location_data.get('city', 'Unknown')}, {location_data.get('state', 'Unknown')}, {location_data.get('country', 'Unknown')}"
-        
-        weather_context = ""
-        if weather_data and "error" not in weather_data:
-            weather_context = f"Current Weather: {weather_data.get('temperature', 'N/A')}°C, {weather_data.get('conditions', 'N/A')}, Humidity: {weather_data.get('humidity', 'N/A')}%"
-        
-        season_context = f"Current Season: {season_info.get('current_season', 'N/A')} - {season_info.get('description', '')}"
-        
-        # Prepare agricultural context
-        agricultural_context = ""
-        if agricultural_alerts:
-            agricultural_context = f"Agricultural Alerts: {', '.join(agricultural_alerts)}"
-        
-        crop_context = ""
-        if crop_suggestions:
-            crop_context = f"Crop Suggestions: {', '.join(crop_suggestions)}"
-        
-        # Create enhanced prompt with emphasis on conciseness
-        prompt_template = PromptTemplate(
-            input_variables=["query", "context", "location", "weather", "season", "alerts", "crops"],
-            template="""
-            You are an expert agricultural assistant. Provide concise, practical answers (max 150 words).
-
-            CONTEXT FROM DOCUMENTS:
-            {context}
-
-            ADDITIONAL INFORMATION:
-            {location}
-            {weather}
-            {season}
-            {alerts}
-            {crops}
-
-            QUESTION: {query}
-
-            INSTRUCTIONS:
-            1. Answer based on the context when possible
-            2. Incorporate location, weather, and seasonal information
-            3. Be concise and practical (under 150 words)
-            4. Focus on actionable advice
-            5. If context doesn't fully answer, provide general agricultural advice
-            6. For crop recommendations, suggest specific crops based on location, weather and season
-            7. Always mention the location and weather conditions in your response
-            8. Include relevant agricultural alerts and crop suggestions if available
-
-            ANSWER:
-            """
-        )
-        
-        prompt = prompt_template.format(
-            query=query,
-            context=context_text,
-            location=location_context,
-            weather=weather_context,
-            season=season_context,
-            alerts=agricultural_context,
-            crops=crop_context
-        )
-        
-        # Generate response
-        response = llm.invoke(prompt)
-        answer = response.content.strip()
-        
-        # Apply conciseness filters
-        answer = remove_redundancies(answer)
-        answer = truncate_answer(answer, 150)
-        
-        return answer
-        
-    except Exception as e:
-        logger.error(f"Groq API error: {str(e)}")
-        raise Exception(f"Failed to generate answer with Groq: {str(e)}")
+class StreamingAnswerFilter:
+    """Incremental version of postprocess_answer for streamed LLM output.
 
-def generate_gemini_answer(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
-    """Generate fallback answer using Gemini"""
-    try:
-        model = get_gemini_model()
-        
-        # Prepare context from documents
-        context_text = ""
-        if context_docs:
-            context_text = "\n\n".join([doc.page_content[:500] for doc in context_docs[:2]])  # Limit context length
-        
-        # Prepare location and weather context
-        location_context = ""
-        if location_data and "error" not in location_data:
-            location_context = f"User's Location: {location_data.get('city', 'Unknown')}, {location_data.get('state', 'Unknown')}, {location_data.get('country', 'Unknown')}"
-        
-        weather_context = ""
-        if weather_data and "error" not in weather_data:
-            weather_context = f"Current Weather: {weather_data.get('temperature', 'N/A')}°C, {weather_data.get('conditions', 'N/A')}, Humidity: {weather_data.get('humidity', 'N/A')}%"
-        
-        season_context = f"Current Season: {season_info.get('current_season', 'N/A')} - {season_info.get('description', '')}"
-        
-        # Prepare agricultural context
-        agricultural_context = ""
-        if agricultural_alerts:
-            agricultural_context = f"Agricultural Alerts: {', '.join(agricultural_alerts)}"
+    feed() takes raw chunks and returns the text that is safe to send: whole
+    words only, with redundant phrases removed and whitespace collapsed. Text
+    that could still turn into a redundant phrase (or is half a word) is held
+    back until the next chunk. Output stops at max_words; the authoritative,
+    sentence-trimmed answer is postprocess_answer(raw_text) at the end.
+    """
+
+    def __init__(self, max_words=150):
+        self.max_words = max_words
+        self.words_sent = 0
+        self.capped = False
+        self._pending = ""
+        self._raw = []
+        self._longest_phrase = max(len(p) for p in REDUNDANT_PHRASES)
+
+    @property
+    def raw_text(self):
+        return "".join(self._raw)
+
+    def _held_back_from(self, text):
+        """Earliest index from which text could still grow into a redundant phrase"""
+        for i in range(max(0, len(text) - self._longest_phrase), len(text)):
+            tail = text[i:]
+            if any(phrase.startswith(tail) for phrase in REDUNDANT_PHRASES):
+                return i
+        return len(text)
+
+    def _emit(self, text):
+        words = text.split()
+        if not words or self.capped:
+            return ""
+        remaining = self.max_words - self.words_sent
+        if len(words) >= remaining:
+            words = words[:remaining]
+            self.capped = True
+        prefix = " " if self.words_sent else ""
+        self.words_sent += len(words)
+        return prefix + " ".join(words)
+
+    def feed(self, chunk):
+        self._raw.append(chunk)
+        if self.capped:
+            return ""
         
-        crop_context = ""
-        if crop_suggestions:
-            crop_context = f"Crop Suggestions: {', '.join(crop_suggestions)}"
+        self._pending = self._pending + chunk
+        for phrase in REDUNDANT_PHRASES:
+            self._pending = self._pending.replace(phrase, "")
         
-        # Create prompt with emphasis on conciseness
-        prompt = f"""
+        # Only complete words before any possible start of a redundant phrase
+        safe_end = self._held_back_from(self._pending)
+        last_space = max(self._pending.rfind(" ", 0, safe_end), self._pending.rfind("\n", 0, safe_end))
+        if last_space <= 0:
+            return ""
+        ready, self._pending = self._pending[:last_space], self._pending[last_space:]
+        return self._emit(ready)
+
+    def finish(self):
+        """Flush whatever is still held back"""
+        text = remove_redundancies(self._pending)
+        self._pending = ""
+        return self._emit(text)
+
+def _build_prompt_context(context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Prepare the document/location/weather/season sections shared by both LLM prompts"""
+    # Prepare context from documents
+    context_text = ""
+    if context_docs:
+        context_text = "\n\n".join([doc.page_content[:500] for doc in context_docs[:2]])  # Limit context length
+    
+    # Prepare location and weather context
+    location_context = ""
+    if location_data and "error" not in location_data:
+        location_context = f"User's Location: {location_data.get('city', 'Unknown')}, {location_data.get('state', 'Unknown')}, {location_data.get('country', 'Unknown')}"
+    
+    weather_context = ""
+    if weather_data and "error" not in weather_data:
+        weather_context = f"Current Weather: {weather_data.get('temperature', 'N/A')}°C, {weather_data.get('conditions', 'N/A')}, Humidity: {weather_data.get('humidity', 'N/A')}%"
+    
+    season_context = f"Current Season: {season_info.get('current_season', 'N/A')} - {season_info.get('description', '')}"
+    
+    # Prepare agricultural context
+    agricultural_context = ""
+    if agricultural_alerts:
+        agricultural_context = f"Agricultural Alerts: {', '.join(agricultural_alerts)}"
+    
+    crop_context = ""
+    if crop_suggestions:
+        crop_context = f"Crop Suggestions: {', '.join(crop_suggestions)}"
+    
+    return {
+        "context": context_text,
+        "location": location_context,
+        "weather": weather_context,
+        "season": season_context,
+        "alerts": agricultural_context,
+        "crops": crop_context
+    }
+
+# Groq prompt, built once at import (emphasis on conciseness)
+GROQ_PROMPT_TEMPLATE = PromptTemplate(
+    input_variables=["query", "context", "location", "weather", "season", "alerts", "crops"],
+    template="""
+    You are an expert agricultural assistant. Provide concise, practical answers (max 150 words).
+
+    CONTEXT FROM DOCUMENTS:
+    {context}
+
+    ADDITIONAL INFORMATION:
+    {location}
+    {weather}
+    {season}
+    {alerts}
+    {crops}
+
+    QUESTION: {query}
+
+    INSTRUCTIONS:
+    1. Answer based on the context when possible
+    2. Incorporate location, weather, and seasonal information
+    3. Be concise and practical (under 150 words)
+    4. Focus on actionable advice
+    5. If context doesn't fully answer, provide general agricultural advice
+    6. For crop recommendations, suggest specific crops based on location, weather and season
+    7. Always mention the location and weather conditions in your response
+    8. Include relevant agricultural alerts and crop suggestions if available
+
+    ANSWER:
+    """
+)
+
+def build_groq_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Build the Groq prompt with context and location/weather data"""
+    sections = _build_prompt_context(context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
+    
+    return GROQ_PROMPT_TEMPLATE.format(query=query, **sections)
+
+def build_gemini_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Build the Gemini fallback prompt"""
+    sections = _build_prompt_context(context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
+    
+    # Create prompt with emphasis on conciseness
+    return f"""
         You are an expert agricultural assistant. Provide concise, practical answers (max 150 words).
 
         CONTEXT FROM DOCUMENTS:
-        {context_text}
+        {sections["context"]}
 
         ADDITIONAL INFORMATION:
-        {location_context}
-        {weather_context}
-        {season_context}
-        {agricultural_context}
-        {crop_context}
+        {sections["location"]}
+        {sections["weather"]}
+        {sections["season"]}
+        {sections["alerts"]}
+        {sections["crops"]}
 
         QUESTION: {query}
 
@@ -571,62 +803,130 @@ def generate_gemini_answer(query, context_docs, location_data, weather_data, sea
 
         ANSWER:
         """
+
+def postprocess_answer(answer):
+    """Apply conciseness filters to a raw LLM answer"""
+    answer = remove_redundancies(answer.strip())
+    return truncate_answer(answer, 150)
+
+def generate_groq_answer(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Generate answer using Groq LLM with context and location/weather data"""
+    try:
+        llm = get_groq_llm()
+        prompt = build_groq_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
         
         # Generate response
-        response = model.generate_content(prompt)
-        answer = response.text.strip()
+        response = llm.invoke(prompt)
+        return postprocess_answer(response.content)
         
-        # Apply conciseness filters
-        answer = remove_redundancies(answer)
-        answer = truncate_answer(answer, 150)
+    except Exception as e:
+        logger.error(f"Groq API error: {str(e)}")
+        raise Exception(f"Failed to generate answer with Groq: {str(e)}")
+
+async def generate_groq_answer_async(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Non-blocking version of generate_groq_answer"""
+    try:
+        llm = get_groq_llm()
+        prompt = build_groq_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
         
-        return answer
+        response = await llm.ainvoke(prompt)
+        return postprocess_answer(response.content)
+        
+    except Exception as e:
+        logger.error(f"Groq API error: {str(e)}")
+        raise Exception(f"Failed to generate answer with Groq: {str(e)}")
+
+def generate_gemini_answer(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Generate fallback answer using Gemini"""
+    try:
+        model = get_gemini_model()
+        prompt = build_gemini_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
+        
+        # Generate response
+        response = model.generate_content(prompt)
+        return postprocess_answer(response.text)
         
     except Exception as e:
         logger.error(f"Gemini API error: {str(e)}")
         raise Exception(f"Failed to generate answer with Gemini: {str(e)}")
 
-def retrieve_relevant_documents(vector_store, query, threshold=0.5):
-    """Retrieve relevant documents using similarity search with threshold"""
+async def generate_gemini_answer_async(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Non-blocking version of generate_gemini_answer"""
     try:
-        # Get embedding model
-        embedding_model = get_embedding_model()
+        model = get_gemini_model()
+        prompt = build_gemini_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
         
-        # Embed the query
-        embedded_query = embedding_model.embed_query(query)
+        response = await model.generate_content_async(prompt)
+        return postprocess_answer(response.text)
         
-        # Perform similarity search
-        docs_and_scores = vector_store.similarity_search_with_score_by_vector(
-            embedded_query, k=5
-        )
+    except Exception as e:
+        logger.error(f"Gemini API error: {str(e)}")
+        raise Exception(f"Failed to generate answer with Gemini: {str(e)}")
+
+async def stream_groq_answer(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Yield raw Groq answer chunks as they arrive"""
+    llm = get_groq_llm()
+    prompt = build_groq_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
+    async for chunk in llm.astream(prompt):
+        if chunk.content:
+            yield chunk.content
+
+async def stream_gemini_answer(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions):
+    """Yield raw Gemini answer chunks as they arrive"""
+    model = get_gemini_model()
+    prompt = build_gemini_prompt(query, context_docs, location_data, weather_data, season_info, agricultural_alerts, crop_suggestions)
+    response = await model.generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+embedding_service = EmbeddingService(
+    get_embedding_model,
+    normalize=lambda query: normalize_query(query),
+    max_batch=EMBEDDING_BATCH_MAX,
+    max_wait_ms=EMBEDDING_BATCH_WAIT_MS,
+    cache_size=EMBEDDING_CACHE_SIZE
+)
+
+def embed_query(query):
+    """Embed a query through the shared cache / micro-batcher"""
+    return embedding_service.embed(query)
+
+def embedding_service_stats():
+    return embedding_service.stats()
+
+def retrieve_relevant_documents(vector_store, query, threshold=COSINE_THRESHOLD, query_vector=None):
+    """Retrieve chunks whose cosine similarity to the query is at least threshold"""
+    try:
+        # Embed the query unless the caller already did
+        embedded_query = query_vector if query_vector is not None else embed_query(query)
         
-        # Filter by threshold
-        filtered_docs = [doc for doc, score in docs_and_scores if score >= threshold]
-        logger.info(f"Retrieved {len(filtered_docs)} relevant documents")
-        return filtered_docs
+        relevant_docs = retrieval.relevant_documents(vector_store, embedded_query, threshold)
+        logger.info(f"Retrieved {len(relevant_docs)} relevant documents")
+        return relevant_docs
         
     except Exception as e:
         logger.error(f"Error retrieving documents: {str(e)}")
         return []
 
-def handle_special_queries(query, location_data, weather_data):
-    """Handle special queries like location and weather directly"""
-    query_lower = query.lower()
-    
-    # Extract location from query first
-    extracted_location = extract_location_from_query(query)
-    
-    # Handle pure weather queries (without crop/agriculture context)
-    weather_terms = ["weather", "temperature", "forecast", "rain", "sunny", "humidity"]
-    is_weather_query = any(term in query_lower for term in weather_terms)
-    is_agricultural_query = any(term in query_lower for term in ["crop", "plant", "grow", "agriculture", "farming"])
-    
-    # Special handling for "current location", "my location", etc.
-    special_location_phrases = ["current location", "my location", "here", "this area", "my area"]
-    is_special_location_query = any(phrase in query_lower for phrase in special_location_phrases)
+def is_direct_answer_query(query, features=None):
+    """True for pure weather/location questions that handle_special_queries answers directly"""
+    features = features or analyze_query(query)
+    return (features.is_weather or features.is_location_only) and not features.is_agri
+
+def handle_special_queries(query, location_data, weather_data, extracted_weather=None, features=None):
+    """Handle special queries like location and weather directly.
+
+    extracted_weather is the weather already fetched for the location named in
+    the query; when given it is reused instead of calling OpenWeather again.
+    """
+    features = features or analyze_query(query)
+    extracted_location = features.location
+    is_weather_query = features.is_weather
+    is_agricultural_query = features.is_agri
     
     # If it's a special location query (like "current location")
-    if is_special_location_query and is_weather_query and not is_agricultural_query:
+    if features.special_phrase and is_weather_query and not is_agricultural_query:
         if weather_data and "error" not in weather_data:
             # Use detected location weather
             location = weather_data.get('location', 'your area')
@@ -639,16 +939,20 @@ def handle_special_queries(query, location_data, weather_data):
     
     # If it's a weather query for a specific extracted location
     elif extracted_location and is_weather_query and not is_agricultural_query:
-        # Get weather for the extracted location
-        weather_data_for_location = get_weather_data(None, None, extracted_location)
+        # Get weather for the extracted location (reuse it if already fetched)
+        weather_data_for_location = extracted_weather
+        if weather_data_for_location is None:
+            weather_data_for_location = get_weather_data(
+                extracted_location.latitude, extracted_location.longitude, extracted_location.name
+            )
         if weather_data_for_location and "error" not in weather_data_for_location:
-            location = weather_data_for_location.get('location', extracted_location)
+            location = extracted_location.name
             temp = weather_data_for_location.get('temperature', 'N/A')
             conditions = weather_data_for_location.get('conditions', 'N/A')
             humidity = weather_data_for_location.get('humidity', 'N/A')
             return f"Weather in {location}: {temp}°C, {conditions}, Humidity: {humidity}%."
         else:
-            return f"Could not retrieve weather data for {extracted_location}."
+            return f"Could not retrieve weather data for {extracted_location.name}."
     
     # If it's a weather query without agricultural context but no specific location
     elif is_weather_query and not is_agricultural_query and not extracted_location:
@@ -663,8 +967,7 @@ def handle_special_queries(query, location_data, weather_data):
             return "I couldn't retrieve weather data. Please ensure your OPENWEATHER_API_KEY is set correctly."
     
     # Handle pure location queries (without crop context)
-    location_only_terms = ["location", "where am i", "my location", "this area"]
-    if any(term in query_lower for term in location_only_terms) and not is_agricultural_query:
+    if features.is_location_only and not is_agricultural_query:
         if location_data and "error" not in location_data:
             return f"Your current location is {location_data.get('city', 'Unknown')}, {location_data.get('state', 'Unknown')}, {location_data.get('country', 'Unknown')}."
         else:
@@ -673,35 +976,136 @@ def handle_special_queries(query, location_data, weather_data):
     return None
 
 # ===== RESPONSE CACHING IMPLEMENTATION =====
+def normalize_query(query):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in query.lower())
+    return " ".join(cleaned.split())
+
+def weather_bucket(weather_data):
+    """Coarse weather class: temperature band, humidity band and condition class.
+
+    Band edges line up with the thresholds in get_agricultural_alerts, so two
+    readings in the same bucket produce the same alerts.
+    """
+    if not weather_data or "error" in weather_data:
+        return "none"
+    
+    temp = weather_data.get("temperature")
+    temp_band = int(temp // TEMPERATURE_BAND_DEGREES * TEMPERATURE_BAND_DEGREES) if isinstance(temp, (int, float)) else "na"
+    
+    humidity = weather_data.get("humidity")
+    if not isinstance(humidity, (int, float)):
+        humidity_band = "na"
+    elif humidity > 80:
+        humidity_band = "high"
+    elif humidity < 30:
+        humidity_band = "low"
+    else:
+        humidity_band = "normal"
+    
+    conditions = str(weather_data.get("conditions", "")).lower()
+    condition_classes = [
+        ("storm", ["thunder", "storm", "cyclone", "squall", "tornado"]),
+        ("rain", ["rain", "drizzle", "shower"]),
+        ("snow", ["snow", "sleet"]),
+        ("haze", ["mist", "fog", "haze", "smoke", "dust", "sand"]),
+        ("clouds", ["cloud"]),
+        ("clear", ["clear"]),
+    ]
+    condition = next((name for name, words in condition_classes if any(w in conditions for w in words)), "other")
+    
+    return f"{temp_band}|{humidity_band}|{condition}"
+
 def get_query_hash(query, location_data, weather_data):
-    """Generate a unique hash for the query and context"""
-    # Create a string representation of the query and context
-    context_str = f"{query}_{location_data.get('city', '')}_{weather_data.get('temperature', '')}"
+    """Cache key from the normalized query, location, season and weather bucket.
+
+    Unlike the live temperature, the bucket is stable across small weather
+    changes, so the key can be computed from cached (even stale) location and
+    weather before any upstream call is made.
+    """
+    location_data = location_data if location_data and "error" not in location_data else {}
+    location_str = f"{_normalize_place_name(location_data.get('city', ''))},{_normalize_place_name(location_data.get('state', ''))}"
+    season = get_seasonal_info()["current_season"]
+    context_str = f"{normalize_query(query)}|{location_str}|{season}|{weather_bucket(weather_data)}"
     
     # Generate MD5 hash
     return hashlib.md5(context_str.encode()).hexdigest()
 
-def check_cache(query_hash):
-    """Check if response is in cache and still valid"""
-    cache_file = os.path.join(CACHE_DIR, f"{query_hash}.pkl")
-    
-    if not os.path.exists(cache_file):
-        return None
-    
-    # Check if cache is expired
-    cache_time = os.path.getmtime(cache_file)
-    current_time = datetime.now().timestamp()
-    cache_age_hours = (current_time - cache_time) / 3600
+def resolve_cached_context(query, needs_location, features=None, client_ip=None):
+    """Location and weather from the local caches only, with no network call.
+
+    Returns (location_data, weather_data, is_stale), or None when the context
+    is not cached.
+    """
+    if not needs_location:
+        return {}, {}, False
+    
+    mode, place = plan_location_lookup(query, features)
+    if mode == "query":
+        location_data, location_fresh = place_to_location(place), True
+    else:
+        location_data, location_fresh = location_cache.peek(location_cache_key(client_ip), allow_stale=True)
+        if location_data is None:
+            return None
     
-    if cache_age_hours > CACHE_EXPIRY_HOURS:
-        os.remove(cache_file)  # Remove expired cache
+    weather_data, weather_fresh = weather_cache.peek(
+        weather_cache_key(location_data.get("latitude"), location_data.get("longitude"), location_data.get("city", "Unknown")),
+        allow_stale=True
+    )
+    if weather_data is None:
         return None
     
-    # Load cached response
+    return location_data, weather_data, not (location_fresh and weather_fresh)
+
+def check_cache_before_upstream(query, needs_location, features=None, client_ip=None):
+    """Level-1 cache check using cached/stale location and weather.
+
+    Returns (cached_response, is_stale); cached_response is None on a miss.
+    """
+    # Pure weather/location questions need live data and are answered directly
+    if is_direct_answer_query(query, features):
+        return None, False
+    
+    cached_context = resolve_cached_context(query, needs_location, features, client_ip)
+    if cached_context is None:
+        return None, False
+    
+    location_data, weather_data, is_stale = cached_context
+    return check_cache(get_query_hash(query, location_data, weather_data)), is_stale
+
+def _revalidate_context(query, features=None, client_ip=None):
+    """Refresh stale location/weather cache entries in a background thread"""
+    threading.Thread(target=resolve_location_and_weather, args=(query, features, client_ip), daemon=True).start()
+
+_revalidation_tasks = set()
+
+def _revalidate_context_async(query, features=None, client_ip=None):
+    """Refresh stale location/weather cache entries without blocking the response"""
+    task = asyncio.create_task(resolve_location_and_weather_async(query, features, client_ip))
+    _revalidation_tasks.add(task)
+    task.add_done_callback(_revalidation_tasks.discard)
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Process-wide response cache (memory LRU + persistent tier)"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = create_response_cache(
+                    os.path.join(CACHE_DIR, "responses.sqlite3"),
+                    CACHE_EXPIRY_HOURS * 3600
+                )
+    return _response_cache
+
+def check_cache(query_hash):
+    """Check if response is in cache and still valid"""
     try:
-        with open(cache_file, 'rb') as f:
-            cached_data = pickle.load(f)
-        logger.info("Response retrieved from cache")
+        cached_data = get_response_cache().get(query_hash)
+        if cached_data is not None:
+            logger.info("Response retrieved from cache")
         return cached_data
     except Exception as e:
         logger.error(f"Error reading cache: {str(e)}")
@@ -710,13 +1114,86 @@ def check_cache(query_hash):
 def save_to_cache(query_hash, response_data):
     """Save response to cache"""
     try:
-        cache_file = os.path.join(CACHE_DIR, f"{query_hash}.pkl")
-        with open(cache_file, 'wb') as f:
-            pickle.dump(response_data, f)
+        get_response_cache().set(query_hash, response_data)
         logger.info("Response saved to cache")
     except Exception as e:
         logger.error(f"Error saving to cache: {str(e)}")
 
+def claim_response(query_hash):
+    """Single-flight claim on a response cache key; None means just compute the answer"""
+    try:
+        return get_response_cache().claim(query_hash)
+    except Exception as e:
+        logger.error(f"Error claiming response: {str(e)}")
+        return None
+
+async def claim_response_async(query_hash):
+    """claim_response for the async pipeline (waits on other workers without holding a thread)"""
+    try:
+        return await get_response_cache().claim_async(query_hash)
+    except Exception as e:
+        logger.error(f"Error claiming response: {str(e)}")
+        return None
+
+def response_cache_stats():
+    """Counters for the response cache tiers"""
+    return get_response_cache().stats()
+
+# ===== SEMANTIC RESPONSE CACHE =====
+# Catches rephrasings ("how to grow wheat in punjab" / "How do I grow wheat
+# in Punjab?") that the exact-hash cache above misses.
+semantic_cache = SemanticCache(
+    EMBEDDING_DIM,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    max_scopes=SEMANTIC_CACHE_MAX_SCOPES,
+    ttl=CACHE_EXPIRY_HOURS * 3600
+)
+
+def semantic_cache_scope(location_data, season_info):
+    """Answers are only shared between queries for the same place and season"""
+    location_data = location_data if location_data and "error" not in location_data else {}
+    city = _normalize_place_name(location_data.get("city") or "unknown")
+    region = _normalize_place_name(location_data.get("state") or "")
+    return f"{city}|{region}|{season_info.get('current_season', '')}"
+
+def semantic_cache_response(query_vector, state, season_info):
+    """Build a response from a cached near-duplicate answer, or None"""
+    if not SEMANTIC_CACHE_ENABLED or query_vector is None:
+        return None
+    try:
+        match = semantic_cache.lookup(semantic_cache_scope(state["user_location"], season_info), query_vector)
+    except Exception as e:
+        logger.error(f"Semantic cache lookup failed: {str(e)}")
+        return None
+    if match is None:
+        return None
+    
+    cached, similarity = match
+    logger.info(f"Semantic cache hit (cosine {similarity:.3f})")
+    state["answer"] = cached["answer"]
+    state["llm_source"] = cached["llm_source"]
+    response = format_response(state, season_info)
+    response["sources"] = cached["sources"]
+    return response
+
+def semantic_cache_store(query_vector, state, response):
+    """Remember a good LLM answer for future near-duplicate questions"""
+    if not SEMANTIC_CACHE_ENABLED or query_vector is None or is_poor_answer(state["answer"]):
+        return
+    try:
+        semantic_cache.add(
+            semantic_cache_scope(state["user_location"], response["season"]),
+            query_vector,
+            {"answer": state["answer"], "llm_source": state["llm_source"], "sources": response["sources"]}
+        )
+    except Exception as e:
+        logger.error(f"Semantic cache store failed: {str(e)}")
+
+def semantic_cache_stats():
+    """Hit-rate and size of the semantic cache"""
+    return semantic_cache.stats()
+
 # ===== AGRICULTURAL ENHANCEMENTS =====
 def get_agricultural_alerts(weather_data, season_info):
     """Generate agricultural alerts based on weather conditions and season"""
@@ -799,41 +1276,9 @@ def get_crop_suggestions(location_data, weather_data, season_info):
     
     # Limit to top 5 suggestions
     return suggestions[:5]
-def is_agricultural_query(query):
-    """Determine if the query is related to agriculture"""
-    agricultural_keywords = [
-        "crop", "crops", "farming", "agriculture", "plant", "plants", "harvest",
-        "soil", "fertilizer", "irrigation", "pesticide", "cultivation", "grow",
-        "growing", "farm", "farmer", "yield", "season", "monsoon", "rabi", "kharif",
-        "vegetable", "fruit", "grain", "cereal", "pulse", "oilseed", "horticulture",
-        "animal husbandry", "livestock", "dairy", "poultry", "fishery", "aquaculture",
-        "weather", "rain", "temperature", "climate", "drought", "flood", "monsoon", "storm",
-        "soil health", "crop rotation", "organic farming", "sustainable agriculture",
-        "agroforestry", "permaculture", "greenhouse", "hydroponics", "aquaponics",
-        "agricultural practices", "agricultural technology", "precision farming",
-        "smart farming", "vertical farming", "urban farming", "agricultural research",
-        "agricultural policy", "agricultural economics", "food security", "rural development",
-        "agricultural extension", "agricultural education", "agricultural marketing","sow",
-        "wheat","rice","maize","millet","barley","sugarcane","cotton","soybean","groundnut","mustard",
-        "peas","chickpeas","potato","onion","garlic","turmeric","pulses"
-    ]
-    
-    query_lower = query.lower()
-    
-    # Check for agricultural keywords
-    if any(keyword in query_lower for keyword in agricultural_keywords):
-        return True
-    
-    # Check if it's a location/weather query (which we handle in our system)
-    location_weather_keywords = [
-        "weather", "temperature", "forecast", "rain", "humidity", "climate",
-        "location", "where am i", "my location", "this area"
-    ]
-    
-    if any(keyword in query_lower for keyword in location_weather_keywords):
-        return True
-    
-    return False
+def is_agricultural_query(query, features=None):
+    """Determine if the query is related to agriculture (or is a weather/location question we answer)"""
+    return (features or analyze_query(query)).in_domain
 
 def handle_non_agricultural_query(query):
     """Handle queries that are not related to agriculture"""
@@ -846,16 +1291,75 @@ def handle_non_agricultural_query(query):
         "crop_suggestions": []
     }
 
-def process_query(query):
-    """Main function to process a user query"""
-    logger.info(f"Processing query: {query}")
+def plan_location_lookup(query, features=None):
+    """Decide where the location for a query comes from.
+
+    Returns ("detect", None) when the user's physical location must be
+    detected, or ("query", place) when the query names a gazetteer place.
+    """
+    features = features or analyze_query(query)
     
-    # First check if this is an agricultural query
-    if not is_agricultural_query(query):
-        return handle_non_agricultural_query(query)
+    # Special location phrases like "current location" mean the user's own location
+    if features.special_phrase:
+        return "detect", None
     
-    # Initialize state
-    state = AgentState(
+    # For regular queries, use the location named in the query if any
+    if features.location:
+        return "query", features.location
+    
+    # No location in query, detect the user's physical location
+    return "detect", None
+
+def resolve_location_and_weather(query, features=None, client_ip=None):
+    """Resolve the user's location and fetch its weather"""
+    mode, place = plan_location_lookup(query, features)
+    
+    if mode == "query":
+        # Use the location named in the query, looked up by its coordinates
+        logger.info(f"Using location extracted from query: {place.name}, {place.state}")
+        location_data = place_to_location(place)
+        return location_data, get_weather_data(place.latitude, place.longitude, place.name)
+    
+    logger.info("Detecting user location...")
+    location_data = detect_user_location(client_ip)
+    if "error" in location_data:
+        return location_data, {}
+    
+    # Get weather data for the user's detected location
+    logger.info("Fetching weather data for user location...")
+    weather_data = get_weather_data(
+        location_data.get("latitude"),
+        location_data.get("longitude"),
+        location_data.get("city", "Unknown")
+    )
+    return location_data, weather_data
+
+async def resolve_location_and_weather_async(query, features=None, client_ip=None):
+    """Non-blocking version of resolve_location_and_weather"""
+    mode, place = plan_location_lookup(query, features)
+    
+    if mode == "query":
+        logger.info(f"Using location extracted from query: {place.name}, {place.state}")
+        location_data = place_to_location(place)
+        return location_data, await get_weather_data_async(place.latitude, place.longitude, place.name)
+    
+    logger.info("Detecting user location...")
+    location_data = await detect_user_location_async(client_ip)
+    if "error" in location_data:
+        return location_data, {}
+    
+    logger.info("Fetching weather data for user location...")
+    weather_data = await get_weather_data_async(
+        location_data.get("latitude"),
+        location_data.get("longitude"),
+        location_data.get("city", "Unknown")
+    )
+    return location_data, weather_data
+
+def _new_state(query, features=None):
+    """Initial pipeline state for a query"""
+    features = features or analyze_query(query)
+    return AgentState(
         query=query,
         documents=None,
         answer="",
@@ -864,99 +1368,90 @@ def process_query(query):
         user_location={},
         llm_source="",
         error=None,
-        needs_location=False,
+        needs_location=features.needs_location,
+        features=features,
         agricultural_alerts=[],
         crop_suggestions=[]
     )
+
+def _special_query_response(state, special_answer):
+    """Response for pure location/weather queries answered without the LLM"""
+    return {
+        "query": state["query"],
+        "answer": special_answer,
+        "llm_source": "Direct API Response",
+        "sources": [],
+        "location": state["user_location"] if "error" not in state["user_location"] else {},
+        "weather": state["weather_data"] if "error" not in state["weather_data"] else {},
+        "season": get_seasonal_info(),
+        "agricultural_alerts": [],
+        "crop_suggestions": []
+    }
+
+def _extracted_weather(state):
+    """Weather already fetched for a location named in the query, if any"""
+    if state["user_location"].get("detected_via") == "query extraction":
+        return state["weather_data"]
+    return None
+
+def process_query(query, client_ip=None):
+    """Main function to process a user query"""
+    logger.info(f"Processing query: {query}")
+    
+    # Scan the query once; every step below reuses these features
+    features = analyze_query(query)
+    
+    # First check if this is an agricultural query
+    if not is_agricultural_query(query, features):
+        return handle_non_agricultural_query(query)
+    
+    # Initialize state (Step 1: needs_location comes from the features)
+    state = _new_state(query, features)
+    flight = None
     
     try:
-        # Step 1: Get vector store
+        # Step 2: Answer repeat questions from cache with zero upstream calls
+        cached_response, is_stale = check_cache_before_upstream(query, state["needs_location"], features, client_ip)
+        if cached_response:
+            if is_stale and STALE_WHILE_REVALIDATE:
+                _revalidate_context(query, features, client_ip)
+            return cached_response
+        
+        # Step 2b: Get vector store
         vector_store = get_vector_store()
         if not vector_store:
             return {"error": "Failed to initialize document database"}
         
         state["documents"] = vector_store
         
-        # Step 2: Check if location detection is needed
-        state["needs_location"] = needs_location_detection(query)
-        
         # Step 3: Handle location detection and weather data
         if state["needs_location"]:
-            # FIRST, check for special location phrases like "current location"
-            query_lower = query.lower()
-            special_location_phrases = ["current location", "my location", "here", "this area", "my area"]
-            is_special_location_query = any(phrase in query_lower for phrase in special_location_phrases)
-            
-            if is_special_location_query:
-                # For special location queries, detect the user's physical location
-                logger.info("Special location query detected. Detecting user location...")
-                location_data = detect_user_location()
-                state["user_location"] = location_data
-                
-                # Get weather data for the user's detected location
-                if "error" not in location_data:
-                    logger.info("Fetching weather data for user location...")
-                    weather_data = get_weather_data(
-                        location_data.get("latitude"),
-                        location_data.get("longitude"),
-                        location_data.get("city", "Unknown")
-                    )
-                    state["weather_data"] = weather_data
-            else:
-                # For regular queries, extract location from query if mentioned
-                extracted_location = extract_location_from_query(query)
-                
-                if extracted_location:
-                    # Use the location extracted from the query
-                    logger.info(f"Using location extracted from query: {extracted_location}")
-                    state["user_location"] = {
-                        "city": extracted_location,
-                        "detected_via": "query extraction"
-                    }
-                    # Get weather for the extracted location
-                    weather_data = get_weather_data(None, None, extracted_location)
-                    state["weather_data"] = weather_data
-                else:
-                    # No location in query, detect the user's physical location
-                    logger.info("No location found in query. Detecting user location...")
-                    location_data = detect_user_location()
-                    state["user_location"] = location_data
-                    
-                    # Get weather data for the user's detected location
-                    if "error" not in location_data:
-                        logger.info("Fetching weather data for user location...")
-                        weather_data = get_weather_data(
-                            location_data.get("latitude"),
-                            location_data.get("longitude"),
-                            location_data.get("city", "Unknown")
-                        )
-                        state["weather_data"] = weather_data
+            state["user_location"], state["weather_data"] = resolve_location_and_weather(query, features, client_ip)
             
         # Step 4: Check for special queries (only pure location/weather queries)
-        special_answer = handle_special_queries(query, state["user_location"], state["weather_data"])
+        special_answer = handle_special_queries(
+            query, state["user_location"], state["weather_data"], _extracted_weather(state), features
+        )
         if special_answer:
-            return {
-                "query": query,
-                "answer": special_answer,
-                "llm_source": "Direct API Response",
-                "sources": [],
-                "location": state["user_location"] if "error" not in state["user_location"] else {},
-                "weather": state["weather_data"] if "error" not in state["weather_data"] else {},
-                "season": get_seasonal_info(),
-                "agricultural_alerts": [],
-                "crop_suggestions": []
-            }
+            return _special_query_response(state, special_answer)
         
-        # Rest of the function remains the same...
-        # Step 5: Check cache before processing
+        # Step 5: Check cache again with the fresh location/weather
         query_hash = get_query_hash(query, state["user_location"], state["weather_data"])
         cached_response = check_cache(query_hash)
         if cached_response:
             return cached_response
         
+        # Step 5b: If the same question is already being answered, wait for that answer
+        flight = claim_response(query_hash)
+        if flight is not None and not flight.leader:
+            shared_response = flight.result()
+            if shared_response is not None:
+                return shared_response
+            flight = None
+        
         # Step 6: Retrieve relevant documents
         logger.info("Retrieving relevant documents...")
-        relevant_docs = retrieve_relevant_documents(vector_store, query, COSINE_THRESHOLD)
+        query_vector, relevant_docs = embed_and_retrieve(vector_store, query, COSINE_THRESHOLD)
         state["source_documents"] = relevant_docs
         
         # Step 7: Get seasonal information
@@ -966,45 +1461,38 @@ def process_query(query):
         state["agricultural_alerts"] = get_agricultural_alerts(state["weather_data"], season_info)
         state["crop_suggestions"] = get_crop_suggestions(state["user_location"], state["weather_data"], season_info)
         
+        # Step 8b: Reuse the answer to a near-duplicate question if we have one
+        semantic_response = semantic_cache_response(query_vector, state, season_info)
+        if semantic_response:
+            save_to_cache(query_hash, semantic_response)
+            if flight:
+                flight.finish(semantic_response)
+            return semantic_response
+        
         # Step 9: Generate answer with Groq (primary)
+        llm_args = (
+            query,
+            relevant_docs,
+            state["user_location"],
+            state["weather_data"],
+            season_info,
+            state["agricultural_alerts"],
+            state["crop_suggestions"]
+        )
         logger.info("Generating answer with Groq...")
         try:
-            answer = generate_groq_answer(
-                query, 
-                relevant_docs, 
-                state["user_location"], 
-                state["weather_data"], 
-                season_info,
-                state["agricultural_alerts"],
-                state["crop_suggestions"]
-            )
+            answer = generate_groq_answer(*llm_args)
             state["llm_source"] = "Groq (Llama 3.1)"
             
             # Check if answer is poor and fallback to Gemini if needed
             if is_poor_answer(answer):
                 logger.info("Groq answer unsatisfactory, falling back to Gemini...")
-                answer = generate_gemini_answer(
-                    query, 
-                    relevant_docs, 
-                    state["user_location"], 
-                    state["weather_data"], 
-                    season_info,
-                    state["agricultural_alerts"],
-                    state["crop_suggestions"]
-                )
+                answer = generate_gemini_answer(*llm_args)
                 state["llm_source"] = "Gemini (Fallback)"
                 
         except Exception as e:
             logger.error(f"Groq failed, falling back to Gemini: {str(e)}")
-            answer = generate_gemini_answer(
-                query, 
-                relevant_docs, 
-                state["user_location"], 
-                state["weather_data"], 
-                season_info,
-                state["agricultural_alerts"],
-                state["crop_suggestions"]
-            )
+            answer = generate_gemini_answer(*llm_args)
             state["llm_source"] = "Gemini (Fallback)"
         
         state["answer"] = answer
@@ -1012,6 +1500,9 @@ def process_query(query):
         # Step 10: Format response and save to cache
         response = format_response(state, season_info)
         save_to_cache(query_hash, response)
+        semantic_cache_store(query_vector, state, response)
+        if flight:
+            flight.finish(response)
         
         return response
         
@@ -1019,6 +1510,412 @@ def process_query(query):
         error_msg = f"Error processing query: {str(e)}"
         logger.error(error_msg)
         return {"error": error_msg}
+    finally:
+        # On failure the waiting duplicates compute their own answers
+        if flight:
+            flight.finish()
+
+def embed_and_retrieve(vector_store, query, threshold=COSINE_THRESHOLD):
+    """Embed the query once; return (query_vector, relevant_docs)"""
+    try:
+        query_vector = embed_query(query)
+    except Exception as e:
+        logger.error(f"Error embedding query: {str(e)}")
+        return None, []
+    return query_vector, retrieve_relevant_documents(vector_store, query, threshold, query_vector)
+
+async def embed_and_retrieve_async(vector_store, query, threshold=COSINE_THRESHOLD):
+    """Embed via the micro-batcher without holding a thread, then search in a worker thread"""
+    try:
+        query_vector = await embedding_service.embed_async(query)
+    except Exception as e:
+        logger.error(f"Error embedding query: {str(e)}")
+        return None, []
+    relevant_docs = await asyncio.to_thread(retrieve_relevant_documents, vector_store, query, threshold, query_vector)
+    return query_vector, relevant_docs
+
+# ===== LLM DISPATCH =====
+llm_dispatcher = LLMDispatcher(
+    LLMProvider("groq", "Groq (Llama 3.1)", generate_groq_answer_async, GROQ_TIMEOUT_SECONDS),
+    LLMProvider("gemini", "Gemini (Fallback)", generate_gemini_answer_async, GEMINI_TIMEOUT_SECONDS),
+    is_acceptable=lambda answer: not is_poor_answer(answer),
+    strategy=LLM_DISPATCH_STRATEGY,
+    hedge_delay=LLM_HEDGE_DELAY_SECONDS
+)
+
+def llm_dispatch_stats():
+    """Which LLM path won, timeouts/errors and recent latencies"""
+    return llm_dispatcher.stats()
+
+async def _resolved(value):
+    return value
+
+async def _prepare_query_async(query, client_ip=None, prefetched=None):
+    """Front half of the async pipeline, shared by /chat, /chat/stream and /chat/batch.
+
+    Returns (response, None) when the query is answered without the LLM
+    (non-agricultural, special query, exact or semantic cache hit), otherwise
+    (None, context) with everything needed to generate the answer.
+
+    prefetched carries work the batch endpoint has already done for many
+    queries at once: "features", "retrieval" (query_vector, docs) and
+    "context" (location_data, weather_data).
+    """
+    prefetched = prefetched or {}
+    
+    # Scan the query once; every step below reuses these features
+    features = prefetched.get("features") or analyze_query(query)
+    
+    # First check if this is an agricultural query
+    if not is_agricultural_query(query, features):
+        return handle_non_agricultural_query(query), None
+    
+    state = _new_state(query, features)
+    
+    # Step 0: Answer repeat questions from cache with zero upstream calls
+    cached_response, is_stale = await asyncio.to_thread(
+        check_cache_before_upstream, query, state["needs_location"], features, client_ip
+    )
+    if cached_response:
+        if is_stale and STALE_WHILE_REVALIDATE:
+            _revalidate_context_async(query, features, client_ip)
+        return cached_response, None
+    
+    # Step 1: Get vector store (only blocks while the runtime is still loading)
+    vector_store = get_vector_store() if _runtime["status"] == "ready" else await asyncio.to_thread(get_vector_store)
+    if not vector_store:
+        return {"error": "Failed to initialize document database"}, None
+    
+    state["documents"] = vector_store
+    
+    # Step 2: Start retrieval straight away; it does not depend on location
+    retrieval_task = asyncio.create_task(
+        _resolved(prefetched["retrieval"]) if "retrieval" in prefetched
+        else embed_and_retrieve_async(vector_store, query, COSINE_THRESHOLD)
+    )
+    flight = None
+    
+    try:
+        # Step 3: Location detection -> weather, concurrently with retrieval
+        season_info = get_seasonal_info()
+        if state["needs_location"] and "context" in prefetched:
+            state["user_location"], state["weather_data"] = prefetched["context"]
+        elif state["needs_location"]:
+            state["user_location"], state["weather_data"] = await resolve_location_and_weather_async(query, features, client_ip)
+        
+        # Step 4: Check for special queries (only pure location/weather queries)
+        special_answer = handle_special_queries(
+            query, state["user_location"], state["weather_data"], _extracted_weather(state), features
+        )
+        if special_answer:
+            retrieval_task.cancel()
+            return _special_query_response(state, special_answer), None
+        
+        # Step 5: Check cache again with the fresh location/weather
+        query_hash = get_query_hash(query, state["user_location"], state["weather_data"])
+        cached_response = await asyncio.to_thread(check_cache, query_hash)
+        if cached_response:
+            retrieval_task.cancel()
+            return cached_response, None
+        
+        # Step 5b: If the same question is already being answered, wait for that answer
+        flight = await claim_response_async(query_hash)
+        if flight is not None and not flight.leader:
+            shared_response = await flight.result_async()
+            if shared_response is not None:
+                retrieval_task.cancel()
+                return shared_response, None
+            flight = None
+        
+        # Step 6: Collect the retrieved documents
+        query_vector, relevant_docs = await retrieval_task
+        state["source_documents"] = relevant_docs
+        
+        # Step 7: Generate agricultural insights
+        state["agricultural_alerts"] = get_agricultural_alerts(state["weather_data"], season_info)
+        state["crop_suggestions"] = get_crop_suggestions(state["user_location"], state["weather_data"], season_info)
+        
+        # Step 7b: Reuse the answer to a near-duplicate question if we have one
+        semantic_response = semantic_cache_response(query_vector, state, season_info)
+        if semantic_response:
+            await asyncio.to_thread(save_to_cache, query_hash, semantic_response)
+            if flight:
+                flight.finish(semantic_response)
+            return semantic_response, None
+    except BaseException:
+        retrieval_task.cancel()
+        if flight:
+            flight.finish()
+        raise
+    
+    return None, {
+        "state": state,
+        "season_info": season_info,
+        "query_hash": query_hash,
+        "flight": flight,  # set when this request answers for its concurrent duplicates
+        "query_vector": query_vector,
+        "llm_args": (
+            query,
+            relevant_docs,
+            state["user_location"],
+            state["weather_data"],
+            season_info,
+            state["agricultural_alerts"],
+            state["crop_suggestions"]
+        )
+    }
+
+async def _finish_response_async(context, answer, llm_source):
+    """Format the generated answer, store it in the caches and hand it to waiting duplicates"""
+    state = context["state"]
+    state["answer"] = answer
+    state["llm_source"] = llm_source
+    response = format_response(state, context["season_info"])
+    await asyncio.to_thread(save_to_cache, context["query_hash"], response)
+    semantic_cache_store(context["query_vector"], state, response)
+    _release_flight(context, response)
+    return response
+
+def _release_flight(context, response=None):
+    """End the request's single-flight lead; without a response the waiters compute their own"""
+    if context is not None and context["flight"] is not None:
+        context["flight"].finish(response)
+
+async def process_query_async(query, client_ip=None):
+    """Async version of process_query for the API.
+
+    Network calls are awaited instead of blocking the event loop, CPU-bound
+    embedding/search runs in a worker thread, and document retrieval runs
+    concurrently with location detection -> weather lookup. client_ip is the
+    end user's address, used to locate them when the query names no place.
+    """
+    logger.info(f"Processing query: {query}")
+    context = None
+    
+    try:
+        response, context = await _prepare_query_async(query, client_ip)
+        if response is not None:
+            return response
+        
+        # Step 8: Generate answer (Groq primary, Gemini fallback; see LLM_DISPATCH_STRATEGY)
+        logger.info(f"Generating answer ({llm_dispatcher.strategy} dispatch)...")
+        answer, llm_source = await llm_dispatcher.dispatch(*context["llm_args"])
+        
+        # Step 9: Format response and save to cache
+        return await _finish_response_async(context, answer, llm_source)
+        
+    except Exception as e:
+        error_msg = f"Error processing query: {str(e)}"
+        logger.error(error_msg)
+        return {"error": error_msg}
+    finally:
+        _release_flight(context)
+
+def _response_metadata(response):
+    """The non-answer fields of a response, sent before any tokens"""
+    return {key: response.get(key) for key in ("location", "weather", "season", "agricultural_alerts", "crop_suggestions")}
+
+async def stream_query_events(query, client_ip=None):
+    """Async generator of (event, data) pairs for the SSE endpoint.
+
+    Order: "start" immediately, "metadata" once location/weather/season are
+    known, "token" events while the LLM is generating, then "done" with the
+    final post-processed answer (clients should replace the streamed text
+    with it; it may be trimmed back to the last full sentence). Errors are
+    reported as an "error" event.
+    """
+    logger.info(f"Streaming query: {query}")
+    yield "start", {"query": query, "season": get_seasonal_info()}
+    context = None
+    
+    try:
+        response, context = await _prepare_query_async(query, client_ip)
+        if response is not None:
+            if "error" in response:
+                yield "error", {"error": response["error"]}
+                return
+            yield "metadata", _response_metadata(response)
+            yield "done", response
+            return
+        
+        state = context["state"]
+        yield "metadata", {
+            "location": state["user_location"] if "error" not in state["user_location"] else {},
+            "weather": state["weather_data"] if "error" not in state["weather_data"] else {},
+            "season": context["season_info"],
+            "agricultural_alerts": state["agricultural_alerts"],
+            "crop_suggestions": state["crop_suggestions"]
+        }
+        
+        llm_args = context["llm_args"]
+        answer_filter = StreamingAnswerFilter(150)
+        llm_source = "Groq (Llama 3.1)"
+        try:
+            async for chunk in stream_groq_answer(*llm_args):
+                text = answer_filter.feed(chunk)
+                if text:
+                    yield "token", {"text": text}
+        except Exception as e:
+            if answer_filter.words_sent:
+                raise
+            # Nothing sent yet: switch to Gemini transparently
+            logger.error(f"Groq stream failed, falling back to Gemini: {str(e)}")
+            answer_filter = StreamingAnswerFilter(150)
+            llm_source = "Gemini (Fallback)"
+            async for chunk in stream_gemini_answer(*llm_args):
+                text = answer_filter.feed(chunk)
+                if text:
+                    yield "token", {"text": text}
+        
+        text = answer_filter.finish()
+        if text:
+            yield "token", {"text": text}
+        
+        answer = postprocess_answer(answer_filter.raw_text)
+        if llm_source.startswith("Groq") and is_poor_answer(answer):
+            logger.info("Groq answer unsatisfactory, falling back to Gemini...")
+            answer = await generate_gemini_answer_async(*llm_args)
+            llm_source = "Gemini (Fallback)"
+        
+        yield "done", await _finish_response_async(context, answer, llm_source)
+        
+    except Exception as e:
+        error_msg = f"Error processing query: {str(e)}"
+        logger.error(error_msg)
+        yield "error", {"error": error_msg}
+    finally:
+        # Also runs when the client disconnects mid-stream
+        _release_flight(context)
+
+# ===== BATCH PIPELINE =====
+def _near_duplicate_of(features, vectors):
+    """For each query, the index of an earlier query it can share an answer with (or itself).
+
+    Queries count as near-duplicates when their embeddings are within
+    BATCH_NEAR_DUPLICATE_COSINE and they resolve to the same place and kind
+    of question, so "weather in Pune" and "weather in Nagpur" stay separate.
+    """
+    matrix = np.array(vectors, dtype="float32")
+    matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    similarity = matrix @ matrix.T
+    kinds = [f._replace(crops=tuple(sorted(f.crops))) for f in features]
+    owner = list(range(len(vectors)))
+    for i in range(len(vectors)):
+        for j in range(i):
+            if owner[j] == j and kinds[i] == kinds[j] and similarity[i, j] >= BATCH_NEAR_DUPLICATE_COSINE:
+                owner[i] = j
+                break
+    return owner
+
+async def _answer_prefetched(query, client_ip, prefetched, llm_slots):
+    """Answer one query of a batch; errors become a per-item error result"""
+    context = None
+    try:
+        response, context = await _prepare_query_async(query, client_ip, prefetched)
+        if response is not None:
+            return response
+        async with llm_slots:
+            answer, llm_source = await llm_dispatcher.dispatch(*context["llm_args"])
+        return await _finish_response_async(context, answer, llm_source)
+    except Exception as e:
+        error_msg = f"Error processing query: {str(e)}"
+        logger.error(error_msg)
+        return {"error": error_msg}
+    finally:
+        _release_flight(context)
+
+async def process_queries_batch_async(queries, client_ip=None):
+    """Answer many queries together; returns (results in input order, stats).
+
+    Identical questions (after normalize_query) and near-identical ones are
+    answered once. The remaining queries are embedded in one forward pass and
+    searched with one FAISS call over the query matrix; location/weather is
+    resolved once per distinct place; LLM calls run at most
+    BATCH_LLM_CONCURRENCY at a time. A failure only affects its own items.
+    """
+    started = time.perf_counter()
+    groups = {}  # normalized text -> indices of the queries that share it
+    for i, query in enumerate(queries):
+        groups.setdefault(normalize_query(query) or query, []).append(i)
+    unique = [queries[indices[0]] for indices in groups.values()]
+    features = [analyze_query(query) for query in unique]
+    answers = [None] * len(unique)
+    
+    # Off-topic questions and repeat questions need no retrieval at all
+    for u, query in enumerate(unique):
+        if not is_agricultural_query(query, features[u]):
+            answers[u] = handle_non_agricultural_query(query)
+    candidates = [u for u in range(len(unique)) if answers[u] is None]
+    cached = await asyncio.gather(*(
+        asyncio.to_thread(check_cache_before_upstream, unique[u], features[u].needs_location, features[u], client_ip)
+        for u in candidates
+    ))
+    pending = []
+    for u, (cached_response, _) in zip(candidates, cached):
+        if cached_response:
+            answers[u] = cached_response
+        else:
+            pending.append(u)
+    
+    near_duplicates = 0
+    if pending:
+        vector_store = get_vector_store() if _runtime["status"] == "ready" else await asyncio.to_thread(get_vector_store)
+        if not vector_store:
+            for u in pending:
+                answers[u] = {"error": "Failed to initialize document database"}
+            pending = []
+    
+    if pending:
+        # One embedding forward pass and one FAISS search for every pending query
+        vectors = await asyncio.to_thread(embedding_service.embed_many, [unique[u] for u in pending])
+        owner = _near_duplicate_of([features[u] for u in pending], vectors)
+        leaders = [k for k in range(len(pending)) if owner[k] == k]
+        near_duplicates = len(pending) - len(leaders)
+        docs = await asyncio.to_thread(
+            retrieval.relevant_documents_batch, vector_store, [vectors[k] for k in leaders], COSINE_THRESHOLD
+        )
+        retrieved = dict(zip(leaders, docs))
+        
+        # Location/weather once per distinct place (or once for the client's own location)
+        lookups = {}
+        for k in leaders:
+            u = pending[k]
+            if features[u].needs_location:
+                lookups.setdefault(plan_location_lookup(unique[u], features[u]), u)
+        contexts = dict(zip(lookups, await asyncio.gather(*(
+            resolve_location_and_weather_async(unique[u], features[u], client_ip) for u in lookups.values()
+        ))))
+        
+        llm_slots = asyncio.Semaphore(max(1, BATCH_LLM_CONCURRENCY))
+        
+        def prefetched(k):
+            u = pending[k]
+            item = {"features": features[u], "retrieval": (vectors[k], retrieved[k])}
+            if features[u].needs_location:
+                item["context"] = contexts[plan_location_lookup(unique[u], features[u])]
+            return item
+        
+        results = await asyncio.gather(*(
+            _answer_prefetched(unique[pending[k]], client_ip, prefetched(k), llm_slots) for k in leaders
+        ))
+        for k, result in zip(leaders, results):
+            answers[pending[k]] = result
+        for k in range(len(pending)):
+            answers[pending[k]] = answers[pending[owner[k]]]
+    
+    ordered = [None] * len(queries)
+    for u, indices in enumerate(groups.values()):
+        for i in indices:
+            ordered[i] = answers[u] if "error" in answers[u] else {**answers[u], "query": queries[i]}
+    stats = {
+        "queries": len(queries),
+        "unique": len(unique),
+        "near_duplicates": near_duplicates,
+        "computed": len(pending) - near_duplicates,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Batch of {len(queries)} queries: {stats}")
+    return ordered, stats
 
 def format_response(state, season_info):
     """Format the final response"""
@@ -1099,8 +1996,8 @@ def display_response(response):
 
 def main():
     """Main function"""
-    # Initialize components
-    initialize_components()
+    # Load the embedding model and vector store once
+    init_retrieval_runtime()
     
     print("🌱 Welcome to Agro Assistant!")
     print("I can help with agricultural questions using your documents, location, and weather data.")
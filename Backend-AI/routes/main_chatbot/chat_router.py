@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
+import asyncio
+import hmac
+import json
 import logging
-from .chat import process_query  # Import your existing process_query function
+import os
+from .chat import process_query_async, stream_query_events  # Non-blocking versions of process_query
+from .chat import process_queries_batch_async
+from .chat import refresh_vector_store
+from services.Geo.client_ip import request_client_ip
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,6 +18,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+INDEX_ADMIN_TOKEN = os.getenv("INDEX_ADMIN_TOKEN")  # admin endpoints are disabled when unset
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "100"))
+
 # Request models
 class ChatRequest(BaseModel):
     query: str
@@ -26,44 +37,111 @@ class ChatResponse(BaseModel):
     crop_suggestions: Optional[List[str]] = None
     error: Optional[str] = None
 
+class BatchChatRequest(BaseModel):
+    queries: List[str]
+
+class BatchChatResponse(BaseModel):
+    results: List[ChatResponse]
+    stats: Dict[str, Any]
+
 @router.get("/")
 async def root():
     return {"message": "Agro Chatbot API is running"}
 
+def _chat_response(query, result):
+    """ChatResponse for a pipeline result (an answer or an {"error": ...} dict)"""
+    # Check if there's an error in the result
+    if "error" in result:
+        return ChatResponse(
+            query=query,
+            answer="Sorry, I encountered an error processing your request.",
+            llm_source="System",
+            error=result["error"]
+        )
+    
+    # Format the response according to the ChatResponse model
+    response_data = {
+        "query": result.get("query", query),
+        "answer": result.get("answer", ""),
+        "llm_source": result.get("llm_source", "Unknown"),
+        "sources": result.get("sources", []),
+        "weather": result.get("weather", {}),
+        "location": result.get("location", {}),
+        "season": result.get("season", {}),
+        "agricultural_alerts": result.get("agricultural_alerts", []),
+        "crop_suggestions": result.get("crop_suggestions", []),
+        "error": result.get("error")
+    }
+    
+    return ChatResponse(**response_data)
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     """Process a chat query"""
     try:
         logger.info(f"Processing query: {request.query}")
         
-        # Process the query using your existing function
-        result = process_query(request.query)
-        
-        # Check if there's an error in the result
-        if "error" in result:
-            return ChatResponse(
-                query=request.query,
-                answer="Sorry, I encountered an error processing your request.",
-                llm_source="System",
-                error=result["error"]
-            )
-        
-        # Format the response according to the ChatResponse model
-        response_data = {
-            "query": result.get("query", request.query),
-            "answer": result.get("answer", ""),
-            "llm_source": result.get("llm_source", "Unknown"),
-            "sources": result.get("sources", []),
-            "weather": result.get("weather", {}),
-            "location": result.get("location", {}),
-            "season": result.get("season", {}),
-            "agricultural_alerts": result.get("agricultural_alerts", []),
-            "crop_suggestions": result.get("crop_suggestions", []),
-            "error": result.get("error")
-        }
-        
-        return ChatResponse(**response_data)
+        # Process the query without blocking the event loop
+        result = await process_query_async(request.query, request_client_ip(http_request))
+        return _chat_response(request.query, result)
         
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(request: BatchChatRequest, http_request: Request):
+    """Answer up to BATCH_MAX_QUERIES queries in one call (SMS/IVR gateway bursts).
+
+    Results are in request order; a query that fails gets its own error
+    entry without failing the rest of the batch.
+    """
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    try:
+        logger.info(f"Processing batch of {len(request.queries)} queries")
+        results, stats = await process_queries_batch_async(request.queries, request_client_ip(http_request))
+        return BatchChatResponse(
+            results=[_chat_response(query, result) for query, result in zip(request.queries, results)],
+            stats=stats
+        )
+    except Exception as e:
+        logger.error(f"Error processing batch request: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """Stream a chat answer as server-sent events.
+
+    Events: start -> metadata -> token* -> done (or error). The metadata
+    (season, location, weather, alerts, crop suggestions) arrives before the
+    LLM starts, so the client can render it while the answer streams in.
+    """
+    logger.info(f"Streaming query: {request.query}")
+    client_ip = request_client_ip(http_request)
+    
+    async def event_source():
+        async for event, data in stream_query_events(request.query, client_ip):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # disable proxy buffering
+    )
+
+@router.post("/admin/reindex")
+async def reindex_endpoint(rebuild: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Embed new/changed PDFs, drop removed ones and swap the index in without a restart.
+
+    Each uvicorn worker holds its own index; calling this on a worker whose
+    files are already up to date just reloads the index from disk.
+    """
+    if not INDEX_ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, INDEX_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        return await asyncio.to_thread(refresh_vector_store, rebuild)
+    except Exception as e:
+        logger.error(f"Error refreshing vector store: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error refreshing index: {str(e)}")
+
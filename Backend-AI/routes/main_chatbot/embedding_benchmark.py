@@ -0,0 +1,122 @@
+"""Compare the torch, ONNX and int8 ONNX embedding backends.
+
+Run from Backend-AI/ after exporting the ONNX models:
+
+    python -m routes.main_chatbot.embedding_benchmark [--backends torch,onnx,onnx_int8]
+        [--query-file questions.txt] [--batch-size 64] [--k 5]
+
+Each backend is loaded in a fresh process so its import cost and peak RSS
+are measured in isolation. Reported per backend: load time, peak RSS,
+single-query latency, batch throughput, cosine agreement with the torch
+vectors, and overlap of the top-k chunks retrieved from the current index.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+SAMPLE_QUERIES = [
+    "How do I control aphids on mustard?",
+    "When should wheat be sown in Punjab?",
+    "What fertilizer is best for paddy in the tillering stage?",
+    "How much water does sugarcane need in summer?",
+    "Organic methods to manage stem borer in rice",
+    "Which crops grow well in black cotton soil?",
+    "How to treat leaf curl in tomato plants?",
+    "Best time to harvest groundnut",
+    "How do I prepare vermicompost at home?",
+    "What are the symptoms of nitrogen deficiency in maize?",
+    "Drip irrigation spacing for banana",
+    "How to store onions to prevent rotting?",
+    "Which pulses can be grown after kharif rice?",
+    "Seed rate for chickpea per acre",
+    "How can I improve soil organic carbon?",
+    "Control of whitefly in cotton without chemicals",
+]
+
+def _measure(backend, queries, batch_size, results):
+    """Child process: load one backend and time it"""
+    start = time.perf_counter()
+    os.environ["EMBEDDING_BACKEND"] = backend
+    from .chat import _create_embedding_model
+    model = _create_embedding_model()
+    load_seconds = time.perf_counter() - start
+
+    model.embed_query("warm up")
+    latencies = []
+    vectors = []
+    for query in queries:
+        t = time.perf_counter()
+        vectors.append(model.embed_query(query))
+        latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+
+    batch = (queries * (batch_size // len(queries) + 1))[:batch_size]
+    t = time.perf_counter()
+    model.embed_documents(batch)
+    throughput = batch_size / (time.perf_counter() - t)
+
+    scale = 1 if sys.platform == "darwin" else 1024
+    results.put({
+        "backend": backend,
+        "model": type(model).__name__,
+        "load_seconds": round(load_seconds, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 2),
+        "texts_per_second": round(throughput, 1),
+        "vectors": np.asarray(vectors, dtype="float32"),
+    })
+
+def measure_backend(backend, queries, batch_size):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(backend, queries, batch_size, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def retrieval_overlap(index, reference, vectors, k):
+    """Mean fraction of the reference top-k that the backend's vectors also retrieve"""
+    _, expected = index.search(reference, k)
+    _, found = index.search(vectors, k)
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(expected.tolist(), found.tolist())]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", default="torch,onnx,onnx_int8")
+    parser.add_argument("--query-file", help="one question per line")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = SAMPLE_QUERIES
+    if args.query_file:
+        with open(args.query_file, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    results = [measure_backend(backend, queries, args.batch_size) for backend in args.backends.split(",")]
+    reference = next((r["vectors"] for r in results if r["model"] != "OnnxEmbeddings"), results[0]["vectors"])
+
+    index = None
+    from .chat import FAISS_DIR
+    if os.path.exists(os.path.join(FAISS_DIR, "index.faiss")):
+        import faiss
+        index = faiss.read_index(os.path.join(FAISS_DIR, "index.faiss"))
+
+    print(f"{len(queries)} queries, batch of {args.batch_size}")
+    print(f"{'backend':<10} {'model':<22} {'load s':>7} {'RSS MB':>8} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'texts/s':>8} {'min cos':>8} {'top-k':>6}")
+    for r in results:
+        cosines = np.sum(r["vectors"] * reference, axis=1)
+        overlap = f"{retrieval_overlap(index, reference, r['vectors'], args.k):>6.3f}" if index is not None else f"{'-':>6}"
+        print(f"{r['backend']:<10} {r['model']:<22} {r['load_seconds']:>7.2f} {r['peak_rss_mb']:>8.1f} "
+              f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['texts_per_second']:>8.1f} {cosines.min():>8.4f} {overlap}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from services.ttl_cache import TTLCache
+from .llm_dispatch import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingService:
+    """Query embeddings with an LRU cache and micro-batching.
+
+    Queries are cached by their normalized text (and the normalized text is
+    what gets embedded, so a cached vector never depends on which phrasing
+    arrived first). Cache misses from concurrent requests are queued; a
+    single worker thread collects them for up to `max_wait_ms` or
+    `max_batch` items and embeds them with one embed_documents call, so
+    under load the model runs few large forward passes instead of many
+    single-query ones.
+    """
+
+    def __init__(self, get_model, normalize, max_batch=32, max_wait_ms=3.0, cache_size=4096, cache_ttl=7 * 24 * 3600):
+        self.get_model = get_model
+        self.normalize = normalize
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = TTLCache(cache_size, cache_ttl, name="query_embeddings")
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.queue_wait = LatencyWindow(size=1000)
+        self.batch_seconds = LatencyWindow(size=200)
+        self.failures = 0
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _submit(self, text):
+        """Queue a text for the next batch; returns a concurrent Future"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        """Block for one request, then gather more until the batch is full or max_wait passes"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_wait.record(started - queued_at)
+            try:
+                vectors = self.get_model().embed_documents([text for text, _, _ in batch])
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Embedding batch of {len(batch)} failed: {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self.batch_seconds.record(time.perf_counter() - started)
+            self.batch_sizes[len(batch)] += 1
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(list(vector))
+
+    def embed(self, query):
+        """Vector for a query (blocks until its batch has run)"""
+        text = self.normalize(query) or query
+        return self.cache.get_or_load(text, lambda: self._submit(text).result())
+
+    async def embed_async(self, query):
+        """Vector for a query without holding a thread while the batch runs"""
+        text = self.normalize(query) or query
+
+        async def load():
+            return await asyncio.wrap_future(self._submit(text))
+
+        return await self.cache.get_or_load_async(text, load)
+
+    def embed_many(self, queries):
+        """Vectors for many queries; cache misses are embedded in one embed_documents call"""
+        texts = [self.normalize(query) or query for query in queries]
+        found = {}
+        for text in texts:
+            vector = self.cache.get(text)
+            if vector is not None:
+                found[text] = vector
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            started = time.perf_counter()
+            vectors = self.get_model().embed_documents(missing)
+            self.batch_seconds.record(time.perf_counter() - started)
+            self.batch_sizes[len(missing)] += 1
+            for text, vector in zip(missing, vectors):
+                found[text] = list(vector)
+                self.cache.set(text, found[text])
+        return [found[text] for text in texts]
+
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        requests = sum(size * count for size, count in self.batch_sizes.items())
+        wait_p50, wait_p95 = self.queue_wait.percentile(0.5), self.queue_wait.percentile(0.95)
+        batch_p95 = self.batch_seconds.percentile(0.95)
+        return {
+            "cache": self.cache.stats(),
+            "batches": batches,
+            "embedded_queries": requests,
+            "avg_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "max_batch_size": max(self.batch_sizes) if batches else 0,
+            "queue_wait_ms": {
+                "p50": round(wait_p50 * 1000, 2) if wait_p50 is not None else None,
+                "p95": round(wait_p95 * 1000, 2) if wait_p95 is not None else None,
+            },
+            "batch_p95_ms": round(batch_p95 * 1000, 2) if batch_p95 is not None else None,
+            "pending": self._queue.qsize(),
+            "failures": self.failures,
+        }
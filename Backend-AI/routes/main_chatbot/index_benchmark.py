@@ -0,0 +1,120 @@
+"""Recall@k vs latency of the FAISS index types against the exact baseline.
+
+Run from Backend-AI/:
+
+    python -m routes.main_chatbot.index_benchmark [--types flat,hnsw,ivf_flat,ivf_pq,sq8,sq_fp16]
+        [--k 5] [--queries 200] [--nprobe 1,4,16,64] [--ef-search 16,64,256]
+        [--query-file questions.txt] [--synthetic 20000]
+
+Vectors come from the current index (master.faiss when the serving index is
+compressed) or, with --synthetic, from random data. Queries are lines of
+--query-file embedded with the chat embedding model, or stored vectors with
+a little noise added. Each query is searched on its own, as in serving.
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from .index_types import INDEX_TYPES, build_index, all_vectors, apply_search_params, index_bytes
+from .indexer import MASTER_INDEX_FILE
+
+def load_corpus_vectors(index_dir):
+    """(vectors, metric) of the exact index in index_dir"""
+    master_path = os.path.join(index_dir, MASTER_INDEX_FILE)
+    index = faiss.read_index(master_path if os.path.exists(master_path) else os.path.join(index_dir, "index.faiss"))
+    if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+        raise SystemExit(f"{index_dir} has no exact index to benchmark against")
+    return all_vectors(index), index.metric_type
+
+def sample_queries(vectors, count, seed=0, noise=0.05):
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    return (picked + rng.normal(scale=noise * picked.std(), size=picked.shape)).astype("float32")
+
+def embed_query_file(path):
+    from .chat import get_embedding_model
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    return np.asarray(get_embedding_model().embed_documents(questions), dtype="float32")
+
+def measure(index, queries, truth, k):
+    """recall@k and per-query latency percentiles (ms)"""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids[0].tolist()) & set(expected.tolist()))
+    latencies.sort()
+    return {
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3),
+    }
+
+def run_benchmark(vectors, metric, queries, k, types, nprobes, ef_searches):
+    exact = faiss.IndexFlat(vectors.shape[1], metric)
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for index_type in types:
+        start = time.perf_counter()
+        index, effective, spec = build_index(vectors, metric, index_type)
+        build_seconds = round(time.perf_counter() - start, 3)
+        base = {"type": index_type, "effective": effective, "spec": spec,
+                "bytes": index_bytes(index), "build_seconds": build_seconds}
+        if effective.startswith("ivf"):
+            settings = [{"nprobe": n} for n in nprobes]
+        elif effective == "hnsw":
+            settings = [{"ef_search": ef} for ef in ef_searches]
+        else:
+            settings = [{}]
+        for params in settings:
+            apply_search_params(index, **params)
+            results.append({**base, "params": params, **measure(index, queries, truth, k)})
+    return results
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    from .chat import FAISS_DIR
+
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against exact search")
+    parser.add_argument("--index-dir", default=FAISS_DIR)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=_int_list, default=[16, 64, 256])
+    parser.add_argument("--query-file", help="one question per line")
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark N random 384-d vectors instead")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = np.random.default_rng(1).standard_normal((args.synthetic, 384)).astype("float32")
+        metric = faiss.METRIC_L2
+    else:
+        vectors, metric = load_corpus_vectors(args.index_dir)
+    queries = embed_query_file(args.query_file) if args.query_file else sample_queries(vectors, args.queries)
+
+    results = run_benchmark(vectors, metric, queries, args.k, args.types.split(","), args.nprobe, args.ef_search)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, k={args.k}")
+    print(f"{'type':<10} {'spec':<16} {'params':<16} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'MB':>8} {'build s':>8}")
+    for r in results:
+        params = ",".join(f"{key}={value}" for key, value in r["params"].items())
+        print(f"{r['type']:<10} {r['spec']:<16} {params:<16} {r['recall_at_k']:>9.3f} {r['p50_ms']:>8.3f} "
+              f"{r['p95_ms']:>8.3f} {r['bytes'] / 2**20:>8.2f} {r['build_seconds']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
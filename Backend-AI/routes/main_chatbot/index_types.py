@@ -0,0 +1,91 @@
+"""Configurable FAISS index types for the chat vector store.
+
+The indexer always keeps an exact flat index of every vector (master.faiss)
+so chunks can be added and removed incrementally and compressed indexes can
+be retrained. The index LangChain loads for serving (index.faiss) is built
+from it with faiss.index_factory:
+
+    flat      exact search (the original behaviour)
+    hnsw      HNSW graph, fast but stores full vectors plus links
+    ivf_flat  inverted lists over full vectors
+    ivf_pq    inverted lists over product-quantized codes (smallest)
+    sq8       8-bit scalar quantization (4x smaller than flat)
+    sq_fp16   float16 scalar quantization (2x smaller than flat)
+
+Corpora too small to train a type fall back to the next simpler one.
+"""
+import logging
+import math
+import os
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "sq_fp16")
+
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # IVF lists, 0 = about 4 * sqrt(vectors)
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))  # PQ sub-quantizers, must divide the dimension
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))  # IVF lists searched per query
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))  # HNSW candidate list size
+
+MIN_POINTS_PER_LIST = 39  # below this k-means training is unreliable (faiss warns)
+PQ_MIN_VECTORS = 256 * MIN_POINTS_PER_LIST  # 8-bit codebooks have 256 centroids
+
+def auto_nlist(count):
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_LIST))
+
+def factory_string(index_type, count, dim, nlist=FAISS_NLIST, pq_m=FAISS_PQ_M, hnsw_m=FAISS_HNSW_M):
+    """(effective type, index_factory string) for a corpus of `count` vectors"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+    if count == 0:
+        return "flat", "Flat"
+    if index_type == "ivf_pq" and (count < PQ_MIN_VECTORS or dim % pq_m):
+        logger.warning(f"ivf_pq needs {PQ_MIN_VECTORS}+ vectors and PQ m dividing {dim}; using ivf_flat")
+        index_type = "ivf_flat"
+    if index_type.startswith("ivf"):
+        nlist = nlist or auto_nlist(count)
+        if count < nlist * MIN_POINTS_PER_LIST or nlist < 2:
+            logger.warning(f"Too few vectors ({count}) to train an IVF index; using flat")
+            return "flat", "Flat"
+        return index_type, f"IVF{nlist},PQ{pq_m}" if index_type == "ivf_pq" else f"IVF{nlist},Flat"
+    return index_type, {
+        "flat": "Flat",
+        "hnsw": f"HNSW{hnsw_m}",
+        "sq8": "SQ8",
+        "sq_fp16": "SQfp16",
+    }[index_type]
+
+def build_index(vectors, metric, index_type=FAISS_INDEX_TYPE, **options):
+    """Train and fill an index of the given type. Returns (index, effective type, factory string)."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    count, dim = vectors.shape
+    effective, spec = factory_string(index_type, count, dim, **options)
+    index = faiss.index_factory(dim, spec, metric)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index, effective, spec
+
+def all_vectors(index):
+    """Every stored vector of a flat index, in position order"""
+    return index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype="float32")
+
+def apply_search_params(index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH):
+    """Set query-time knobs on whatever index type was loaded"""
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass  # not an IVF index
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+    return index
+
+def index_bytes(index):
+    """Serialized size, a close proxy for the index's memory footprint"""
+    return int(faiss.serialize_index(index).size)
@@ -0,0 +1,265 @@
+"""Incremental FAISS index builds.
+
+The index directory holds the usual LangChain FAISS files plus a
+manifest.json mapping each PDF to its content hash and the docstore ids of
+its chunks. An update only embeds PDFs that are new or whose hash changed,
+and deletes the vectors of PDFs that were changed or removed; unchanged
+files are never re-read or re-embedded. PDFs that fail to parse or have no
+text are recorded with no chunks, so they are not re-read either until their
+content changes (or on --rebuild).
+
+Updates are built on a private copy loaded from disk and written to a new
+directory that is then renamed over the old one, so a running server keeps
+searching its current index until it swaps in the returned store.
+
+Run from Backend-AI/:
+
+    python -m routes.main_chatbot.indexer [--rebuild] [--index-type TYPE]
+        [--workers N] [--batch-size N] [--torch-threads N]
+
+Parsing and embedding go through ingest.embed_files; an interrupted run
+leaves <index dir>.checkpoint.jsonl behind and the next run resumes from it.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from .index_types import build_index, all_vectors, FAISS_INDEX_TYPE, INDEX_TYPES
+from .readonly_store import write_docstore, has_docstore
+from .ingest import embed_files, clear_checkpoint, INGEST_WORKERS, INGEST_BATCH_SIZE, INGEST_TORCH_THREADS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+MASTER_INDEX_FILE = "master.faiss"  # exact vectors, kept when index.faiss is compressed
+MANIFEST_VERSION = 1
+DEFAULT_EMBEDDING_ID = "all-MiniLM-L6-v2:fp32"  # torch and fp32 ONNX produce the same vectors
+
+def embedding_id(embedding_model):
+    """Identifies which vectors a model produces; a different id means re-embedding"""
+    return getattr(embedding_model, "fingerprint", DEFAULT_EMBEDDING_ID)
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def scan_pdfs(pdf_dir):
+    """{file name: sha256} for the PDFs directly inside pdf_dir"""
+    if not os.path.isdir(pdf_dir):
+        return {}
+    return {
+        name: file_sha256(os.path.join(pdf_dir, name))
+        for name in sorted(os.listdir(pdf_dir))
+        if name.lower().endswith(".pdf")
+    }
+
+def load_manifest(index_dir):
+    """Manifest of an index directory, or None if it has none (legacy index)"""
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def chunk_ids(name, sha256, count):
+    """Deterministic docstore ids for the chunks of one file version"""
+    prefix = hashlib.sha1(f"{name}:{sha256}".encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i}" for i in range(count)]
+
+def plan_update(manifest_files, current_files):
+    """(added, changed, removed) file names between a manifest and the PDF directory"""
+    added = [name for name in current_files if name not in manifest_files]
+    changed = [name for name in current_files
+               if name in manifest_files and manifest_files[name]["sha256"] != current_files[name]]
+    removed = [name for name in manifest_files if name not in current_files]
+    return added, changed, removed
+
+def _load_master_index(index_dir, manifest):
+    """Exact flat index for incremental edits (index.faiss itself when serving flat)"""
+    if manifest.get("index", {}).get("type", "flat") == "flat":
+        return None
+    return faiss.read_index(os.path.join(index_dir, MASTER_INDEX_FILE))
+
+def _write_index(vector_store, manifest, index_dir, index_type):
+    """Build the serving index, save next to index_dir, then rename over it.
+
+    vector_store.index must be the exact flat index; on return it is the
+    serving index of the configured type.
+    """
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = f"{index_dir}.new"
+    retired = f"{index_dir}.old"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    master = vector_store.index
+    if master.metric_type != faiss.METRIC_INNER_PRODUCT:
+        # Indexes built before the switch to inner product: same unit vectors, new metric
+        vectors = all_vectors(master)
+        faiss.normalize_L2(vectors)
+        master = faiss.IndexFlatIP(vectors.shape[1])
+        master.add(vectors)
+        vector_store.index = master
+    manifest["metric"] = "inner_product"
+    serving, effective, spec = build_index(all_vectors(master), master.metric_type, index_type)
+    manifest["index"] = {"requested": index_type, "type": effective, "spec": spec}
+    if effective == "flat":
+        serving = master
+    else:
+        faiss.write_index(master, os.path.join(staging, MASTER_INDEX_FILE))
+        logger.info(f"Built {spec} serving index over {serving.ntotal} vectors")
+    vector_store.index = serving
+    vector_store.save_local(staging)
+    write_docstore(vector_store, staging)
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.replace(index_dir, retired)
+    os.replace(staging, index_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+
+def _write_manifest(manifest, index_dir):
+    """Replace the manifest of an index directory without touching its index"""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def update_index(pdf_dir, index_dir, embedding_model, chunker, rebuild=False,
+                 workers=INGEST_WORKERS, batch_size=INGEST_BATCH_SIZE, torch_threads=INGEST_TORCH_THREADS,
+                 index_type=FAISS_INDEX_TYPE):
+    """Bring the index in index_dir up to date with the PDFs in pdf_dir.
+
+    Returns (vector_store, summary). vector_store is a fresh object (never the
+    one a server is currently searching), or None when there is nothing to
+    index. A legacy index without a manifest is rebuilt once from scratch.
+    Changing index_type (or an index predating the inner-product metric or
+    docstore.sqlite3) rewrites the index directory without re-embedding.
+    """
+    start = time.perf_counter()
+    current_files = scan_pdfs(pdf_dir)
+    manifest = None if rebuild else load_manifest(index_dir)
+    vector_store = None
+    if manifest is not None:
+        try:
+            vector_store = FAISS.load_local(index_dir, embeddings=embedding_model, allow_dangerous_deserialization=True)
+        except Exception as e:
+            logger.error(f"Could not load index for incremental update, rebuilding: {str(e)}")
+            manifest = None
+    model_id = embedding_id(embedding_model)
+    if manifest is not None and manifest.get("embedding", DEFAULT_EMBEDDING_ID) != model_id:
+        logger.warning(f"Index was embedded with {manifest.get('embedding', DEFAULT_EMBEDDING_ID)}, "
+                       f"current model is {model_id}; re-embedding all documents")
+        manifest, vector_store = None, None
+    if manifest is None:
+        manifest = {"version": MANIFEST_VERSION, "files": {}}
+    manifest["embedding"] = model_id
+
+    files = manifest["files"]
+    added, changed, removed = plan_update(files, current_files)
+    summary = {"added": added, "changed": changed, "removed": removed, "chunks_added": 0, "chunks_removed": 0}
+
+    same_type = manifest.get("index", {}).get("requested", "flat") == index_type
+    current_layout = same_type and manifest.get("metric") == "inner_product" and has_docstore(index_dir)
+    if not (added or changed or removed) and vector_store is not None and current_layout:
+        summary.update(updated=False, files=len(files), vectors=vector_store.index.ntotal,
+                       seconds=round(time.perf_counter() - start, 3))
+        return vector_store, summary
+
+    serving_index = None
+    if vector_store is not None:
+        serving_index = vector_store.index
+        master = _load_master_index(index_dir, manifest)
+        if master is not None:
+            vector_store.index = master
+
+    # Drop vectors of removed and changed files
+    stale_ids = [i for name in removed + changed for i in files[name]["chunk_ids"]]
+    if stale_ids and vector_store is not None:
+        vector_store.delete(stale_ids)
+        summary["chunks_removed"] = len(stale_ids)
+    for name in removed + changed:
+        del files[name]
+
+    # Embed only new and changed files
+    checkpoint_path = f"{index_dir}.checkpoint.jsonl"
+    ingest_stats = {}
+    for record in embed_files(pdf_dir, [(name, current_files[name]) for name in added + changed],
+                              embedding_model, chunker, workers=workers, batch_size=batch_size,
+                              torch_threads=torch_threads, checkpoint_path=checkpoint_path, stats=ingest_stats,
+                              embedding_id=model_id):
+        name = record["name"]
+        if not record["texts"]:
+            files[name] = {"sha256": record["sha256"], "chunk_ids": [], "skipped": record.get("skipped")}
+            summary.setdefault("skipped", []).append(name)
+            continue
+        ids = chunk_ids(name, record["sha256"], len(record["texts"]))
+        text_embeddings = list(zip(record["texts"], record["embeddings"]))
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=record["metadatas"], ids=ids,
+                                                 distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT)
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=record["metadatas"], ids=ids)
+        files[name] = {"sha256": record["sha256"], "chunk_ids": ids}
+        summary["chunks_added"] += len(ids)
+        logger.info(f"Indexed {name}: {len(ids)} chunks")
+    summary["ingest"] = ingest_stats
+
+    if vector_store is None:
+        logger.warning("No documents found to create vector store")
+        summary.update(updated=False, files=0, vectors=0, seconds=round(time.perf_counter() - start, 3))
+        return None, summary
+
+    if not (summary["chunks_added"] or summary["chunks_removed"]) and serving_index is not None and current_layout:
+        # Only files without chunks came or went: record them, keep the index as it is
+        vector_store.index = serving_index
+        _write_manifest(manifest, index_dir)
+        clear_checkpoint(checkpoint_path)
+        summary.update(updated=False, files=len(files), vectors=serving_index.ntotal,
+                       seconds=round(time.perf_counter() - start, 3))
+        return vector_store, summary
+
+    manifest["updated_at"] = time.time()
+    _write_index(vector_store, manifest, index_dir, index_type)
+    clear_checkpoint(checkpoint_path)
+    summary.update(updated=True, files=len(files), vectors=vector_store.index.ntotal,
+                   index=manifest["index"], seconds=round(time.perf_counter() - start, 3))
+    logger.info(f"Index updated: {summary}")
+    return vector_store, summary
+
+def main():
+    from .chat import PDF_DIR, FAISS_DIR, get_embedding_model, create_chunks
+
+    parser = argparse.ArgumentParser(description="Incrementally update the chatbot FAISS index")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--index-dir", default=FAISS_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the manifest and re-embed everything")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=FAISS_INDEX_TYPE, help="serving index type")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="PDF parsing processes")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="chunks per embedding call")
+    parser.add_argument("--torch-threads", type=int, default=INGEST_TORCH_THREADS, help="torch intra-op threads (0 = default)")
+    args = parser.parse_args()
+
+    _, summary = update_index(args.pdf_dir, args.index_dir, get_embedding_model(), create_chunks, rebuild=args.rebuild,
+                              workers=args.workers, batch_size=args.batch_size, torch_threads=args.torch_threads,
+                              index_type=args.index_type)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
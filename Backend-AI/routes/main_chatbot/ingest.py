@@ -0,0 +1,190 @@
+"""Parallel PDF parsing and batched embedding for the FAISS indexer.
+
+PDFs are parsed in a process pool (at most a few files in flight, so memory
+stays bounded), each parsed file is split with the indexer's chunker, and the
+chunks stream into large embedding batches that may span several files. A
+file is reported - and appended to the checkpoint - as soon as all of its
+chunks are embedded, so an interrupted run resumes without re-embedding the
+files it already finished. Files that fail to parse or contain no text are
+reported as records without chunks (with a "skipped" reason), so the
+indexer can remember them.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from langchain_community.document_loaders import PyPDFLoader
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # chunks per embed_documents call
+INGEST_TORCH_THREADS = int(os.getenv("INGEST_TORCH_THREADS", "0"))  # 0 = leave torch's default
+
+def configure_torch_threads(threads):
+    """Set torch intra-op threads for embedding (no-op without torch)"""
+    if not threads:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    logger.info(f"torch intra-op threads: {threads}")
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of finished workers (None where unsupported)"""
+    try:
+        import resource  # POSIX only
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {"main": round(own / 2**20, 1), "workers": round(workers / 2**20, 1)}
+
+def parse_pdf(path):
+    """Worker: extract the pages of one PDF"""
+    return PyPDFLoader(path).load()
+
+def load_checkpoint(path, embedding_id=None):
+    """{(name, sha256): record} of files embedded by an interrupted run with the same model"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn final line from the interruption
+            if record.get("embedding") == embedding_id:
+                done[(record["name"], record["sha256"])] = record
+    return done
+
+def clear_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def _parsed_files(pdf_dir, files, workers):
+    """Yield (name, sha256, pages, error) as workers finish, keeping 2 files per worker in flight"""
+    pending = iter(files)
+    in_flight = {}
+    context = multiprocessing.get_context("spawn")  # never fork a process that holds model/server threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        def submit_next():
+            for name, sha256 in pending:
+                in_flight[executor.submit(parse_pdf, os.path.join(pdf_dir, name))] = (name, sha256)
+                return
+
+        for _ in range(workers * 2):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, sha256 = in_flight.pop(future)
+                submit_next()
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    logger.error(f"Skipping {name}: {str(e)}")
+                    yield name, sha256, [], f"parse failed: {str(e)}"
+                else:
+                    yield name, sha256, pages, None
+
+def embed_files(pdf_dir, files, embedding_model, chunker, workers=INGEST_WORKERS,
+                batch_size=INGEST_BATCH_SIZE, torch_threads=INGEST_TORCH_THREADS,
+                checkpoint_path=None, stats=None, embedding_id=None):
+    """Parse, chunk and embed files; yield one record per fully embedded file.
+
+    files is a list of (name, sha256). Records hold name, sha256, texts,
+    metadatas and embeddings (empty, plus "skipped", for files that failed
+    to parse or have no text). stats (a dict), if given, is filled with
+    throughput and memory figures.
+    """
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+    counts = {"files": 0, "pages": 0, "chunks": 0, "resumed_files": 0, "skipped_files": 0}
+    configure_torch_threads(torch_threads)
+
+    checkpoint = load_checkpoint(checkpoint_path, embedding_id)
+    todo = []
+    for name, sha256 in files:
+        record = checkpoint.get((name, sha256))
+        if record is not None:
+            counts["resumed_files"] += 1
+            yield record
+        else:
+            todo.append((name, sha256))
+
+    checkpoint_file = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+    open_records = []  # files with chunks still waiting to be embedded
+    buffer = []        # (record, chunk index, text)
+
+    def checkpoint(record):
+        if checkpoint_file is not None:
+            checkpoint_file.write(json.dumps(record, default=str) + "\n")
+            checkpoint_file.flush()
+
+    def embed_batch(batch):
+        """Embed one batch and return the files it completed"""
+        vectors = embedding_model.embed_documents([text for _, _, text in batch])
+        for (record, i, _), vector in zip(batch, vectors):
+            record["embeddings"][i] = list(vector)
+            record["_remaining"] -= 1
+        finished = [r for r in open_records if r["_remaining"] == 0]
+        for record in finished:
+            open_records.remove(record)
+            del record["_remaining"]
+            checkpoint(record)
+        return finished
+
+    try:
+        parsed = _parsed_files(pdf_dir, todo, max(1, min(workers, len(todo)))) if todo else []
+        for name, sha256, pages, error in parsed:
+            chunks = chunker(pages) if pages else []
+            counts["files"] += 1
+            counts["pages"] += len(pages)
+            counts["chunks"] += len(chunks)
+            if not chunks:
+                if error is None:
+                    logger.warning(f"No text extracted from {name}")
+                counts["skipped_files"] += 1
+                record = {"name": name, "sha256": sha256, "embedding": embedding_id, "texts": [],
+                          "metadatas": [], "embeddings": [], "skipped": error or "no text extracted"}
+                checkpoint(record)
+                yield record
+                continue
+            record = {
+                "name": name,
+                "sha256": sha256,
+                "embedding": embedding_id,
+                "texts": [c.page_content for c in chunks],
+                "metadatas": [c.metadata for c in chunks],
+                "embeddings": [None] * len(chunks),
+                "_remaining": len(chunks),
+            }
+            open_records.append(record)
+            buffer.extend((record, i, text) for i, text in enumerate(record["texts"]))
+            while len(buffer) >= batch_size:
+                batch, buffer[:] = buffer[:batch_size], buffer[batch_size:]
+                yield from embed_batch(batch)
+        if buffer:
+            yield from embed_batch(buffer)
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+        elapsed = time.perf_counter() - start
+        stats.update(counts)
+        stats.update(
+            seconds=round(elapsed, 3),
+            pages_per_second=round(counts["pages"] / elapsed, 2) if elapsed else 0.0,
+            chunks_per_second=round(counts["chunks"] / elapsed, 2) if elapsed else 0.0,
+            peak_rss_mb=peak_rss_mb(),
+            workers=workers,
+            batch_size=batch_size,
+        )
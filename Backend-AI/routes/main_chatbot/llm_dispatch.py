@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque, Counter
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("serial", "hedged", "race")
+
+class LLMProvider:
+    """One LLM backend: an async answer function plus its timeout"""
+
+    def __init__(self, name, label, generate, timeout):
+        self.name = name
+        self.label = label  # value reported as llm_source
+        self.generate = generate
+        self.timeout = timeout
+
+class LatencyWindow:
+    """Rolling window of recent successful call latencies"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+        return samples[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+class LLMDispatcher:
+    """Chooses how the primary and fallback LLMs are called.
+
+    serial  - primary, then fallback if it fails, times out or answers poorly
+              (the original behaviour)
+    hedged  - primary first; if it has not answered within its recent p95
+              latency (hedge_delay until enough samples), start the fallback
+              too and take the first acceptable answer
+    race    - start both at once, first acceptable answer wins
+
+    The losing call is cancelled. If no answer is acceptable, the fallback's
+    answer is preferred (as in serial mode), then the primary's; if every
+    provider failed the last error is raised.
+    """
+
+    def __init__(self, primary, fallback, is_acceptable, strategy="serial",
+                 hedge_percentile=0.95, hedge_delay=2.5, hedge_min_samples=20):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown LLM dispatch strategy: {strategy}")
+        self.primary = primary
+        self.fallback = fallback
+        self.is_acceptable = is_acceptable
+        self.strategy = strategy
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = {primary.name: LatencyWindow(), fallback.name: LatencyWindow()}
+        self.wins = Counter()
+        self.failures = Counter()
+        self.hedges_fired = 0
+
+    async def _call(self, provider, args):
+        """Run one provider under its timeout, recording latency"""
+        start = time.perf_counter()
+        try:
+            answer = await asyncio.wait_for(provider.generate(*args), timeout=provider.timeout)
+        except asyncio.TimeoutError:
+            self.failures[f"{provider.name}:timeout"] += 1
+            raise TimeoutError(f"{provider.name} did not answer within {provider.timeout}s")
+        except Exception:
+            self.failures[f"{provider.name}:error"] += 1
+            raise
+        self.latency[provider.name].record(time.perf_counter() - start)
+        return answer
+
+    def hedge_deadline(self):
+        """Seconds to wait for the primary before hedging"""
+        window = self.latency[self.primary.name]
+        if len(window) < self.hedge_min_samples:
+            return self.hedge_delay
+        return window.percentile(self.hedge_percentile)
+
+    async def dispatch(self, *args):
+        """Return (answer, llm_source) using the configured strategy"""
+        if self.strategy == "serial":
+            answer, provider = await self._serial(args)
+        else:
+            answer, provider = await self._concurrent(args, hedge=self.strategy == "hedged")
+        self.wins[f"{self.strategy}:{provider.name}"] += 1
+        return answer, provider.label
+
+    async def _serial(self, args):
+        try:
+            answer = await self._call(self.primary, args)
+            if self.is_acceptable(answer):
+                return answer, self.primary
+            logger.info(f"{self.primary.name} answer unsatisfactory, falling back to {self.fallback.name}...")
+        except Exception as e:
+            logger.error(f"{self.primary.name} failed, falling back to {self.fallback.name}: {str(e)}")
+        return await self._call(self.fallback, args), self.fallback
+
+    async def _concurrent(self, args, hedge):
+        tasks = {asyncio.create_task(self._call(self.primary, args)): self.primary}
+        if hedge:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_deadline())
+            primary_task = next(iter(tasks))
+            if done and not primary_task.exception() and self.is_acceptable(primary_task.result()):
+                return primary_task.result(), self.primary
+            self.hedges_fired += 1
+            logger.info(f"Hedging: starting {self.fallback.name} alongside {self.primary.name}")
+        tasks[asyncio.create_task(self._call(self.fallback, args))] = self.fallback
+
+        results = {}
+        errors = []
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = tasks[task]
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    answer = task.result()
+                    if self.is_acceptable(answer):
+                        return answer, provider
+                    results[provider.name] = (answer, provider)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        for provider in (self.fallback, self.primary):
+            if provider.name in results:
+                return results[provider.name]
+        raise errors[-1]
+
+    def stats(self):
+        return {
+            "strategy": self.strategy,
+            "wins": dict(self.wins),
+            "failures": dict(self.failures),
+            "hedges_fired": self.hedges_fired,
+            "hedge_deadline_seconds": round(self.hedge_deadline(), 3),
+            "p95_seconds": {
+                name: round(window.percentile(0.95), 3) if len(window) else None
+                for name, window in self.latency.items()
+            },
+        }
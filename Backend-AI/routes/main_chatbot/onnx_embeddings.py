@@ -0,0 +1,139 @@
+"""ONNX Runtime embedding backend for all-MiniLM-L6-v2.
+
+Serving needs only onnxruntime and tokenizers, not torch or
+sentence-transformers. The model is exported once with torch (and
+optionally int8-quantized with onnxruntime's dynamic quantization):
+
+    python -m routes.main_chatbot.onnx_embeddings [--output DIR] [--int8]
+
+OnnxEmbeddings reproduces the sentence-transformers pipeline (tokenize,
+truncate to 256 tokens, mean-pool over the attention mask, L2-normalize).
+The fp32 model gives the same vectors as the torch path, so an existing
+index stays valid. The int8 model gives slightly different vectors, so its
+fingerprint differs and the indexer re-embeds the corpus for it.
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+CONFIG_FILE = "embedding_config.json"
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = onnxruntime default
+
+class OnnxEmbeddings(Embeddings):
+    """LangChain Embeddings over an exported sentence-transformers model"""
+
+    def __init__(self, model_dir, quantized=False, batch_size=32, intra_op_threads=ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; export it with python -m routes.main_chatbot.onnx_embeddings")
+        with open(os.path.join(model_dir, CONFIG_FILE), encoding="utf-8") as f:
+            config = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_token_id"], pad_token=config["pad_token"])
+        self.batch_size = batch_size
+        self.fingerprint = f"{config['model_name'].split('/')[-1]}:{'int8' if quantized else 'fp32'}"
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        # Sort by length so each batch pads to a similar size, then restore order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def export_model(model_name, output_dir, int8=False, max_length=256, opset=17):
+    """Export a sentence-transformers checkpoint to ONNX (needs torch and transformers)"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)  # writes tokenizer.json for the fast tokenizer
+
+    sample = tokenizer(["export sample sentence"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class Encoder(torch.nn.Module):
+        """Positional inputs -> last hidden state, independent of the HF forward() signature"""
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *tensors):
+            return self.model(**dict(zip(names, tensors))).last_hidden_state
+
+    axes = {n: {0: "batch", 1: "sequence"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(), tuple(sample[n] for n in names), fp32_path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=axes, opset_version=opset, dynamo=False
+        )
+    logger.info(f"Exported {model_name} to {fp32_path}")
+
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(output_dir, INT8_FILE), weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8 model to {os.path.join(output_dir, INT8_FILE)}")
+
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_length": max_length,
+            "pad_token": tokenizer.pad_token,
+            "pad_token_id": tokenizer.pad_token_id,
+        }, f, indent=2)
+
+def main():
+    from .chat import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the chat embedding model to ONNX")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    parser.add_argument("--int8", action="store_true", help="also write a dynamically int8-quantized model")
+    args = parser.parse_args()
+    export_model(args.model, args.output, int8=args.int8)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Single-pass keyword analysis of a chat query.
+
+All keyword lists are compiled at import into one word-bounded regex, so a
+query is scanned once and the result (QueryFeatures) is handed down the
+pipeline instead of each helper re-scanning the text with `term in query`.
+Word boundaries also stop the old substring false positives: "here" inside
+"where", "rain" inside "train"/"grain", "my" inside "economy". Domain terms
+only need a boundary in front, so stems like "cultivat" or "grow" also match
+"cultivating" and "growth"; the short location and pronoun words must match
+as whole words.
+
+Place names are resolved separately against the offline gazetteer
+(services/Geo), which returns a canonical place with coordinates.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+from services.Geo.gazetteer import Place, resolve_place
+
+# How a category's terms match after the leading word boundary:
+#   "exact"   whole words only ("here" must not match "where")
+#   "inflect" plus simple inflections (pea -> peas, potato -> potatoes)
+#   "prefix"  any word starting with the term (plant -> plantation, grow -> growth)
+INFLECTION = r"(?:s|es|ed|ing|ped|ping|y)?"
+MODE_ORDER = ("exact", "inflect", "prefix")  # a term in several categories uses the loosest
+
+WEATHER_TERMS = ["weather", "temperature", "forecast", "rain", "rainfall", "sunny", "humidity"]
+LOCATION_ONLY_TERMS = ["location", "where am i", "my location", "this area"]
+SPECIAL_LOCATION_PHRASES = ["current location", "my location", "here", "this area", "my area"]
+# Besides weather and location-only terms, these also need the user's location
+LOCAL_TERMS = ["climate", "local", "here", "my area", "region"]
+# Crop context: questions mentioning these go to the LLM even if they ask about weather
+FARMING_TERMS = ["crop", "farming", "agricultur", "plant", "cultivat", "grow", "harvest"]
+# Words that tie a crop question to the user's own area
+DEICTIC_TERMS = ["my", "here", "this"]
+CROP_NAMES = [
+    "wheat", "rice", "paddy", "maize", "millet", "barley", "sugarcane", "cotton", "soybean", "groundnut",
+    "mustard", "peas", "chickpeas", "potato", "onion", "garlic", "turmeric", "pulses"
+]
+# Stems on purpose: matched as prefixes ("fertili" -> fertilizer/fertiliser/fertility)
+AGRICULTURAL_TERMS = [
+    "crop", "farming", "agricultur", "plant", "harvest",
+    "soil", "fertili", "irrigat", "pesticid", "cultivat", "grow",
+    "farm", "farmer", "yield", "season", "monsoon", "rabi", "kharif",
+    "vegetable", "fruit", "grain", "cereal", "pulse", "oilseed", "horticultur",
+    "animal husbandry", "livestock", "dairy", "poultry", "fishery", "aquaculture",
+    "climate", "drought", "flood", "storm",
+    "soil health", "crop rotation", "organic farming", "sustainable agriculture",
+    "agroforestry", "permaculture", "greenhouse", "hydroponics", "aquaponics",
+    "agricultural practices", "agricultural technology", "precision farming",
+    "smart farming", "vertical farming", "urban farming", "agricultural research",
+    "agricultural policy", "agricultural economics", "food security", "rural development",
+    "agricultural extension", "agricultural education", "agricultural marketing", "sow",
+]
+
+# category -> (terms, match mode)
+CATEGORIES = {
+    "weather": (WEATHER_TERMS, "inflect"),
+    "location_only": (LOCATION_ONLY_TERMS, "exact"),
+    "special_location": (SPECIAL_LOCATION_PHRASES, "exact"),
+    "local": (LOCAL_TERMS, "exact"),
+    "farming": (FARMING_TERMS, "prefix"),
+    "deictic": (DEICTIC_TERMS, "exact"),
+    "crop_name": (CROP_NAMES, "inflect"),
+    "agricultural": (AGRICULTURAL_TERMS, "prefix"),
+}
+
+class QueryFeatures(NamedTuple):
+    """Everything the pipeline needs to know about a query's wording"""
+    in_domain: bool               # passes the agricultural-assistant filter
+    is_agri: bool                 # crop/farming context
+    is_weather: bool
+    is_location_only: bool        # "where am i", "my location"
+    special_phrase: Optional[str] # "current location", "here", ... (means: detect the user's location)
+    crops: Tuple[str, ...]        # crop names mentioned, in order
+    needs_location: bool
+    location: Optional[Place]     # gazetteer place named in the query
+
+def _term_pattern(term, mode):
+    pattern = r"\s+".join(re.escape(word) for word in term.split())
+    if mode == "prefix":
+        pattern += r"\w*"
+    elif mode == "inflect" and " " not in term:
+        pattern += INFLECTION
+    return pattern
+
+def _build():
+    """One alternation of every term (longest first) plus each term's categories.
+
+    A phrase inherits the categories of any term inside it, so matching
+    "my location" as a whole still counts as "my" and "location".
+    """
+    term_categories = {}
+    modes = {}
+    for category, (terms, mode) in CATEGORIES.items():
+        for term in terms:
+            term_categories.setdefault(term, set()).add(category)
+            modes[term] = max(modes.get(term, mode), mode, key=MODE_ORDER.index)
+    terms = sorted(term_categories, key=len, reverse=True)
+    patterns = [_term_pattern(term, modes[term]) for term in terms]
+    for term in terms:
+        for other, pattern in zip(terms, patterns):
+            if other != term and re.search(rf"\b{pattern}\b", term):
+                term_categories[term] |= term_categories[other]
+    regex = re.compile(r"\b(?:" + "|".join(f"(?P<t{i}>{p})" for i, p in enumerate(patterns)) + r")\b")
+    return regex, terms, {term: frozenset(categories) for term, categories in term_categories.items()}
+
+_TERMS_RE, _TERMS, _TERM_CATEGORIES = _build()
+
+def match_terms(query_lower):
+    """(term, categories) for every keyword in the query, left to right"""
+    for match in _TERMS_RE.finditer(query_lower):
+        term = _TERMS[int(match.lastgroup[1:])]
+        yield term, _TERM_CATEGORIES[term]
+
+@lru_cache(maxsize=4096)
+def analyze_query(query):
+    """Scan the query once and return its QueryFeatures"""
+    query_lower = query.lower()
+    seen = set()
+    special_phrase = None
+    crops = []
+    for term, categories in match_terms(query_lower):
+        seen |= categories
+        if "special_location" in categories and special_phrase is None:
+            special_phrase = term
+        if "crop_name" in categories and term not in crops:
+            crops.append(term)
+
+    is_weather = "weather" in seen
+    is_location_only = "location_only" in seen
+    is_agri = "farming" in seen
+
+    # Special phrases mean "the user's own location", never a named place
+    location = resolve_place(query_lower) if special_phrase is None else None
+
+    return QueryFeatures(
+        in_domain=bool(seen & {"agricultural", "farming", "crop_name", "weather", "location_only"}),
+        is_agri=is_agri,
+        is_weather=is_weather,
+        is_location_only=is_location_only,
+        special_phrase=special_phrase,
+        crops=tuple(crops),
+        needs_location=is_weather or is_location_only or "local" in seen or (is_agri and "deictic" in seen),
+        location=location,
+    )
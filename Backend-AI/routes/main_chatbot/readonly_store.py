@@ -0,0 +1,131 @@
+"""Read-only, memory-mapped serving of the chat vector store.
+
+FAISS.load_local copies index.faiss and the pickled docstore into every
+worker's heap. In read-only mode the index is opened memory-mapped, so
+uvicorn workers share its pages through the OS page cache, and chunk texts
+and metadata are read on demand from docstore.sqlite3 (written by the
+indexer next to the index) instead of being unpickled. Startup time and
+per-worker memory no longer grow with the corpus.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import faiss
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+DOCSTORE_FILE = "docstore.sqlite3"
+
+def read_index_mmap(path):
+    """Open a FAISS index memory-mapped and read-only, falling back to a normal read"""
+    attempts = []
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        attempts.append(faiss.IO_FLAG_MMAP_IFC)  # zero-copy flat/SQ codes (faiss >= 1.10)
+    attempts.append(faiss.IO_FLAG_MMAP)
+    for flag in attempts:
+        try:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.warning(f"Memory-mapped read failed ({str(e).splitlines()[0]}), trying next mode")
+    logger.warning("Reading FAISS index into memory")
+    return faiss.read_index(path)
+
+def write_docstore(vector_store, directory):
+    """Dump chunks by index position into directory/docstore.sqlite3"""
+    path = os.path.join(directory, DOCSTORE_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE chunks (position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, page_content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        rows = []
+        for position, doc_id in sorted(vector_store.index_to_docstore_id.items()):
+            doc = vector_store.docstore.search(doc_id)
+            rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str)))
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+class SQLiteDocstore:
+    """Docstore reading chunks by index position from docstore.sqlite3.
+
+    The file is opened once, when the store is loaded, and that connection is
+    shared by all threads. Its open file descriptor keeps this snapshot
+    readable after the indexer swaps in a new index directory and deletes the
+    old one, so chunks always come from the same build as the memory-mapped
+    index they belong to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.search(0)  # fail fast on a missing or malformed file
+
+    def _query(self, sql, params=()):
+        # Reads are primary-key lookups; one connection serialized by a lock is enough
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def search(self, position):
+        row = self._query("SELECT page_content, metadata FROM chunks WHERE position = ?", (int(position),))
+        if row is None:
+            return f"ID {position} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM chunks")[0]
+
+class PositionIds:
+    """index_to_docstore_id for SQLiteDocstore: the id of a position is the position"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, position):
+        return position
+
+    def get(self, position, default=None):
+        return position if 0 <= position < self.count else default
+
+    def __len__(self):
+        return self.count
+
+def has_docstore(index_dir):
+    return os.path.exists(os.path.join(index_dir, DOCSTORE_FILE))
+
+def _snapshot_id(index_dir):
+    """Changes whenever the indexer renames a new build over index_dir"""
+    try:
+        st = os.stat(index_dir)
+    except FileNotFoundError:
+        return None  # between the indexer's two renames
+    return (st.st_dev, st.st_ino)
+
+def load_readonly_vector_store(index_dir, embedding_model, attempts=5):
+    """LangChain FAISS store over a memory-mapped index and the SQLite docstore.
+
+    The index and the docstore are opened from the same build: if the
+    directory is swapped while they are being opened, both are reopened.
+    """
+    for attempt in range(attempts):
+        snapshot = _snapshot_id(index_dir)
+        try:
+            index = read_index_mmap(os.path.join(index_dir, "index.faiss"))
+            docstore = SQLiteDocstore(os.path.join(index_dir, DOCSTORE_FILE))
+        except (RuntimeError, sqlite3.Error):
+            if attempt == attempts - 1 or (snapshot is not None and _snapshot_id(index_dir) == snapshot):
+                raise
+        else:
+            if snapshot is not None and _snapshot_id(index_dir) == snapshot:
+                return FAISS(embedding_model, index, docstore, PositionIds(index.ntotal))
+        logger.warning(f"{index_dir} was replaced while loading, reopening")
+        time.sleep(0.05)
+    raise RuntimeError(f"{index_dir} kept changing while loading")
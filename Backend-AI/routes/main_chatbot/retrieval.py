@@ -0,0 +1,147 @@
+"""Relevance filtering and diversification for chat retrieval.
+
+Embeddings are unit-normalized, so every score is turned into a cosine
+similarity before COSINE_THRESHOLD is applied: inner-product indexes return
+the cosine directly and L2 indexes (built before the switch to inner
+product) return the squared distance d = 2 - 2 cos. Higher is always more
+relevant.
+
+From the fetch_k nearest chunks above the threshold, k are picked with
+maximal marginal relevance when the index can return stored vectors, and
+chunks that overlap (the splitter repeats up to 200 characters between
+neighbouring chunks) are merged so the prompt does not carry the same text
+twice.
+"""
+import logging
+import os
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = pure relevance, 0 = pure diversity
+DUPLICATE_COSINE = 0.97  # chunks this similar to an already picked one add nothing
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 300
+
+def to_cosine(scores, metric):
+    """FAISS scores -> cosine similarity for unit vectors"""
+    scores = np.asarray(scores, dtype="float32")
+    if metric == faiss.METRIC_INNER_PRODUCT:
+        return scores
+    return 1.0 - scores / 2.0
+
+def _candidate_vectors(index, positions):
+    """Stored vectors for MMR, or None if this index type cannot reconstruct"""
+    try:
+        vectors = np.vstack([index.reconstruct(int(p)) for p in positions]).astype("float32")
+    except RuntimeError:
+        return None
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def mmr_select(query, vectors, k, lambda_mult=MMR_LAMBDA):
+    """Indices of up to k rows of vectors chosen by maximal marginal relevance"""
+    relevance = vectors @ query.ravel()
+    selected = [int(np.argmax(relevance))]
+    redundancy = vectors @ vectors[selected[0]]
+    while len(selected) < min(k, len(vectors)):
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        mmr[selected] = -np.inf
+        mmr[redundancy >= DUPLICATE_COSINE] = -np.inf  # near-copies of a picked chunk
+        best = int(np.argmax(mmr))
+        if mmr[best] == -np.inf:
+            break
+        selected.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+def _overlap(left, right):
+    """Length of the longest suffix of left that is a prefix of right"""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+def merge_overlapping(docs):
+    """Drop repeated chunks and join neighbours that share the splitter overlap"""
+    merged = []
+    seen = set()
+    for doc in docs:
+        text = doc.page_content.strip()
+        key = " ".join(text.split())
+        if key in seen:
+            continue
+        seen.add(key)
+        for i, kept in enumerate(merged):
+            if kept.metadata.get("source") != doc.metadata.get("source"):
+                continue
+            if text in kept.page_content:
+                break
+            size = _overlap(kept.page_content, text)
+            if size:
+                merged[i] = Document(page_content=kept.page_content + text[size:], metadata=kept.metadata)
+                break
+            size = _overlap(text, kept.page_content)
+            if size:
+                merged[i] = Document(page_content=text + kept.page_content[size:], metadata=doc.metadata)
+                break
+        else:
+            merged.append(Document(page_content=text, metadata=doc.metadata))
+    return merged
+
+def _select(vector_store, query, scores, positions, threshold, k, use_mmr):
+    """[(Document, cosine)] from one query's row of index.search results"""
+    index = vector_store.index
+    cosines = to_cosine(scores, index.metric_type)
+    keep = (positions >= 0) & (cosines >= threshold)
+    positions, cosines = positions[keep], cosines[keep]
+    if len(positions) == 0:
+        return []
+
+    order = list(range(min(k, len(positions))))
+    if use_mmr and len(positions) > k:
+        vectors = _candidate_vectors(index, positions)
+        if vectors is not None:
+            order = mmr_select(query, vectors, k)
+
+    results = []
+    for i in order:
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(positions[i])])
+        if isinstance(doc, Document):
+            results.append((doc, float(cosines[i])))
+    results.sort(key=lambda pair: pair[1], reverse=True)
+    return results
+
+def search_batch(vector_store, query_vectors, threshold, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K, use_mmr=RETRIEVAL_MMR):
+    """search() for many queries with a single index.search over the query matrix"""
+    index = vector_store.index
+    if index.ntotal == 0 or len(query_vectors) == 0:
+        return [[] for _ in query_vectors]
+    queries = np.array(query_vectors, dtype="float32").reshape(len(query_vectors), -1)
+    faiss.normalize_L2(queries)
+    scores, positions = index.search(queries, min(max(fetch_k, k), index.ntotal))
+    return [
+        _select(vector_store, queries[i:i + 1], scores[i], positions[i], threshold, k, use_mmr)
+        for i in range(len(queries))
+    ]
+
+def search(vector_store, query_vector, threshold, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K, use_mmr=RETRIEVAL_MMR):
+    """[(Document, cosine)] for the best k chunks at or above threshold, most relevant first"""
+    return search_batch(vector_store, [query_vector], threshold, k, fetch_k, use_mmr)[0]
+
+def relevant_documents(vector_store, query_vector, threshold, **options):
+    """Documents for the prompt: search() results with overlapping chunks merged"""
+    return merge_overlapping([doc for doc, _ in search(vector_store, query_vector, threshold, **options)])
+
+def relevant_documents_batch(vector_store, query_vectors, threshold, **options):
+    """relevant_documents() for a matrix of query vectors"""
+    return [
+        merge_overlapping([doc for doc, _ in results])
+        for results in search_batch(vector_store, query_vectors, threshold, **options)
+    ]
@@ -0,0 +1,109 @@
+"""Offline precision@k / latency evaluation of chat retrieval.
+
+The eval set is JSON lines, one question each:
+
+    {"query": "How do I control aphids on mustard?", "sources": ["mustard.pdf"], "keywords": ["aphid"]}
+
+A retrieved chunk counts as relevant if it comes from one of `sources`
+(file name) or contains one of `keywords` (case-insensitive). Run from
+Backend-AI/:
+
+    python -m routes.main_chatbot.retrieval_eval eval.jsonl [--k 3,4,5] [--thresholds 0.3,0.4,0.5]
+        [--fetch-k 20] [--baseline]
+
+--baseline also scores the old behaviour (top 5 by L2 distance, kept when
+distance >= 0.5). Queries are embedded once; latency is search time only.
+"""
+import argparse
+import json
+import os
+import time
+
+from . import retrieval
+
+def load_eval_set(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def is_relevant(doc, case):
+    source = os.path.basename(str(doc.metadata.get("source", "")))
+    if source in case.get("sources", []):
+        return True
+    text = doc.page_content.lower()
+    return any(keyword.lower() in text for keyword in case.get("keywords", []))
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+def evaluate(cases, vectors, retrieve, k):
+    """Average precision@k, hit rate and search latency of one retrieve(vector) -> docs function"""
+    precisions, hits, returned, latencies = [], 0, 0, []
+    for case, vector in zip(cases, vectors):
+        start = time.perf_counter()
+        docs = retrieve(vector)
+        latencies.append((time.perf_counter() - start) * 1000)
+        relevant = sum(is_relevant(doc, case) for doc in docs[:k])
+        precisions.append(relevant / k)
+        hits += relevant > 0
+        returned += len(docs)
+    count = len(cases)
+    return {
+        "precision_at_k": round(sum(precisions) / count, 4),
+        "hit_rate": round(hits / count, 4),
+        "avg_returned": round(returned / count, 2),
+        "p50_ms": round(_percentile(latencies, 0.5), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+    }
+
+def _legacy_retrieve(vector_store):
+    def retrieve(vector):
+        docs_and_scores = vector_store.similarity_search_with_score_by_vector(vector, k=5)
+        return [doc for doc, score in docs_and_scores if score >= 0.5]
+    return retrieve
+
+def _floats(value):
+    return [float(v) for v in value.split(",") if v]
+
+def _ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    from .chat import init_retrieval_runtime, get_embedding_model
+
+    parser = argparse.ArgumentParser(description="Evaluate chat retrieval precision@k and latency")
+    parser.add_argument("eval_set", help="JSON lines with query, sources and/or keywords")
+    parser.add_argument("--k", type=_ints, default=[retrieval.RETRIEVAL_K])
+    parser.add_argument("--thresholds", type=_floats, default=[0.3, 0.4, 0.5])
+    parser.add_argument("--fetch-k", type=int, default=retrieval.RETRIEVAL_FETCH_K)
+    parser.add_argument("--baseline", action="store_true", help="also score the old L2 >= threshold filter")
+    args = parser.parse_args()
+
+    cases = load_eval_set(args.eval_set)
+    vector_store = init_retrieval_runtime()
+    if vector_store is None:
+        raise SystemExit("vector store could not be loaded")
+
+    start = time.perf_counter()
+    vectors = get_embedding_model().embed_documents([case["query"] for case in cases])
+    embed_ms = (time.perf_counter() - start) * 1000 / len(cases)
+    print(f"{len(cases)} queries, {vector_store.index.ntotal} chunks, embedding {embed_ms:.1f} ms/query")
+    print(f"{'config':<34} {'P@k':>7} {'hit':>7} {'docs':>6} {'p50 ms':>8} {'p95 ms':>8}")
+
+    def report(label, metrics):
+        print(f"{label:<34} {metrics['precision_at_k']:>7.3f} {metrics['hit_rate']:>7.3f} "
+              f"{metrics['avg_returned']:>6.2f} {metrics['p50_ms']:>8.3f} {metrics['p95_ms']:>8.3f}")
+
+    for k in args.k:
+        if args.baseline:
+            report(f"legacy l2>=0.5 k={k}", evaluate(cases, vectors, _legacy_retrieve(vector_store), k))
+        for threshold in args.thresholds:
+            for use_mmr in (False, True):
+                def retrieve(vector):
+                    return [doc for doc, _ in retrieval.search(vector_store, vector, threshold, k=k,
+                                                               fetch_k=args.fetch_k, use_mmr=use_mmr)]
+                label = f"cos>={threshold} k={k} {'mmr' if use_mmr else 'top-k'}"
+                report(label, evaluate(cases, vectors, retrieve, k))
+
+if __name__ == "__main__":
+    main()
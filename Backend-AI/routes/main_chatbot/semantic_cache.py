@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Reuse answers for near-duplicate questions.
+
+    Each scope (location + season bucket) has its own small inner-product
+    FAISS index over L2-normalized query embeddings, so the search score is
+    the cosine similarity. A lookup returns the stored payload of the closest
+    past query when it scores at least `threshold`.
+
+    Bounded on three axes: entries older than `ttl` are dropped when seen,
+    each scope keeps at most `max_entries` (least recently hit evicted first),
+    and at most `max_scopes` scopes are kept (least recently used dropped).
+    """
+
+    def __init__(self, dim, threshold=0.92, max_entries=500, max_scopes=256, ttl=24 * 3600):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self.ttl = ttl
+        self._scopes = OrderedDict()  # scope -> {"index", "entries", "next_id"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _get_scope(self, scope, create=False):
+        bucket = self._scopes.get(scope)
+        if bucket is None and create:
+            bucket = {"index": faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim)), "entries": {}, "next_id": 0}
+            self._scopes[scope] = bucket
+            while len(self._scopes) > self.max_scopes:
+                _, dropped = self._scopes.popitem(last=False)
+                self.evictions += len(dropped["entries"])
+        if bucket is not None:
+            self._scopes.move_to_end(scope)
+        return bucket
+
+    def _remove(self, bucket, ids):
+        if not ids:
+            return
+        bucket["index"].remove_ids(np.asarray(ids, dtype="int64"))
+        for entry_id in ids:
+            bucket["entries"].pop(entry_id, None)
+        self.evictions += len(ids)
+
+    def lookup(self, scope, vector):
+        """Return (payload, similarity) for the best match above threshold, else None"""
+        query = self._normalize(vector)
+        with self._lock:
+            bucket = self._get_scope(scope)
+            if bucket is None or bucket["index"].ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, ids = bucket["index"].search(query, 1)
+            score, entry_id = float(scores[0][0]), int(ids[0][0])
+            entry = bucket["entries"].get(entry_id)
+            now = time.time()
+
+            if entry is not None and now - entry["created"] > self.ttl:
+                self._remove(bucket, [entry_id])
+                entry = None
+
+            if entry is None or score < self.threshold:
+                self.misses += 1
+                return None
+
+            entry["last_hit"] = now
+            self.hits += 1
+            return entry["payload"], score
+
+    def add(self, scope, vector, payload):
+        """Store a payload for a query embedding"""
+        query = self._normalize(vector)
+        with self._lock:
+            bucket = self._get_scope(scope, create=True)
+            now = time.time()
+
+            expired = [i for i, e in bucket["entries"].items() if now - e["created"] > self.ttl]
+            self._remove(bucket, expired)
+            if len(bucket["entries"]) >= self.max_entries:
+                overflow = len(bucket["entries"]) - self.max_entries + 1
+                oldest = sorted(bucket["entries"], key=lambda i: bucket["entries"][i]["last_hit"])[:overflow]
+                self._remove(bucket, oldest)
+
+            entry_id = bucket["next_id"]
+            bucket["next_id"] += 1
+            bucket["index"].add_with_ids(query, np.asarray([entry_id], dtype="int64"))
+            bucket["entries"][entry_id] = {"payload": payload, "created": now, "last_hit": now}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "scopes": len(self._scopes),
+            "entries": sum(len(b["entries"]) for b in self._scopes.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
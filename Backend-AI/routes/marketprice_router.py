@@ -1,12 +1,15 @@
 # routes/marketprice_router.py
-from fastapi import APIRouter, Query
-import httpx
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import json
+from services.Market_Price.prices import get_market_records, iter_market_records, MarketDataError, PAGE_SIZE
+from services.Market_Price.store import get_market_store, parse_query_date
 
 router = APIRouter()
 
-# Base API endpoint
-BASE_URL = "https://api.data.gov.in/resource/35985678-0d79-46b4-9ed6-6f13308a1d24"
-API_KEY = "579b464db66ec23bdd000001abfa9b4116554203699ab39f0ff62533"  # demo key
+def _parse_fields(fields):
+    """'Market,Commodity,Modal_Price' -> ['Market', 'Commodity', 'Modal_Price']"""
+    return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
 
 @router.get("/market-price")
 async def get_market_price(
@@ -14,29 +17,110 @@ async def get_market_price(
     district: str = Query(None, description="District name"),
     commodity: str = Query(None, description="Commodity name"),
     arrival_date: str = Query(None, description="Arrival date in DD/MM/YYYY format"),
+    limit: int = Query(PAGE_SIZE, ge=1, le=PAGE_SIZE, description="Maximum number of records to return"),
+    offset: int = Query(0, ge=0, description="Number of records to skip"),
+    fields: str = Query(None, description="Comma-separated record fields to return"),
 ):
     """
     Fetch market price data from data.gov.in based on filters.
+
+    Returns at most 1000 records per call, as before; use offset to page
+    through larger results, or /market-price/stream to get all of them.
+    Records come from a local cache that expires at the next daily publish.
     """
+    try:
+        return await get_market_records(
+            state, district, commodity, arrival_date,
+            offset=offset, limit=limit, fields=_parse_fields(fields)
+        )
+    except MarketDataError:
+        return {"error": "Failed to fetch data from external API"}
 
-    params = {
-        "api-key": API_KEY,
-        "format": "json",
-        "limit": 1000,
-        "filters[State]": state,
-    }
+@router.get("/market-price/stream")
+async def stream_market_price(
+    state: str = Query(..., description="State name"),
+    district: str = Query(None, description="District name"),
+    commodity: str = Query(None, description="Commodity name"),
+    arrival_date: str = Query(None, description="Arrival date in DD/MM/YYYY format"),
+    limit: int = Query(None, ge=1, description="Maximum number of records to return"),
+    offset: int = Query(0, ge=0, description="Number of records to skip"),
+    fields: str = Query(None, description="Comma-separated record fields to return"),
+):
+    """
+    Stream market price records as NDJSON (one JSON record per line) while
+    the upstream pages are still being fetched. A failure mid-stream is
+    reported as a final {"error": ...} line.
+    """
+    async def ndjson():
+        try:
+            async for record in iter_market_records(
+                state, district, commodity, arrival_date,
+                offset=offset, limit=limit, fields=_parse_fields(fields)
+            ):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        except MarketDataError:
+            yield json.dumps({"error": "Failed to fetch data from external API"}) + "\n"
 
-    if district:
-        params["filters[District]"] = district
-    if commodity:
-        params["filters[Commodity]"] = commodity
-    if arrival_date:
-        params["filters[Arrival_Date]"] = arrival_date
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(BASE_URL, params=params)
+# ----- Local store endpoints (served from the ingested columnar snapshot) -----
 
-    if response.status_code != 200:
-        return {"error": "Failed to fetch data from external API"}
+def _check_dates(*dates):
+    """422 for a date filter the store cannot parse"""
+    for value in dates:
+        if value:
+            try:
+                parse_query_date(value)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/market-price/summary")
+async def market_price_summary(
+    state: str = Query(None, description="State name"),
+    district: str = Query(None, description="District name"),
+    commodity: str = Query(None, description="Commodity name"),
+    market: str = Query(None, description="Market (mandi) name"),
+    from_date: str = Query(None, description="Start date, DD/MM/YYYY or YYYY-MM-DD"),
+    to_date: str = Query(None, description="End date, DD/MM/YYYY or YYYY-MM-DD"),
+):
+    """
+    Min / max / average modal price over the locally stored history.
+    """
+    _check_dates(from_date, to_date)
+    return get_market_store().aggregate(
+        state=state, district=district, commodity=commodity, market=market, from_date=from_date, to_date=to_date
+    )
+
+@router.get("/market-price/history")
+async def market_price_history(
+    commodity: str = Query(..., description="Commodity name"),
+    state: str = Query(None, description="State name"),
+    district: str = Query(None, description="District name"),
+    market: str = Query(None, description="Market (mandi) name"),
+    from_date: str = Query(None, description="Start date, DD/MM/YYYY or YYYY-MM-DD"),
+    to_date: str = Query(None, description="End date, DD/MM/YYYY or YYYY-MM-DD"),
+):
+    """
+    Daily price series for a commodity from the local store.
+    """
+    _check_dates(from_date, to_date)
+    return {"commodity": commodity, "series": get_market_store().time_series(
+        state=state, district=district, commodity=commodity, market=market, from_date=from_date, to_date=to_date
+    )}
+
+@router.get("/market-price/compare")
+async def market_price_compare(
+    commodity: str = Query(..., description="Commodity name"),
+    state: str = Query(None, description="State name"),
+    district: str = Query(None, description="District name"),
+    from_date: str = Query(None, description="Start date, DD/MM/YYYY or YYYY-MM-DD"),
+    to_date: str = Query(None, description="End date, DD/MM/YYYY or YYYY-MM-DD"),
+):
+    """
+    Latest price of a commodity in each market, cheapest first.
+    """
+    _check_dates(from_date, to_date)
+    return {"commodity": commodity, "markets": get_market_store().compare_markets(
+        state=state, district=district, commodity=commodity, from_date=from_date, to_date=to_date
+    )}
 
-    return response.json()
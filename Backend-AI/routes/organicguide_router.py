@@ -1,10 +1,10 @@
 # routes/organicguide_router.py
 from fastapi import APIRouter, Query
-from services.Farming_Guide.guide import generate_organic_guide
+from services.Farming_Guide.guide_cache import get_organic_guide
 
 router = APIRouter()
 
 @router.get("/guide-region")
 async def get_guide(location: str = Query(..., description="Location for organic guide")):
-    data = await generate_organic_guide(location)
+    data = await get_organic_guide(location)
     return {"location": location, "guide": data}
@@ -1,17 +1,20 @@
 # Farming_Guide/guide.py
-import google.generativeai as genai
-import os
+from services.llm_providers import get_gemini_model
 import json
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Configure API key (make sure it's set in environment variables)
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Use a valid model name (shared instance from the LLM provider registry)
+GUIDE_MODEL = "gemini-2.0-flash"
 
-# Use a valid model name
-model = genai.GenerativeModel("gemini-2.0-flash")  
+# Titles of the placeholder guides returned when generation fails
+FALLBACK_TITLES = {"Format Error", "Service Unavailable"}
+
+def is_fallback_guide(data):
+    """True for the error placeholders below (these must never be cached)"""
+    return not data or (len(data) == 1 and data[0].get("title") in FALLBACK_TITLES)
 
 async def generate_organic_guide(location: str):
     prompt = f"""
@@ -53,6 +56,7 @@ async def generate_organic_guide(location: str):
     """
 
     try:
+        model = get_gemini_model(GUIDE_MODEL)
         response = await model.generate_content_async(prompt)
         
         # Clean the response text
@@ -0,0 +1,126 @@
+# Farming_Guide/guide_cache.py
+import asyncio
+import logging
+import os
+from services.ttl_cache import TTLCache
+from services.response_cache import SQLiteCacheBackend, serialize, deserialize
+from services.Farming_Guide.guide import generate_organic_guide, is_fallback_guide
+
+logger = logging.getLogger(__name__)
+
+# Guides for a region barely change, so they are kept for a long time: a week
+# in memory and a month in the persistent store (filled by the warm-up job).
+GUIDE_MEMORY_TTL_SECONDS = int(os.getenv("GUIDE_MEMORY_TTL_SECONDS", str(7 * 24 * 3600)))
+GUIDE_STORE_TTL_SECONDS = int(os.getenv("GUIDE_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+GUIDE_MEMORY_MAX_ENTRIES = int(os.getenv("GUIDE_MEMORY_MAX_ENTRIES", "1024"))
+GUIDE_STORE_PATH = os.getenv(
+    "GUIDE_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "cache", "guides.sqlite3")
+)
+
+# Old / alternate spellings folded onto one canonical name
+LOCATION_ALIASES = {
+    "gurgaon": "gurugram",
+    "allahabad": "prayagraj",
+    "bombay": "mumbai",
+    "madras": "chennai",
+    "calcutta": "kolkata",
+    "bangalore": "bengaluru",
+    "mysore": "mysuru",
+    "poona": "pune",
+    "cochin": "kochi",
+    "trivandrum": "thiruvananthapuram",
+    "baroda": "vadodara",
+    "banaras": "varanasi",
+    "benares": "varanasi",
+    "orissa": "odisha",
+    "pondicherry": "puducherry",
+    "uttaranchal": "uttarakhand",
+    "tamilnadu": "tamil nadu",
+    "new delhi": "delhi",
+    "nct of delhi": "delhi",
+    "up": "uttar pradesh",
+    "mp": "madhya pradesh",
+    "j&k": "jammu and kashmir",
+    "j and k": "jammu and kashmir",
+}
+_DROP_WORDS = {"state", "district", "india"}
+
+memory_cache = TTLCache(GUIDE_MEMORY_MAX_ENTRIES, GUIDE_MEMORY_TTL_SECONDS, name="organic_guides")
+_store = None
+
+def normalize_location(location):
+    """Case/whitespace/punctuation/alias-folded key for a location"""
+    text = location.lower().replace("&", " and ")
+    cleaned = " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+    if cleaned in LOCATION_ALIASES:
+        return LOCATION_ALIASES[cleaned]
+    words = [w for w in cleaned.split() if w not in _DROP_WORDS]
+    cleaned = " ".join(words)
+    return LOCATION_ALIASES.get(cleaned, cleaned)
+
+def get_guide_store():
+    """Persistent guide store (SQLite, shared by all workers)"""
+    global _store
+    if _store is None:
+        _store = SQLiteCacheBackend(GUIDE_STORE_PATH, GUIDE_STORE_TTL_SECONDS, max_entries=100000, max_bytes=256 * 1024 * 1024)
+    return _store
+
+def _read_store(key):
+    try:
+        payload = get_guide_store().get(key)
+        return deserialize(payload) if payload is not None else None
+    except Exception as e:
+        logger.error(f"Error reading guide store: {str(e)}")
+        return None
+
+def _write_store(key, data):
+    try:
+        get_guide_store().set(key, serialize(data))
+    except Exception as e:
+        logger.error(f"Error writing guide store: {str(e)}")
+
+async def _load_guide(key, location):
+    """Persistent store first, then Gemini (stored only if it is a real guide)"""
+    data = await asyncio.to_thread(_read_store, key)
+    if data is not None:
+        return data
+    data = await generate_organic_guide(location)
+    if not is_fallback_guide(data):
+        await asyncio.to_thread(_write_store, key, data)
+    return data
+
+async def get_organic_guide(location):
+    """Cached organic guide for a location.
+
+    Concurrent requests for the same (normalized) location share one Gemini
+    call; the "Format Error" / "Service Unavailable" placeholders are returned
+    but never cached, so the next request retries.
+    """
+    key = normalize_location(location)
+    return await memory_cache.get_or_load_async(
+        key,
+        lambda: _load_guide(key, location),
+        cache_if=lambda data: not is_fallback_guide(data)
+    )
+
+async def warm_guide(location, force=False):
+    """Generate and store the guide for one location; returns True if stored"""
+    key = normalize_location(location)
+    if not force and await asyncio.to_thread(_read_store, key) is not None:
+        return True
+    data = await generate_organic_guide(location)
+    if is_fallback_guide(data):
+        logger.warning(f"Guide generation failed for {location}")
+        return False
+    await asyncio.to_thread(_write_store, key, data)
+    memory_cache.set(key, data)
+    return True
+
+def guide_cache_stats():
+    stats = {"memory": memory_cache.stats()}
+    try:
+        stats["persistent"] = get_guide_store().stats()
+    except Exception as e:
+        stats["persistent"] = {"error": str(e)}
+    return stats
@@ -0,0 +1,83 @@
+# Farming_Guide/warmup.py
+"""Pre-generate organic farming guides into the persistent guide store.
+
+Run from Backend-AI/:
+
+    python -m services.Farming_Guide.warmup [--concurrency 4] [--force] [--states-only]
+
+Locations already in the store are skipped unless --force is given.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from dotenv import load_dotenv
+from services.Farming_Guide.guide_cache import warm_guide
+
+logger = logging.getLogger(__name__)
+
+INDIAN_STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa",
+    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala",
+    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland",
+    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura",
+    "Uttar Pradesh", "Uttarakhand", "West Bengal",
+    # Union territories
+    "Andaman and Nicobar Islands", "Chandigarh", "Dadra and Nagar Haveli and Daman and Diu",
+    "Delhi", "Jammu and Kashmir", "Ladakh", "Lakshadweep", "Puducherry",
+]
+
+MAJOR_DISTRICTS = [
+    "Ludhiana", "Amritsar", "Bathinda", "Patiala", "Karnal", "Hisar", "Sirsa",
+    "Meerut", "Muzaffarnagar", "Bareilly", "Varanasi", "Gorakhpur", "Agra", "Lucknow",
+    "Patna", "Muzaffarpur", "Bhagalpur", "Purnia",
+    "Bardhaman", "Nadia", "Murshidabad", "Jalpaiguri",
+    "Cuttack", "Sambalpur", "Ganjam",
+    "Raipur", "Durg", "Bilaspur",
+    "Indore", "Ujjain", "Hoshangabad", "Jabalpur", "Sehore",
+    "Jaipur", "Sri Ganganagar", "Kota", "Jodhpur", "Bikaner",
+    "Ahmedabad", "Rajkot", "Junagadh", "Banaskantha", "Anand",
+    "Nashik", "Pune", "Ahmednagar", "Kolhapur", "Nagpur", "Amravati", "Aurangabad",
+    "Belagavi", "Mandya", "Mysuru", "Raichur", "Davanagere",
+    "Guntur", "Krishna", "East Godavari", "West Godavari", "Kurnool",
+    "Warangal", "Nalgonda", "Karimnagar",
+    "Thanjavur", "Coimbatore", "Madurai", "Tiruchirappalli",
+    "Palakkad", "Thrissur", "Wayanad", "Idukki",
+    "Shimla", "Kangra", "Dehradun", "Nainital", "Nagaon", "Jorhat", "Srinagar", "Anantnag",
+]
+
+async def warm_up(locations, concurrency=4, force=False):
+    """Generate guides for all locations with bounded concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {"stored": 0, "failed": []}
+
+    async def warm(location):
+        async with semaphore:
+            if await warm_guide(location, force=force):
+                results["stored"] += 1
+            else:
+                results["failed"].append(location)
+
+    await asyncio.gather(*(warm(location) for location in locations))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate organic farming guides")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel Gemini requests")
+    parser.add_argument("--force", action="store_true", help="Regenerate guides already in the store")
+    parser.add_argument("--states-only", action="store_true", help="Skip the district list")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    locations = INDIAN_STATES if args.states_only else INDIAN_STATES + MAJOR_DISTRICTS
+    start = time.perf_counter()
+    results = asyncio.run(warm_up(locations, concurrency=args.concurrency, force=args.force))
+    logger.info(
+        f"Warmed {results['stored']}/{len(locations)} guides in {time.perf_counter() - start:.1f}s"
+        + (f"; failed: {', '.join(results['failed'])}" if results["failed"] else "")
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Geo/build_gazetteer.py
+"""Extend the bundled gazetteer from a GeoNames country dump.
+
+Run from Backend-AI/ with IN.txt and admin1CodesASCII.txt from
+https://download.geonames.org/export/dump/:
+
+    python -m services.Geo.build_gazetteer IN.txt admin1CodesASCII.txt
+        [--min-population 50000] [--output services/Geo/data/india_places.json]
+
+Curated entries already in the file are kept as they are, with their
+aliases and context_only flags. Districts (ADM2), district headquarters
+(PPLA/PPLA2) and towns above --min-population are added after them.
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+
+from services.Geo.gazetteer import GAZETTEER_PATH, Gazetteer, tokenize
+
+csv.field_size_limit(sys.maxsize)
+
+def load_admin1(path, gazetteer, country="IN"):
+    """GeoNames admin1 code ("07") -> the gazetteer's name for that state"""
+    states = {}
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            code, name = row[0], row[2]
+            if code.startswith(country + "."):
+                # "National Capital Territory of Delhi" -> "Delhi", "Orissa" -> "Odisha"
+                place = gazetteer.resolve(name)
+                states[code.split(".", 1)[1]] = place.state if place else name
+    return states
+
+def geonames_places(path, states, min_population):
+    """Gazetteer entries for the districts and towns in a GeoNames dump"""
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            feature_class, feature_code, admin1 = row[6], row[7], row[10]
+            population = int(row[14] or 0)
+            if feature_code == "ADM2":
+                kind = "district"
+            elif feature_class == "P" and (feature_code in ("PPLC", "PPLA", "PPLA2") or population >= min_population):
+                kind = "city"
+            else:
+                continue
+            state = states.get(admin1)
+            if not state:
+                continue
+            name = re.sub(r"\s+(district|division)$", "", row[1], flags=re.I).strip()
+            entry = {"name": name, "kind": kind, "state": state, "lat": round(float(row[4]), 4), "lon": round(float(row[5]), 4)}
+            ascii_name = re.sub(r"\s+(district|division)$", "", row[2], flags=re.I).strip()
+            if ascii_name and ascii_name != name:
+                entry["aliases"] = [ascii_name]
+            # Short single words collide with ordinary English too often
+            if len(tokenize(name)) == 1 and len(name) <= 4:
+                entry["context_only"] = True
+            yield population, entry
+
+def merge(curated, extra):
+    """Curated entries first, then new (name, state, kind) entries by population"""
+    seen = {(tuple(tokenize(p["name"])), p["state"]) for p in curated}
+    for p in curated:
+        for alias in p.get("aliases", []):
+            seen.add((tuple(tokenize(alias)), p["state"]))
+    merged = list(curated)
+    for _, entry in sorted(extra, key=lambda item: -item[0]):
+        key = (tuple(tokenize(entry["name"])), entry["state"])
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(entry)
+    return merged
+
+def write_gazetteer(places, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n  "version": 1,\n  "places": [\n')
+        f.write(",\n".join("    " + json.dumps(p, ensure_ascii=False) for p in places))
+        f.write("\n  ]\n}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Add GeoNames districts and towns to the gazetteer")
+    parser.add_argument("places", help="GeoNames country dump, e.g. IN.txt")
+    parser.add_argument("admin1", help="GeoNames admin1CodesASCII.txt")
+    parser.add_argument("--min-population", type=int, default=50000)
+    parser.add_argument("--output", default=GAZETTEER_PATH)
+    args = parser.parse_args()
+
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        curated = json.load(f)["places"]
+    states = load_admin1(args.admin1, Gazetteer.load(GAZETTEER_PATH))
+    extra = list(geonames_places(args.places, states, args.min_population))
+    places = merge(curated, extra)
+    write_gazetteer(places, args.output)
+    print(f"{len(curated)} curated + {len(places) - len(curated)} from GeoNames -> {args.output}")
+
+if __name__ == "__main__":
+    main()
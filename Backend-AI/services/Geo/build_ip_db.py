@@ -0,0 +1,98 @@
+# Geo/build_ip_db.py
+"""Build the memory-mapped IP database from a city-level CSV.
+
+Run from Backend-AI/:
+
+    python -m services.Geo.build_ip_db dbip-city-lite.csv [--format dbip]
+        [--countries IN] [--output services/Geo/data/ip_db]
+
+Formats:
+    dbip         DB-IP "IP to City Lite": start, end, continent, country code,
+                 state, city, lat, lon (addresses as text, IPv4 and IPv6)
+    ip2location  IP2Location LITE DB5: from, to, country code, country,
+                 state, city, lat, lon (addresses as integers)
+
+--countries keeps only the listed country codes, which shrinks the files a
+lot when all users are in one country. Ranges must not overlap; adjacent
+ranges with the same place are merged.
+"""
+import argparse
+import csv
+import ipaddress
+import json
+import os
+
+import numpy as np
+
+from services.Geo.ip_db import IP_DB_DIR, KEY_DTYPE, address_key
+
+FORMATS = {
+    # format -> (start, end, country code, state, city, lat, lon) columns
+    "dbip": (0, 1, 3, 4, 5, 6, 7),
+    "ip2location": (0, 1, 2, 4, 5, 6, 7),
+}
+
+def _address(value):
+    value = value.strip()
+    return ipaddress.ip_address(int(value) if value.isdigit() else value)
+
+def read_ranges(path, fmt, countries=None):
+    """(start_key, end_key, place) rows from the CSV"""
+    start_col, end_col, country_col, state_col, city_col, lat_col, lon_col = FORMATS[fmt]
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[start_col].strip() or row[start_col].startswith("#"):
+                continue
+            try:
+                start, end = _address(row[start_col]), _address(row[end_col])
+            except ValueError:
+                continue  # header line
+            country = row[country_col].strip()
+            if countries and country not in countries:
+                continue
+            place = (row[city_col].strip(), row[state_col].strip(), country,
+                     round(float(row[lat_col]), 4), round(float(row[lon_col]), 4))
+            yield address_key(start), address_key(end), place
+
+def build(path, output, fmt="dbip", countries=None):
+    rows = sorted(read_ranges(path, fmt, countries), key=lambda row: row[0].ljust(16, b"\0"))
+    starts, ends, place_ids = [], [], []
+    places, place_index = [], {}
+    for start, end, place in rows:
+        pid = place_index.setdefault(place, len(places))
+        if pid == len(places):
+            places.append(list(place))
+        if place_ids and place_ids[-1] == pid and _adjacent(ends[-1], start):
+            ends[-1] = end
+            continue
+        starts.append(start)
+        ends.append(end)
+        place_ids.append(pid)
+
+    os.makedirs(output, exist_ok=True)
+    np.save(os.path.join(output, "starts.npy"), np.array(starts, dtype=KEY_DTYPE))
+    np.save(os.path.join(output, "ends.npy"), np.array(ends, dtype=KEY_DTYPE))
+    np.save(os.path.join(output, "places.npy"), np.array(place_ids, dtype=np.int32))
+    with open(os.path.join(output, "places.json"), "w", encoding="utf-8") as f:
+        json.dump(places, f, ensure_ascii=False, separators=(",", ":"))
+    return len(rows), len(starts), len(places)
+
+def _adjacent(end, start):
+    """True when start is the address right after end"""
+    as_int = lambda key: int.from_bytes(key.ljust(16, b"\0"), "big")
+    return as_int(start) == as_int(end) + 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline IP-to-location database")
+    parser.add_argument("csv", help="DB-IP or IP2Location city CSV")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="dbip")
+    parser.add_argument("--countries", help="comma-separated country codes to keep, e.g. IN")
+    parser.add_argument("--output", default=IP_DB_DIR)
+    args = parser.parse_args()
+
+    countries = set(args.countries.split(",")) if args.countries else None
+    read, ranges, places = build(args.csv, args.output, args.format, countries)
+    print(f"{read} rows -> {ranges} ranges, {places} places in {args.output}")
+
+if __name__ == "__main__":
+    main()
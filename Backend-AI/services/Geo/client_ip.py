@@ -0,0 +1,45 @@
+# Geo/client_ip.py
+"""The end user's IP address for a request that may have come through proxies.
+
+X-Forwarded-For is only believed when the direct peer is one of our own
+proxies (FORWARDED_TRUSTED_PROXIES). The header is then read right to left,
+skipping further trusted hops, so a client cannot pick its own address by
+sending a forged X-Forwarded-For.
+"""
+import ipaddress
+import os
+
+FORWARDED_TRUSTED_PROXIES = [
+    ipaddress.ip_network(net.strip())
+    for net in os.getenv(
+        "FORWARDED_TRUSTED_PROXIES",
+        "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7"
+    ).split(",")
+    if net.strip()
+]
+
+def _is_trusted(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in net for net in FORWARDED_TRUSTED_PROXIES)
+
+def client_ip(peer, forwarded_for=None):
+    """Client address from the socket peer and the X-Forwarded-For header"""
+    if not peer or not forwarded_for or not _is_trusted(peer):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            try:
+                return str(ipaddress.ip_address(hop))
+            except ValueError:
+                return peer  # garbage in the header: fall back to the proxy itself
+    # Every hop is one of ours (internal traffic): the left-most is the origin
+    return hops[0] if hops else peer
+
+def request_client_ip(request):
+    """client_ip() for a FastAPI/Starlette request"""
+    peer = request.client.host if request.client else None
+    return client_ip(peer, request.headers.get("x-forwarded-for"))
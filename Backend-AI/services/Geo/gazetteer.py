@@ -0,0 +1,172 @@
+# Geo/gazetteer.py
+"""Offline gazetteer of Indian states, districts and towns.
+
+Place names and aliases (Gurgaon/Gurugram, Allahabad/Prayagraj) are loaded
+from data/india_places.json into a token trie, and a query is resolved by
+longest match: "new delhi" beats "delhi", "lakhimpur kheri" beats nothing.
+Every alias maps to one canonical place with coordinates, so weather is
+looked up by lat/lon and two spellings of a town share a cache entry.
+
+Names that are also ordinary words ("mandi", "erode", "puri") are marked
+context_only and match only after "in"/"at"/"near"/... or before
+"district"/"city".
+
+The bundled file covers states/UTs and major towns and district
+headquarters. A fuller one can be built from a GeoNames dump with
+python -m services.Geo.build_gazetteer.
+"""
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "india_places.json")
+)
+COUNTRY = "India"
+CONTEXT_BEFORE = {"in", "at", "near", "around", "for", "of", "from"}
+CONTEXT_AFTER = {"district", "city", "town", "region"}
+KIND_PRIORITY = {"city": 0, "district": 1, "state": 2}
+_END = ""  # trie key marking the end of a name (tokens are never empty)
+
+def _terminals(node):
+    for key, child in node.items():
+        if key == _END:
+            yield child
+        else:
+            yield from _terminals(child)
+
+class Place(NamedTuple):
+    name: str
+    kind: str  # city | district | state
+    state: str
+    latitude: float
+    longitude: float
+    context_only: bool = False
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", text.lower().replace("&", " and "))
+
+class Gazetteer:
+    """Token trie over canonical names and aliases"""
+
+    def __init__(self, entries):
+        """entries: (Place, [alias, ...]) pairs"""
+        self.places = []
+        self.trie = {}
+        for place, aliases in entries:
+            index = len(self.places)
+            self.places.append(place)
+            for name in [place.name, *aliases]:
+                node = self.trie
+                for token in tokenize(name):
+                    node = node.setdefault(token, {})
+                if index not in node.setdefault(_END, []):
+                    node[_END].append(index)
+        # An ambiguous name lists towns before districts before states
+        for entries_at_node in _terminals(self.trie):
+            entries_at_node.sort(key=lambda i: KIND_PRIORITY.get(self.places[i].kind, len(KIND_PRIORITY)))
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        entries = [
+            (Place(entry["name"], entry["kind"], entry["state"], float(entry["lat"]), float(entry["lon"]),
+                   bool(entry.get("context_only", False))),
+             entry.get("aliases", []))
+            for entry in data["places"]
+        ]
+        logger.info(f"Loaded gazetteer with {len(entries)} places from {path}")
+        return cls(entries)
+
+    def matches(self, text):
+        """Longest non-overlapping (start, end, candidate places) spans in the text"""
+        tokens = tokenize(text)
+        spans = []
+        i = 0
+        while i < len(tokens):
+            node, end, found = self.trie, None, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if _END in node:
+                    end, found = j + 1, node[_END]
+            if found is None:
+                i += 1
+                continue
+            in_context = (i > 0 and tokens[i - 1] in CONTEXT_BEFORE) or (end < len(tokens) and tokens[end] in CONTEXT_AFTER)
+            candidates = [self.places[k] for k in found if in_context or not self.places[k].context_only]
+            if candidates:
+                spans.append((i, end, candidates))
+            i = end
+        return spans
+
+    def resolve(self, text):
+        """The most specific place named in the text, or None.
+
+        Towns/districts win over states; a state mentioned alongside an
+        ambiguous name ("Aurangabad, Bihar") picks the candidate in it.
+        """
+        spans = self.matches(text)
+        if not spans:
+            return None
+        states = {place.state for _, _, candidates in spans for place in candidates if place.kind == "state"}
+        for _, _, candidates in spans:
+            local = [place for place in candidates if place.kind != "state"]
+            if local:
+                return next((place for place in local if place.state in states), local[0])
+        return spans[0][2][0]
+
+    def candidates(self, name):
+        """Every place with this exact canonical name or alias, most specific first"""
+        node = self.trie
+        for token in tokenize(name):
+            node = node.get(token)
+            if node is None:
+                return []
+        return [self.places[i] for i in node.get(_END, [])]
+
+    def lookup(self, name):
+        """Place for an exact canonical name or alias"""
+        candidates = self.candidates(name)
+        return candidates[0] if candidates else None
+
+@lru_cache(maxsize=1)
+def get_gazetteer():
+    return Gazetteer.load()
+
+def resolve_place(text):
+    """Canonical place named in free text, or None"""
+    return get_gazetteer().resolve(text)
+
+def place_to_location(place):
+    """Location dict in the shape detect_user_location returns"""
+    return {
+        "city": place.name,
+        "state": place.state,
+        "country": COUNTRY,
+        "latitude": place.latitude,
+        "longitude": place.longitude,
+        "detected_via": "query extraction",
+    }
+
+def canonicalize_location(location_data):
+    """Gazetteer spelling of a detected Indian city ("Gurgaon" -> "Gurugram"), keeping its coordinates"""
+    if location_data.get("country") not in ("IN", COUNTRY, "Unknown", None):
+        return location_data
+    gazetteer = get_gazetteer()
+    candidates = [place for place in gazetteer.candidates(location_data.get("city") or "") if place.kind != "state"]
+    state = gazetteer.lookup(location_data.get("state") or "")
+    if state is not None:
+        candidates = [place for place in candidates if place.state == state.state]
+    if not candidates:
+        return location_data
+    place = candidates[0]
+    return {**location_data, "city": place.name, "state": place.state, "country": COUNTRY}
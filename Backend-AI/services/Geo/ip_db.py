@@ -0,0 +1,91 @@
+# Geo/ip_db.py
+"""Offline IP-to-location lookup over sorted, memory-mapped address ranges.
+
+The database is a directory written by services.Geo.build_ip_db:
+
+    starts.npy     S16  first address of each range, sorted (IPv4 as ::ffff:a.b.c.d)
+    ends.npy       S16  last address of each range
+    places.npy     int32 row in places.json for each range
+    places.json    [[city, state, country, lat, lon], ...]
+
+The arrays are opened with mmap_mode="r", so workers share the pages and a
+lookup (one np.searchsorted) only touches the O(log n) pages it bisects.
+"""
+import ipaddress
+import json
+import logging
+import os
+from functools import lru_cache
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IP_DB_DIR = os.getenv(
+    "IP_DB_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ip_db")
+)
+KEY_DTYPE = "S16"
+
+def address_key(address):
+    """16-byte big-endian sort key for an IPv4 or IPv6 address"""
+    if isinstance(address, str):
+        address = ipaddress.ip_address(address.strip())
+    if address.version == 4:
+        address = ipaddress.IPv6Address(b"\0" * 10 + b"\xff\xff" + address.packed)
+    # numpy drops trailing NULs from S16 items, so compare without them
+    return address.packed.rstrip(b"\0")
+
+def is_public_address(address):
+    """False for private, loopback, link-local and malformed addresses"""
+    try:
+        return ipaddress.ip_address(address).is_global
+    except ValueError:
+        return False
+
+class IPRangeDB:
+    """Binary search over sorted, non-overlapping address ranges"""
+
+    def __init__(self, directory=IP_DB_DIR):
+        self.directory = directory
+        self.starts = np.load(os.path.join(directory, "starts.npy"), mmap_mode="r")
+        self.ends = np.load(os.path.join(directory, "ends.npy"), mmap_mode="r")
+        self.place_ids = np.load(os.path.join(directory, "places.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "places.json"), encoding="utf-8") as f:
+            self.places = json.load(f)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, address):
+        """Location dict for an address, or None when no range covers it"""
+        try:
+            key = address_key(address)
+        except ValueError:
+            return None
+        i = int(np.searchsorted(self.starts, key, side="right")) - 1
+        if i < 0 or self.ends[i] < key:
+            return None
+        city, state, country, latitude, longitude = self.places[int(self.place_ids[i])]
+        return {
+            "city": city or "Unknown",
+            "state": state or "Unknown",
+            "country": country or "Unknown",
+            "latitude": latitude,
+            "longitude": longitude,
+            "detected_via": "IP database"
+        }
+
+@lru_cache(maxsize=1)
+def get_ip_db():
+    """The local IP database, or None when it has not been built"""
+    if not os.path.exists(os.path.join(IP_DB_DIR, "starts.npy")):
+        logger.warning(f"No IP database at {IP_DB_DIR}; client locations fall back to Geoapify")
+        return None
+    try:
+        db = IPRangeDB(IP_DB_DIR)
+    except Exception as e:
+        logger.error(f"Failed to open IP database at {IP_DB_DIR}: {str(e)}")
+        return None
+    logger.info(f"Opened IP database with {len(db)} ranges from {IP_DB_DIR}")
+    return db
@@ -0,0 +1,178 @@
+# Market_Price/ingest.py
+"""Pull the data.gov.in mandi price resource into the local columnar store.
+
+Run from Backend-AI/:
+
+    python -m services.Market_Price.ingest                    # live upstream
+    python -m services.Market_Price.ingest --fixture FILE     # recorded response
+
+The server also runs it every MARKET_INGEST_INTERVAL_HOURS (0 disables,
+e.g. when a cron job runs the command above). Every uvicorn worker starts
+the loop, but a run only happens in the worker that gets the lock file next
+to the store and only when the snapshot is older than the interval; the
+other workers reload the new snapshot when its file changes.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from services.http_clients import get_http_client
+from services.Market_Price.prices import RESOURCE_PATH, API_KEY, PAGE_SIZE, MAX_CONCURRENT_PAGES, MarketDataError
+from services.Market_Price.store import load_market_store, replace_market_store, MARKET_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+MARKET_INGEST_INTERVAL_HOURS = float(os.getenv("MARKET_INGEST_INTERVAL_HOURS", "6"))
+MARKET_RETENTION_DAYS = int(os.getenv("MARKET_RETENTION_DAYS", "365"))
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mandi_prices_sample.json")
+
+async def fetch_upstream_page(offset):
+    """One unfiltered page of the data.gov.in resource"""
+    params = {"api-key": API_KEY, "format": "json", "limit": PAGE_SIZE, "offset": offset}
+    response = await get_http_client("data_gov").get(RESOURCE_PATH, params=params)
+    if response.status_code != 200:
+        raise MarketDataError(f"data.gov.in returned HTTP {response.status_code}")
+    return response.json()
+
+def fixture_page_fetcher(path=FIXTURE_PATH, page_size=PAGE_SIZE):
+    """Page fetcher that replays a recorded upstream response from a JSON file"""
+    with open(path, encoding="utf-8") as f:
+        payload = json.load(f)
+    records = payload.get("records", [])
+
+    async def fetch(offset):
+        return {"total": len(records), "records": records[offset:offset + page_size]}
+
+    fetch.page_size = page_size
+    return fetch
+
+async def fetch_all_records(fetch_page, page_size=PAGE_SIZE):
+    """All records of the resource, paging with bounded concurrency"""
+    first = await fetch_page(0)
+    records = list(first.get("records", []))
+    total = int(first.get("total", len(records)) or 0)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+    async def fetch(offset):
+        async with semaphore:
+            return await fetch_page(offset)
+
+    pages = await asyncio.gather(*(fetch(offset) for offset in range(page_size, total, page_size)))
+    for page in pages:
+        records.extend(page.get("records", []))
+    return records
+
+def _try_lock_fd(fd):
+    """Non-blocking exclusive lock on an open file: flock on POSIX, msvcrt.locking on Windows"""
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+def _unlock_fd(fd):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class IngestionLock:
+    """Non-blocking exclusive lock on <store path>.lock, shared by workers and the CLI.
+
+    The OS drops the lock when its holder exits, so a crashed run never
+    leaves a stale lock behind.
+    """
+
+    def __init__(self, path=MARKET_STORE_PATH):
+        self.path = path + ".lock"
+        self.fd = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _try_lock_fd(fd)
+        except OSError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            _unlock_fd(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+def snapshot_age_hours(path=MARKET_STORE_PATH):
+    """Hours since the snapshot was written (inf when there is none)"""
+    try:
+        return (time.time() - os.path.getmtime(path)) / 3600
+    except OSError:
+        return float("inf")
+
+async def run_ingestion(fetch_page=None, path=MARKET_STORE_PATH):
+    """Fetch, merge into the snapshot at path, persist and swap it in"""
+    start = time.perf_counter()
+    fetch_page = fetch_page or fetch_upstream_page
+    records = await fetch_all_records(fetch_page, getattr(fetch_page, "page_size", PAGE_SIZE))
+    base = await asyncio.to_thread(load_market_store, path)
+    store = await asyncio.to_thread(base.merge, records, MARKET_RETENTION_DAYS)
+    await asyncio.to_thread(replace_market_store, store, path)
+    stats = {**store.stats(), "fetched": len(records), "seconds": round(time.perf_counter() - start, 2)}
+    logger.info(f"Market price ingestion done: {stats}")
+    return stats
+
+async def run_ingestion_if_due(interval_hours, path=MARKET_STORE_PATH):
+    """run_ingestion() unless the snapshot is fresh or another process is ingesting"""
+    if snapshot_age_hours(path) < interval_hours:
+        return None
+    lock = IngestionLock(path)
+    if not lock.acquire():
+        logger.info("Market price ingestion is running in another process")
+        return None
+    try:
+        if snapshot_age_hours(path) < interval_hours:
+            return None  # finished elsewhere while we were checking
+        return await run_ingestion(path=path)
+    finally:
+        lock.release()
+
+async def market_ingestion_loop(interval_hours=MARKET_INGEST_INTERVAL_HOURS):
+    """Background task started by the FastAPI lifespan in every worker"""
+    poll_seconds = min(interval_hours * 3600, 600)
+    while True:
+        try:
+            await run_ingestion_if_due(interval_hours)
+        except Exception as e:
+            logger.error(f"Market price ingestion failed: {str(e)}")
+        await asyncio.sleep(poll_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest mandi prices into the local store")
+    parser.add_argument("--fixture", nargs="?", const=FIXTURE_PATH, help="Replay a recorded response instead of calling data.gov.in")
+    parser.add_argument("--store", default=MARKET_STORE_PATH, help="Output .npz path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    fetch_page = fixture_page_fetcher(args.fixture, page_size=10) if args.fixture else None
+    lock = IngestionLock(args.store)
+    if not lock.acquire():
+        raise SystemExit(f"Another process is ingesting into {args.store}")
+    try:
+        asyncio.run(run_ingestion(fetch_page, path=args.store))
+    finally:
+        lock.release()
+
+if __name__ == "__main__":
+    main()
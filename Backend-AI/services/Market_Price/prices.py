@@ -0,0 +1,192 @@
+# Market_Price/prices.py
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from services.http_clients import get_http_client
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# data.gov.in "Current daily price of various commodities from various markets (Mandi)"
+RESOURCE_PATH = "/resource/35985678-0d79-46b4-9ed6-6f13308a1d24"
+API_KEY = os.getenv("DATA_GOV_API_KEY", "579b464db66ec23bdd000001abfa9b4116554203699ab39f0ff62533")  # demo key
+PAGE_SIZE = 1000
+MAX_CONCURRENT_PAGES = int(os.getenv("MARKET_MAX_CONCURRENT_PAGES", "4"))
+# Mandi prices are published once a day; cached records expire at the next
+# publish time (IST) instead of after a fixed TTL.
+MARKET_PUBLISH_HOUR_IST = int(os.getenv("MARKET_PUBLISH_HOUR_IST", "10"))
+MARKET_CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "512"))
+IST = timezone(timedelta(hours=5, minutes=30))
+
+class MarketDataError(Exception):
+    pass
+
+def seconds_until_next_publish(now=None):
+    """Seconds from now until the next daily publish time in IST (at least 60)"""
+    now = now or datetime.now(IST)
+    publish = now.replace(hour=MARKET_PUBLISH_HOUR_IST, minute=0, second=0, microsecond=0)
+    if publish <= now:
+        publish += timedelta(days=1)
+    return max(60, int((publish - now).total_seconds()))
+
+def market_cache_key(state, district=None, commodity=None, arrival_date=None):
+    """Normalized (state, district, commodity, date) key"""
+    parts = [state, district, commodity, arrival_date]
+    return tuple(" ".join(str(p).lower().split()) if p else "" for p in parts)
+
+def project(record, fields):
+    """Keep only the requested fields of a record"""
+    if not fields:
+        return record
+    return {field: record.get(field) for field in fields}
+
+class MarketDataset:
+    """Records for one filter combination, filled page by page in the background.
+
+    Readers iterate with iter_records() and receive records as soon as each
+    page lands, without waiting for the whole dataset.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.meta = {}  # the upstream response body minus its records (title, field, ...)
+        self.total = None
+        self.complete = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def extend(self, records):
+        self.records.extend(records)
+        self._notify()
+
+    def finish(self, error=None):
+        self.error = error
+        self.complete = True
+        self._notify()
+
+    async def wait_for_total(self):
+        while self.total is None and not self.complete:
+            await self._changed.wait()
+        if self.error and self.total is None:
+            raise MarketDataError(self.error)
+        return self.total if self.total is not None else len(self.records)
+
+    async def iter_records(self, start=0, end=None):
+        """Records [start, end) as they arrive; stops at end without waiting for more pages"""
+        index = start
+        while True:
+            while index < len(self.records) and (end is None or index < end):
+                yield self.records[index]
+                index += 1
+            if end is not None and index >= end:
+                return
+            if self.complete:
+                if self.error:
+                    raise MarketDataError(self.error)
+                return
+            await self._changed.wait()
+
+_completed = TTLCache(MARKET_CACHE_MAX_ENTRIES, 24 * 3600, name="market_prices")
+_inflight = {}
+_fill_tasks = set()
+
+def _request_params(state, district, commodity, arrival_date, offset):
+    params = {
+        "api-key": API_KEY,
+        "format": "json",
+        "limit": PAGE_SIZE,
+        "offset": offset,
+        "filters[State]": state,
+    }
+    if district:
+        params["filters[District]"] = district
+    if commodity:
+        params["filters[Commodity]"] = commodity
+    if arrival_date:
+        params["filters[Arrival_Date]"] = arrival_date
+    return params
+
+async def _fetch_page(filters, offset):
+    response = await get_http_client("data_gov").get(RESOURCE_PATH, params=_request_params(*filters, offset))
+    if response.status_code != 200:
+        raise MarketDataError("Failed to fetch data from external API")
+    return response.json()
+
+async def _fill(key, dataset, filters):
+    """Fetch the first page, then the remaining pages with bounded concurrency"""
+    try:
+        first = await _fetch_page(filters, 0)
+        records = first.get("records", [])
+        dataset.meta = {k: v for k, v in first.items() if k != "records"}
+        dataset.total = int(first.get("total", len(records)) or 0)
+        dataset.extend(records)
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+        async def fetch(offset):
+            async with semaphore:
+                return await _fetch_page(filters, offset)
+
+        # Pages are requested concurrently but appended in order
+        pages = [asyncio.create_task(fetch(offset)) for offset in range(PAGE_SIZE, dataset.total, PAGE_SIZE)]
+        try:
+            for page in pages:
+                dataset.extend((await page).get("records", []))
+        finally:
+            for page in pages:
+                page.cancel()
+
+        dataset.finish()
+        _completed.set(key, dataset, ttl=seconds_until_next_publish())
+        logger.info(f"Cached {len(dataset.records)} market records for {key}")
+    except Exception as e:
+        logger.error(f"Market price fetch failed for {key}: {str(e)}")
+        dataset.finish(error=str(e))
+    finally:
+        _inflight.pop(key, None)
+
+def get_dataset(state, district=None, commodity=None, arrival_date=None):
+    """Cached dataset for the filters, or one being filled in the background.
+
+    Concurrent requests for the same filters share one set of upstream calls.
+    """
+    key = market_cache_key(state, district, commodity, arrival_date)
+    dataset = _completed.get(key)
+    if dataset is not None:
+        return dataset
+    dataset = _inflight.get(key)
+    if dataset is None:
+        dataset = _inflight[key] = MarketDataset()
+        task = asyncio.create_task(_fill(key, dataset, (state, district, commodity, arrival_date)))
+        _fill_tasks.add(task)
+        task.add_done_callback(_fill_tasks.discard)
+    return dataset
+
+async def iter_market_records(state, district=None, commodity=None, arrival_date=None,
+                              offset=0, limit=None, fields=None):
+    """Yield projected records as they arrive, honouring offset/limit"""
+    dataset = get_dataset(state, district, commodity, arrival_date)
+    end = offset + limit if limit is not None else None
+    async for record in dataset.iter_records(start=offset, end=end):
+        yield project(record, fields)
+
+async def get_market_records(state, district=None, commodity=None, arrival_date=None,
+                             offset=0, limit=None, fields=None):
+    """One page of records in the upstream response shape.
+
+    The upstream body keys are kept; total, count, offset, limit and
+    records describe this page. Returns as soon as the page's records have
+    arrived, without waiting for later upstream pages.
+    """
+    dataset = get_dataset(state, district, commodity, arrival_date)
+    total = await dataset.wait_for_total()
+    records = [r async for r in iter_market_records(state, district, commodity, arrival_date, offset, limit, fields)]
+    return {**dataset.meta, "total": total, "count": len(records), "offset": offset, "limit": limit, "records": records}
+
+def market_cache_stats():
+    return {**_completed.stats(), "in_flight": len(_inflight)}
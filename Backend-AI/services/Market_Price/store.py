@@ -0,0 +1,355 @@
+# Market_Price/store.py
+import logging
+import os
+import tempfile
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MARKET_STORE_PATH = os.getenv(
+    "MARKET_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "cache", "market_store.npz")
+)
+
+# Categorical columns are stored as small integer codes into a per-column
+# list of distinct values; prices are float32 and dates are day ordinals.
+CATEGORY_COLUMNS = ["State", "District", "Market", "Commodity", "Variety", "Grade"]
+PRICE_COLUMNS = ["Min_Price", "Max_Price", "Modal_Price"]
+
+# Bit layout of the composite (state, district, commodity, arrival_date) index key
+_DATE_BITS, _COMMODITY_BITS, _DISTRICT_BITS = 24, 14, 14
+
+def parse_arrival_date(value):
+    """'05/09/2025' -> date ordinal (int), or None"""
+    try:
+        return datetime.strptime(value.strip(), "%d/%m/%Y").date().toordinal()
+    except (AttributeError, ValueError):
+        return None
+
+def parse_query_date(value):
+    """Date filter in DD/MM/YYYY (as in the data) or ISO YYYY-MM-DD -> ordinal.
+
+    Raises ValueError for anything else.
+    """
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value.strip(), fmt).date().toordinal()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date {value!r}; use DD/MM/YYYY or YYYY-MM-DD")
+
+def format_ordinal(ordinal):
+    return date.fromordinal(int(ordinal)).strftime("%d/%m/%Y")
+
+def _parse_price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _price_stat(reduce, values, digits=None):
+    """reduce() over the known prices, or None (not NaN: JSON cannot encode it) if there are none"""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    result = float(reduce(values))
+    return round(result, digits) if digits is not None else result
+
+def _price(value):
+    return None if np.isnan(value) else float(value)
+
+def _norm(value):
+    return " ".join(str(value).lower().split()) if value is not None else ""
+
+class MarketPriceStore:
+    """Immutable columnar snapshot of mandi prices.
+
+    Rows are sorted by a composite uint64 key built from the (state, district,
+    commodity, arrival_date) codes, so any prefix of that tuple - optionally
+    with a date range - resolves to a contiguous row range by binary search.
+    Other filters (e.g. state + commodity across districts) use vectorized
+    masks over the code columns.
+    """
+
+    def __init__(self, categories, codes, prices, dates):
+        self.categories = categories  # column -> list of values
+        self.codes = codes            # column -> int32 array
+        self.prices = prices          # column -> float32 array
+        self.dates = dates            # int32 day ordinals
+        self._lookup = {col: {_norm(v): i for i, v in enumerate(values)} for col, values in categories.items()}
+        self.keys = self._composite_key(
+            self.codes["State"], self.codes["District"], self.codes["Commodity"], self.dates
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    @staticmethod
+    def _composite_key(state, district, commodity, day):
+        key = np.asarray(state, dtype=np.uint64)
+        key = (key << np.uint64(_DISTRICT_BITS)) | np.asarray(district, dtype=np.uint64)
+        key = (key << np.uint64(_COMMODITY_BITS)) | np.asarray(commodity, dtype=np.uint64)
+        return (key << np.uint64(_DATE_BITS)) | np.asarray(day, dtype=np.uint64)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_records([])
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a store from data.gov.in records, dropping duplicates and bad dates"""
+        rows = {}
+        for record in records:
+            day = parse_arrival_date(record.get("Arrival_Date"))
+            if day is None:
+                continue
+            identity = tuple(_norm(record.get(col)) for col in CATEGORY_COLUMNS) + (day,)
+            rows[identity] = (record, day)  # later records win
+
+        categories = {col: [] for col in CATEGORY_COLUMNS}
+        lookup = {col: {} for col in CATEGORY_COLUMNS}
+        codes = {col: [] for col in CATEGORY_COLUMNS}
+        prices = {col: [] for col in PRICE_COLUMNS}
+        dates = []
+        for record, day in rows.values():
+            for col in CATEGORY_COLUMNS:
+                value = str(record.get(col) or "").strip()
+                key = _norm(value)
+                if key not in lookup[col]:
+                    lookup[col][key] = len(categories[col])
+                    categories[col].append(value)
+                codes[col].append(lookup[col][key])
+            for col in PRICE_COLUMNS:
+                prices[col].append(_parse_price(record.get(col)))
+            dates.append(day)
+
+        if len(categories["District"]) >= 1 << _DISTRICT_BITS or len(categories["Commodity"]) >= 1 << _COMMODITY_BITS:
+            raise ValueError("Too many districts/commodities for the composite index")
+
+        return cls._sorted(
+            categories,
+            {col: np.asarray(v, dtype=np.int32) for col, v in codes.items()},
+            {col: np.asarray(v, dtype=np.float32) for col, v in prices.items()},
+            np.asarray(dates, dtype=np.int32),
+        )
+
+    @classmethod
+    def _sorted(cls, categories, codes, prices, dates):
+        keys = cls._composite_key(codes["State"], codes["District"], codes["Commodity"], dates)
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            categories,
+            {col: arr[order] for col, arr in codes.items()},
+            {col: arr[order] for col, arr in prices.items()},
+            dates[order],
+        )
+
+    def to_records(self):
+        records = []
+        for i in range(len(self)):
+            record = {col: self.categories[col][self.codes[col][i]] for col in CATEGORY_COLUMNS}
+            record.update({col: _price(self.prices[col][i]) for col in PRICE_COLUMNS})
+            record["Arrival_Date"] = format_ordinal(self.dates[i])
+            records.append(record)
+        return records
+
+    def merge(self, records, retention_days=None):
+        """New snapshot with records added (same identity -> replaced).
+
+        With retention_days, rows older than that many days before the newest
+        arrival date are dropped so the store stays bounded.
+        """
+        merged = MarketPriceStore.from_records(self.to_records() + list(records))
+        if not retention_days or len(merged) == 0:
+            return merged
+        cutoff = int(merged.dates.max()) - retention_days
+        keep = merged.dates >= cutoff
+        if keep.all():
+            return merged
+        return MarketPriceStore(
+            merged.categories,
+            {col: arr[keep] for col, arr in merged.codes.items()},
+            {col: arr[keep] for col, arr in merged.prices.items()},
+            merged.dates[keep],
+        )
+
+    # ----- persistence -----
+    def save(self, path=MARKET_STORE_PATH):
+        """Write atomically: readers never see a half-written file.
+
+        The temporary file is unique to this call, so concurrent writers
+        cannot interleave their bytes; the last rename wins.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {f"cat_{col}": np.asarray(values, dtype=str) for col, values in self.categories.items()}
+        arrays.update({f"code_{col}": arr for col, arr in self.codes.items()})
+        arrays.update({f"price_{col}": arr for col, arr in self.prices.items()})
+        arrays["dates"] = self.dates
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path=MARKET_STORE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            categories = {col: data[f"cat_{col}"].tolist() for col in CATEGORY_COLUMNS}
+            codes = {col: data[f"code_{col}"] for col in CATEGORY_COLUMNS}
+            prices = {col: data[f"price_{col}"] for col in PRICE_COLUMNS}
+            return cls(categories, codes, prices, data["dates"])
+
+    # ----- queries -----
+    def _code(self, column, value):
+        """Code for a value, -1 if filtering on an unknown value, None if no filter"""
+        if not value:
+            return None
+        return self._lookup[column].get(_norm(value), -1)
+
+    def select(self, state=None, district=None, commodity=None, market=None, from_date=None, to_date=None):
+        """Row indices matching the filters (dates as DD/MM/YYYY or YYYY-MM-DD strings)"""
+        state_c, district_c = self._code("State", state), self._code("District", district)
+        commodity_c, market_c = self._code("Commodity", commodity), self._code("Market", market)
+        if -1 in (state_c, district_c, commodity_c, market_c):
+            return np.empty(0, dtype=np.int64)
+        start_day = parse_query_date(from_date) if from_date else 0
+        end_day = parse_query_date(to_date) if to_date else (1 << _DATE_BITS) - 1
+
+        if state_c is not None and district_c is not None and commodity_c is not None:
+            # Full index prefix: binary search on the composite key
+            lo = np.searchsorted(self.keys, self._composite_key(state_c, district_c, commodity_c, start_day), "left")
+            hi = np.searchsorted(self.keys, self._composite_key(state_c, district_c, commodity_c, end_day), "right")
+            rows = np.arange(lo, hi)
+        elif state_c is not None and district_c is not None:
+            lo = np.searchsorted(self.keys, self._composite_key(state_c, district_c, 0, 0), "left")
+            hi = np.searchsorted(self.keys, self._composite_key(state_c, district_c + 1, 0, 0), "left")
+            rows = np.arange(lo, hi)
+        elif state_c is not None:
+            lo = np.searchsorted(self.keys, self._composite_key(state_c, 0, 0, 0), "left")
+            hi = np.searchsorted(self.keys, self._composite_key(state_c + 1, 0, 0, 0), "left")
+            rows = np.arange(lo, hi)
+        else:
+            rows = np.arange(len(self))
+
+        mask = np.ones(len(rows), dtype=bool)
+        if commodity_c is not None:
+            mask &= self.codes["Commodity"][rows] == commodity_c
+        if market_c is not None:
+            mask &= self.codes["Market"][rows] == market_c
+        if from_date or to_date:
+            mask &= (self.dates[rows] >= start_day) & (self.dates[rows] <= end_day)
+        return rows[mask]
+
+    def aggregate(self, **filters):
+        """Min / max / modal price summary for the matching rows"""
+        rows = self.select(**filters)
+        if len(rows) == 0:
+            return {"count": 0}
+        modal = self.prices["Modal_Price"][rows]
+        return {
+            "count": int(len(rows)),
+            "min_price": _price_stat(np.min, self.prices["Min_Price"][rows]),
+            "max_price": _price_stat(np.max, self.prices["Max_Price"][rows]),
+            "avg_modal_price": _price_stat(np.mean, modal, 2),
+            "median_modal_price": _price_stat(np.median, modal),
+            "from_date": format_ordinal(self.dates[rows].min()),
+            "to_date": format_ordinal(self.dates[rows].max()),
+        }
+
+    def time_series(self, **filters):
+        """Per-day min / max / average modal price for the matching rows"""
+        rows = self.select(**filters)
+        if len(rows) == 0:
+            return []
+        days, inverse = np.unique(self.dates[rows], return_inverse=True)
+        series = []
+        for i, day in enumerate(days):
+            day_rows = rows[inverse == i]
+            series.append({
+                "date": format_ordinal(day),
+                "markets": int(len(day_rows)),
+                "min_price": _price_stat(np.min, self.prices["Min_Price"][day_rows]),
+                "max_price": _price_stat(np.max, self.prices["Max_Price"][day_rows]),
+                "avg_modal_price": _price_stat(np.mean, self.prices["Modal_Price"][day_rows], 2),
+            })
+        return series
+
+    def compare_markets(self, **filters):
+        """Latest modal price per market for the matching rows, cheapest first"""
+        rows = self.select(**filters)
+        latest = {}
+        for i in rows[np.argsort(self.dates[rows], kind="stable")]:
+            latest[self.codes["Market"][i]] = i  # later dates overwrite earlier ones
+        markets = [{
+            "market": self.categories["Market"][self.codes["Market"][i]],
+            "district": self.categories["District"][self.codes["District"][i]],
+            "date": format_ordinal(self.dates[i]),
+            "min_price": _price(self.prices["Min_Price"][i]),
+            "max_price": _price(self.prices["Max_Price"][i]),
+            "modal_price": _price(self.prices["Modal_Price"][i]),
+        } for i in latest.values()]
+        # Markets without a modal price go last
+        return sorted(markets, key=lambda m: (m["modal_price"] is None, m["modal_price"] or 0.0))
+
+    def stats(self):
+        return {
+            "rows": len(self),
+            "states": len(self.categories["State"]),
+            "markets": len(self.categories["Market"]),
+            "commodities": len(self.categories["Commodity"]),
+            "from_date": format_ordinal(self.dates.min()) if len(self) else None,
+            "to_date": format_ordinal(self.dates.max()) if len(self) else None,
+        }
+
+_store = None
+_store_version = None  # (mtime_ns, size) of the file _store was read from
+_store_lock = threading.Lock()
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def get_market_store():
+    """Current snapshot, (re)loaded whenever the file on disk has been replaced.
+
+    Ingestion runs in one process (see ingest.py); the other workers pick
+    up its snapshot here with one stat() per call.
+    """
+    global _store, _store_version
+    version = _file_version(MARKET_STORE_PATH)
+    if _store is None or version != _store_version:
+        with _store_lock:
+            if _store is None or version != _store_version:
+                try:
+                    _store = MarketPriceStore.load() if version is not None else MarketPriceStore.empty()
+                except Exception as e:
+                    logger.error(f"Error loading market store: {str(e)}")
+                    if _store is None:
+                        _store = MarketPriceStore.empty()
+                _store_version = version
+    return _store
+
+def load_market_store(path=MARKET_STORE_PATH):
+    """Snapshot stored at path (the shared current one for MARKET_STORE_PATH), empty if there is none"""
+    if path == MARKET_STORE_PATH:
+        return get_market_store()
+    return MarketPriceStore.load(path) if os.path.exists(path) else MarketPriceStore.empty()
+
+def replace_market_store(store, path=MARKET_STORE_PATH):
+    """Persist a new snapshot and, if it is the served one, swap it in for readers"""
+    global _store, _store_version
+    store.save(path)
+    if path != MARKET_STORE_PATH:
+        return
+    with _store_lock:
+        _store = store
+        _store_version = _file_version(path)
@@ -0,0 +1,95 @@
+# services/http_clients.py
+import httpx
+import importlib.util
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# One pooled client per upstream. Connections are kept alive between requests
+# so we only pay the TCP + TLS handshake once per connection, not per call.
+UPSTREAMS = {
+    "geoapify": {
+        "base_url": "https://api.geoapify.com",
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "timeout": 10.0,
+    },
+    "openweather": {
+        "base_url": "https://api.openweathermap.org",
+        "max_connections": 20,
+        "max_keepalive_connections": 10,
+        "timeout": 10.0,
+    },
+    "data_gov": {
+        "base_url": "https://api.data.gov.in",
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "timeout": 30.0,
+    },
+}
+CONNECT_TIMEOUT_SECONDS = 5.0
+KEEPALIVE_EXPIRY_SECONDS = 60.0
+
+# HTTP/2 needs the optional 'h2' package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_SUPPORTED = importlib.util.find_spec("h2") is not None
+
+_async_clients = {}
+_sync_clients = {}
+_lock = threading.Lock()
+
+def _client_options(name):
+    """Pool limits, timeouts and base URL for an upstream"""
+    if name not in UPSTREAMS:
+        raise KeyError(f"Unknown upstream: {name}")
+    config = UPSTREAMS[name]
+    return {
+        "base_url": config["base_url"],
+        "http2": HTTP2_SUPPORTED,
+        "limits": httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive_connections"],
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "timeout": httpx.Timeout(config["timeout"], connect=CONNECT_TIMEOUT_SECONDS),
+    }
+
+async def init_http_clients():
+    """Create the pooled async clients (called from the FastAPI lifespan)"""
+    for name in UPSTREAMS:
+        get_http_client(name)
+    logger.info(f"HTTP clients ready for {', '.join(UPSTREAMS)} (http2={HTTP2_SUPPORTED})")
+
+async def close_http_clients():
+    """Close every pooled client (called on shutdown)"""
+    with _lock:
+        async_clients = list(_async_clients.values())
+        sync_clients = list(_sync_clients.values())
+        _async_clients.clear()
+        _sync_clients.clear()
+    for client in async_clients:
+        await client.aclose()
+    for client in sync_clients:
+        client.close()
+
+def get_http_client(name):
+    """Shared async client for an upstream, created on first use"""
+    client = _async_clients.get(name)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(name)
+            if client is None:
+                client = httpx.AsyncClient(**_client_options(name))
+                _async_clients[name] = client
+    return client
+
+def get_sync_http_client(name):
+    """Shared blocking client for an upstream (CLI and worker-thread callers)"""
+    client = _sync_clients.get(name)
+    if client is None:
+        with _lock:
+            client = _sync_clients.get(name)
+            if client is None:
+                client = httpx.Client(**_client_options(name))
+                _sync_clients[name] = client
+    return client
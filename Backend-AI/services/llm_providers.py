@@ -0,0 +1,74 @@
+# services/llm_providers.py
+import google.generativeai as genai
+from langchain_groq import ChatGroq
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# LLM clients are created once per process and shared by the chatbot and the
+# organic guide. Reusing a client also reuses its HTTP/gRPC connections.
+_lock = threading.Lock()
+_groq_clients = {}
+_gemini_models = {}
+_gemini_configured = False
+
+def get_groq_llm(model_name, temperature=0.3, max_tokens=200):
+    """Shared ChatGroq client for a model/settings combination"""
+    key = (model_name, temperature, max_tokens)
+    llm = _groq_clients.get(key)
+    if llm is not None:
+        return llm
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
+
+    with _lock:
+        llm = _groq_clients.get(key)
+        if llm is None:
+            llm = ChatGroq(
+                temperature=temperature,
+                groq_api_key=api_key,
+                model_name=model_name,
+                max_tokens=max_tokens
+            )
+            _groq_clients[key] = llm
+            logger.info(f"Created Groq client for {model_name}")
+    return llm
+
+def _configure_gemini():
+    """genai.configure is process-global, so it runs once.
+
+    GEMINI_API_KEY is used by the chatbot; the organic guide historically read
+    GOOGLE_API_KEY, which is accepted as a fallback.
+    """
+    global _gemini_configured
+    if _gemini_configured:
+        return
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    genai.configure(api_key=api_key)
+    _gemini_configured = True
+
+def get_gemini_model(model_name):
+    """Shared Gemini GenerativeModel by name"""
+    model = _gemini_models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _gemini_models.get(model_name)
+        if model is None:
+            try:
+                _configure_gemini()
+                model = genai.GenerativeModel(model_name)
+            except ValueError:
+                raise
+            except Exception as e:
+                raise ValueError(f"Failed to initialize Gemini model: {str(e)}")
+            _gemini_models[model_name] = model
+            logger.info(f"Created Gemini model {model_name}")
+    return model
@@ -0,0 +1,427 @@
+# services/response_cache.py
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Values are stored as JSON text (never pickle): only plain dicts/lists/strings/
+# numbers round-trip, and a tampered cache file cannot execute code on load.
+def serialize(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def deserialize(payload):
+    return json.loads(payload)
+
+class SQLiteCacheBackend:
+    """Persistent cache tier in a single SQLite file.
+
+    Writes are single INSERT OR REPLACE transactions (atomic; readers never see
+    a half-written entry) and WAL mode lets several uvicorn workers share the
+    file. sweep() drops expired rows, then least-recently-used rows until the
+    table is within max_entries and max_bytes. Rows in cache_locks mark keys
+    some worker is computing (see ResponseCache.claim).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, ttl, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache_entries (last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_locks (
+                    key TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, payload, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, payload, len(payload.encode("utf-8")), expires_at, now)
+        )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def acquire_lock(self, key, token, ttl):
+        """Take the lock on key unless another live holder has it"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_locks WHERE key = ? AND expires_at <= ?", (key, now))
+        return conn.execute(
+            "INSERT OR IGNORE INTO cache_locks (key, token, expires_at) VALUES (?, ?, ?)", (key, token, now + ttl)
+        ).rowcount == 1
+
+    def release_lock(self, key, token):
+        self._connect().execute("DELETE FROM cache_locks WHERE key = ? AND token = ?", (key, token))
+
+    def sweep(self):
+        """Evict expired entries, then LRU entries over the size limits"""
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_locks WHERE expires_at <= ?", (time.time(),))
+        removed = conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),)).rowcount
+
+        count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        if count > self.max_entries:
+            removed += conn.execute(
+                "DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            ).rowcount
+            total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+
+        if total_bytes > self.max_bytes:
+            excess = total_bytes - self.max_bytes
+            keys = []
+            for key, size in conn.execute("SELECT key, size FROM cache_entries ORDER BY last_access"):
+                keys.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+            removed += len(keys)
+        return removed
+
+    def stats(self):
+        count, total_bytes = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        return {"backend": self.name, "entries": count, "bytes": total_bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+class RedisCacheBackend:
+    """Persistent cache tier in Redis.
+
+    Entries expire through Redis TTLs; size-based eviction is left to the
+    server's maxmemory policy (configure allkeys-lru), so sweep() is a no-op.
+    Locks are SET NX keys with their own expiry.
+    """
+
+    name = "redis"
+
+    # Delete the lock only if it is still ours (it may have expired and been retaken)
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url, ttl, prefix="agro:response:"):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lock_prefix = prefix + "lock:"
+
+    def get(self, key):
+        payload = self.client.get(self.prefix + key)
+        return payload.decode("utf-8") if payload is not None else None
+
+    def set(self, key, payload, ttl=None):
+        self.client.set(self.prefix + key, payload, ex=int(self.ttl if ttl is None else ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def acquire_lock(self, key, token, ttl):
+        return bool(self.client.set(self.lock_prefix + key, token, nx=True, ex=max(1, int(ttl))))
+
+    def release_lock(self, key, token):
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.lock_prefix + key, token)
+
+    def sweep(self):
+        return 0
+
+    def stats(self):
+        return {"backend": self.name}
+
+class Flight:
+    """One computation of a response, shared by every concurrent request for its key.
+
+    The leader computes the response and calls finish(response); the others
+    wait with result() / result_async(). A result of None means the leader
+    gave up (it failed or was cancelled, or the wait timed out) and the
+    caller should compute the response itself.
+    """
+
+    def __init__(self, cache, key, future, leader):
+        self.cache = cache
+        self.key = key
+        self.future = future
+        self.leader = leader
+        self.lock_token = None  # set while holding the cross-worker lock
+        self.waited = False     # found the cross-worker lock taken
+
+    def result(self, timeout=None):
+        try:
+            return self.future.result(self.cache.flight_wait if timeout is None else timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+
+    async def result_async(self, timeout=None):
+        # shield: a waiter timing out must not cancel the future the others share
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(self.future)),
+                self.cache.flight_wait if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            return None
+
+    def finish(self, value=None):
+        """Leader only: hand value to the waiters. Safe to call more than once."""
+        if not self.leader or self.future.done():
+            return
+        self.cache._end_flight(self)
+        self.future.set_result(value)
+
+class ResponseCache:
+    """In-process LRU tier in front of an optional persistent tier.
+
+    claim() coalesces concurrent misses on the same key: within a worker
+    through a shared future, across workers (when shared_locks is set and the
+    backend is SQLite/Redis) through a short-lived lock in the backend, with
+    other workers polling the backend for the leader's result for up to
+    shared_wait seconds before computing it themselves.
+    """
+
+    def __init__(self, ttl, memory_entries=1024, backend=None, sweep_interval=300,
+                 single_flight=True, shared_locks=True, flight_wait=45.0, shared_wait=10.0,
+                 lock_ttl=60.0, lock_poll=0.1):
+        self.memory = TTLCache(memory_entries, ttl, name="responses")
+        self.backend = backend
+        self.sweep_interval = sweep_interval
+        self.single_flight = single_flight
+        self.shared_locks = shared_locks and backend is not None
+        self.flight_wait = flight_wait
+        self.shared_wait = shared_wait
+        self.lock_ttl = lock_ttl
+        self.lock_poll = lock_poll
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.coalesced = 0
+        self.shared_waits = 0
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    def get(self, key):
+        payload = self.memory.get(key)
+        if payload is None and self.backend is not None:
+            try:
+                payload = self.backend.get(key)
+            except Exception as e:
+                logger.error(f"Error reading response cache: {str(e)}")
+                payload = None
+            if payload is not None:
+                self.memory.set(key, payload)
+        return deserialize(payload) if payload is not None else None
+
+    def set(self, key, value, ttl=None):
+        payload = serialize(value)
+        self.memory.set(key, payload, ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, payload, ttl)
+            except Exception as e:
+                logger.error(f"Error writing response cache: {str(e)}")
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def claim(self, key):
+        """Flight for computing key, or None when single-flight is off.
+
+        The first caller becomes the leader; callers arriving while it is
+        computing get a waiting Flight on the same future. While another
+        worker holds the key, a leader polls for up to shared_wait seconds
+        (blocking this thread; use claim_async on the event loop).
+        """
+        flight = self._claim_local(key)
+        if flight is None or not flight.leader:
+            return flight
+        try:
+            if self.shared_locks:
+                deadline = time.monotonic() + self.shared_wait
+                while not self._poll_shared_lock(flight) and time.monotonic() < deadline:
+                    time.sleep(self.lock_poll)
+            return self._stored_or_leader(flight)
+        except BaseException:
+            flight.finish()
+            raise
+
+    async def claim_async(self, key):
+        """claim() for the event loop: waits on other workers with asyncio.sleep.
+
+        Each poll is one short backend call in a worker thread, so a burst of
+        waiting requests never holds executor threads between polls.
+        """
+        flight = self._claim_local(key)
+        if flight is None or not flight.leader:
+            return flight
+        try:
+            if self.shared_locks:
+                deadline = time.monotonic() + self.shared_wait
+                while not await asyncio.to_thread(self._poll_shared_lock, flight) and time.monotonic() < deadline:
+                    await asyncio.sleep(self.lock_poll)
+            return await asyncio.to_thread(self._stored_or_leader, flight)
+        except BaseException:
+            flight.finish()  # let local waiters go on without us
+            raise
+
+    def _claim_local(self, key):
+        if not self.single_flight:
+            return None
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return Flight(self, key, future, leader=False)
+            future = self._inflight[key] = concurrent.futures.Future()
+        return Flight(self, key, future, leader=True)
+
+    def _poll_shared_lock(self, flight):
+        """One attempt at the cross-worker lock; True when there is no need to wait any longer.
+
+        That is: the lock was taken, the other worker stored the value, or
+        the backend failed (then the answer is computed without the lock).
+        """
+        token = uuid.uuid4().hex
+        try:
+            if self.backend.acquire_lock(flight.key, token, self.lock_ttl):
+                flight.lock_token = token
+                return True
+            if not flight.waited:
+                flight.waited = True
+                self.shared_waits += 1
+            return self.backend.get(flight.key) is not None
+        except Exception as e:
+            logger.error(f"Error taking response cache lock: {str(e)}")
+            return True
+
+    def _stored_or_leader(self, flight):
+        """Waiting flight if the value was stored since the caller's lookup, else the leader flight"""
+        value = self.get(flight.key)
+        if value is not None:
+            flight.finish(value)
+            return Flight(self, flight.key, flight.future, leader=False)
+        if flight.waited and flight.lock_token is None:
+            logger.info(f"Stopped waiting for another worker on response {flight.key}, computing it here")
+        return flight
+
+    def _end_flight(self, flight):
+        if flight.lock_token is not None:
+            try:
+                self.backend.release_lock(flight.key, flight.lock_token)
+            except Exception as e:
+                logger.error(f"Error releasing response cache lock: {str(e)}")
+            flight.lock_token = None
+        with self._inflight_lock:
+            if self._inflight.get(flight.key) is flight.future:
+                del self._inflight[flight.key]
+
+    def start_sweeper(self):
+        """Evict expired / over-limit entries from the persistent tier periodically"""
+        if self.backend is None or self._sweeper is not None:
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="response-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                removed = self.backend.sweep()
+                if removed:
+                    logger.info(f"Response cache sweep evicted {removed} entries")
+            except Exception as e:
+                logger.error(f"Response cache sweep failed: {str(e)}")
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.single_flight:
+            stats["single_flight"] = {"in_flight": len(self._inflight), "coalesced": self.coalesced,
+                                      "shared_locks": self.shared_locks, "shared_waits": self.shared_waits}
+        if self.backend is not None:
+            try:
+                stats["persistent"] = self.backend.stats()
+            except Exception as e:
+                stats["persistent"] = {"error": str(e)}
+        return stats
+
+def create_response_cache(default_path, ttl):
+    """Build the response cache selected by RESPONSE_CACHE_BACKEND (sqlite | redis | memory)"""
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "sqlite").lower()
+    memory_entries = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "1024"))
+    sweep_interval = int(os.getenv("RESPONSE_CACHE_SWEEP_SECONDS", "300"))
+    single_flight = os.getenv("RESPONSE_SINGLE_FLIGHT", "true").lower() == "true"
+    shared_locks = os.getenv("RESPONSE_SINGLE_FLIGHT_SHARED", "true").lower() == "true"  # across workers
+    flight_wait = float(os.getenv("RESPONSE_SINGLE_FLIGHT_WAIT_SECONDS", "45"))  # > worst-case LLM latency
+    shared_wait = float(os.getenv("RESPONSE_SINGLE_FLIGHT_SHARED_WAIT_SECONDS", "10"))  # then compute locally
+    lock_ttl = float(os.getenv("RESPONSE_SINGLE_FLIGHT_LOCK_SECONDS", "60"))  # frees keys of crashed workers
+
+    backend = None
+    try:
+        if backend_name == "sqlite":
+            backend = SQLiteCacheBackend(
+                os.getenv("RESPONSE_CACHE_PATH", default_path),
+                ttl,
+                max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000")),
+                max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            )
+        elif backend_name == "redis":
+            backend = RedisCacheBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl)
+    except Exception as e:
+        logger.error(f"Could not open {backend_name} response cache, using memory only: {str(e)}")
+
+    cache = ResponseCache(ttl, memory_entries=memory_entries, backend=backend, sweep_interval=sweep_interval,
+                          single_flight=single_flight, shared_locks=shared_locks,
+                          flight_wait=flight_wait, shared_wait=shared_wait, lock_ttl=lock_ttl)
+    cache.start_sweeper()
+    return cache
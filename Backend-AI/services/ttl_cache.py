@@ -0,0 +1,179 @@
+# services/ttl_cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+class _InFlight:
+    """A load that other callers for the same key are waiting on"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache whose entries expire after a TTL.
+
+    Expired entries are kept for up to `max_stale` extra seconds so callers
+    can still read them with `peek(..., allow_stale=True)` (stale-while-
+    revalidate). `get_or_load` / `get_or_load_async` coalesce concurrent
+    misses for the same key into a single call to the loader.
+    """
+
+    def __init__(self, maxsize, ttl, max_stale=0, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.name = name
+        self._data = OrderedDict()  # key -> (value, stored_at, ttl)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_async = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def _lookup(self, key, allow_stale):
+        """Return (value, fresh) or None; caller holds the lock"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, stored_at, ttl = entry
+        age = time.monotonic() - stored_at
+        if age > ttl + self.max_stale:
+            del self._data[key]
+            return None
+        fresh = age <= ttl
+        if not fresh and not allow_stale:
+            return None
+        self._data.move_to_end(key)
+        return value, fresh
+
+    def get(self, key, default=None):
+        """Fresh value for key, or default"""
+        with self._lock:
+            found = self._lookup(key, allow_stale=False)
+            if found is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return found[0]
+
+    def peek(self, key, allow_stale=False):
+        """Return (value, fresh); (None, False) when nothing usable is cached"""
+        with self._lock:
+            found = self._lookup(key, allow_stale)
+            if found is None:
+                self.misses += 1
+                return None, False
+            if found[1]:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return found
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic(), self.ttl if ttl is None else ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_load(self, key, loader, cache_if=None):
+        """Cached value for key, calling loader() once on a miss.
+
+        Threads that miss on the same key while a load is running wait for
+        that load instead of starting their own. Results for which
+        cache_if(value) is false are returned but not stored.
+        """
+        with self._lock:
+            found = self._lookup(key, allow_stale=False)
+            if found is not None:
+                self.hits += 1
+                return found[0]
+            self.misses += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+            if cache_if is None or cache_if(call.value):
+                self.set(key, call.value)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    async def get_or_load_async(self, key, loader, cache_if=None):
+        """Async variant of get_or_load; loader is a coroutine function.
+
+        The load runs as its own task, so a caller being cancelled does not
+        cancel the load for the other callers waiting on it.
+        """
+        with self._lock:
+            found = self._lookup(key, allow_stale=False)
+            if found is not None:
+                self.hits += 1
+                return found[0]
+            self.misses += 1
+            task = self._inflight_async.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._load_async(key, loader, cache_if))
+                self._inflight_async[key] = task
+            else:
+                self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def _load_async(self, key, loader, cache_if):
+        try:
+            value = await loader()
+            if cache_if is None or cache_if(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight_async.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+        }